@@ -4,127 +4,30 @@ $ python3 workflow_runner.py 'workflow file path'
 """
 
 import argparse
-import json
+import os
 import sys
 
-import yaml
-
-from internal import auth_info as aui
+from internal import arguments
+from internal import client
+from internal import server
 from internal import subcommand as com
 
 
-def _parse_extra_vars(extra_vars: str) -> dict:
-    def _is_json(text: str) -> bool:
-        try:
-            json.loads(text)
-        except json.JSONDecodeError:
-            return False
-        except ValueError:
-            return False
-
-        return True
-
-    if not extra_vars:
-        extra_vars_arg: dict = {}
-
-    elif extra_vars.startswith('@'):
-        with open(extra_vars[1:], 'r') as evf:
-            extra_vars_arg: dict = yaml.load(stream=evf, Loader=yaml.SafeLoader)
-
-    elif _is_json(extra_vars):
-        extra_vars_arg: dict = json.loads(extra_vars)
-
-    else:
-        extra_vars_arg: dict = yaml.load(extra_vars, Loader=yaml.SafeLoader)
-        if not isinstance(extra_vars_arg, dict):
-            print()
-            print('<< Invalid argument. >>')
-            print('Specified `extra_vars` format is invalid.')
-            sys.exit(2)
-
-    return extra_vars_arg
-
-
-def _arg_parse() -> dict:
-    usage = ("""
-  Ansible workflow runner on local command line.
-
-  Please use this command as follows:
-    $ python3 %(prog)s `workflow file path`\
- -i `inventory file path`\
- (--ask-pass or --private-key `file path`)\
- [-e '@extra-vars_file_path']
+def _serve_arg_parse(argv: list) -> dict:
+    prog: str = '{} serve'.format(os.path.basename(sys.argv[0]))
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description='Run workflow runner server '
+                                                 'on local Unix socket.')
 
-  If you want to check settings correctness, you can use `dry_run` mode.
-    $ python3 %(prog)s `workflow file path`\
- -i `inventory file path`\
- --dry_run\
- [-e '@extra-vars_file_path']
-  
-""")
-
-    parser = argparse.ArgumentParser(usage=usage, add_help=True)
-
-    parser.add_argument('workflow_file',
-                        type=str,
-                        help='Target workflow file path.')
-    parser.add_argument('-i', '--inventory_file',
+    parser.add_argument('--socket',
                         type=str,
-                        help='Target inventory file path.')
+                        help='Socket file path. Default is '
+                             '`$WORKFLOW_RUNNER_SOCKET` or `{}`.'
+                             .format(client.DEFAULT_SOCKET))
 
-    parser.add_argument('-u', '--user',
-                        type=str,
-                        help="Ansible's `ansible_ssh_user` option. "
-                             "Default is current user.")
-    parser.add_argument('--port',
-                        type=int,
-                        help="Ansible's `ansible_port` option. "
-                             "Default is `22`.")
-    parser.add_argument('--become-user',
-                        type=str,
-                        help="Ansible's `ansible_become_user` option. "
-                             "Default is `root`.")
-    parser.add_argument('-K', '--ask-become-pass',
-                        action='store_true',
-                        help="Ansible's `ansible_become_pass` option.")
-    parser.add_argument('-e', '--extra-vars',
-                        type=str,
-                        help="Ansible's extra_vars option. "
-                             "Default is `None`.")
-
-    auth_method = parser.add_mutually_exclusive_group(required=True)
-    auth_method.add_argument('-k', '--ask-pass',
-                             action='store_true',
-                             help='Password auth enable '
-                                  'for ansible remote login. '
-                                  'Please specify this or `--private-key`.')
-    auth_method.add_argument('--private-key',
-                             type=str,
-                             help='Private key file path '
-                                  'for ansible remote login. '
-                                  'Please specify this or `--ask-pass`.')
-    auth_method.add_argument('--dry_run',
-                             action='store_true',
-                             help='Run with `dry_run` mode.')
-
-    args = parser.parse_args()
-
-    auth_info: aui.AuthInfo = aui.AuthInfo(args.ask_pass,
-                                           args.private_key,
-                                           args.user,
-                                           args.port,
-                                           args.become_user,
-                                           args.ask_become_pass)
-    auth_extra_vars: str = auth_info.generate_auth_extra_vars()
-
-    extra_vars: str = args.extra_vars
-    extra_vars_dict: dict = _parse_extra_vars(extra_vars)
-
-    return {'dry_run': args.dry_run,
-            'workflow_file': args.workflow_file,
-            'inventory_file': args.inventory_file,
-            'extra_vars': extra_vars_dict,
-            'auth_extra_vars': auth_extra_vars}
+    args = parser.parse_args(argv)
+
+    return {'socket_path': client.get_socket_path(args.socket)}
 
 
 def main():
@@ -132,15 +35,88 @@ def main():
     Run workflow.
     """
 
-    args: dict = _arg_parse()
+    if sys.argv[1:2] == ['serve']:
+        serve_args: dict = _serve_arg_parse(sys.argv[2:])
+        workflow_server = server.WorkflowServer(serve_args['socket_path'])
+        try:
+            workflow_server.serve()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if sys.argv[1:2] == ['compile']:
+        compile_args: dict = arguments.parse_compile_args(sys.argv[2:])
+        com.compile_workflow(compile_args['workflow_file'],
+                             compile_args['plan_file'])
+        return
+
+    if sys.argv[1:2] == ['batch']:
+        batch_args: dict = arguments.parse_batch_args(sys.argv[2:])
+        com.execute_batch(batch_args['dry_run'],
+                          batch_args['manifest_file'],
+                          batch_args['auth_extra_vars'],
+                          batch_args['max_parallel'],
+                          batch_args['workspace_root'],
+                          batch_args['keep_failed'])
+        return
+
+    if sys.argv[1:2] == ['history']:
+        history_args: dict = arguments.parse_history_args(sys.argv[2:])
+        com.show_history(history_args['history_file'],
+                         history_args['template'],
+                         history_args['window'],
+                         history_args['threshold'])
+        return
+
+    args: dict = arguments.parse_args(sys.argv[1:])
+    if args['watch']:
+        try:
+            com.watch_dry_run(args['workflow_file'], args['extra_vars'])
+        except KeyboardInterrupt:
+            pass
+        return
+
     dry_run: bool = args['dry_run']
     workflow_file: str = args['workflow_file']
+    plan_file: str = args['plan_file']
     inventory_file: str = args['inventory_file']
     extra_vars: dict = args['extra_vars']
     auth_extra_vars: str = args['auth_extra_vars']
+    provenance_file: str = args['provenance_file']
+    max_parallel: int = args['max_parallel']
+    workflow_timeout: float = args['workflow_timeout']
+    max_slots: int = args['max_slots']
+    pools: dict = args['pools']
+    output_format: str = args['output_format']
+    output_file: str = args['output_file']
+    trace_file: str = args['trace_file']
+    profile: str = args['profile']
+    profile_file: str = args['profile_file']
+    history_file: str = args['history_file']
+    schedule: str = args['schedule']
+    preflight: str = args['preflight']
+    preflight_forks: int = args['preflight_forks']
+    preflight_timeout: int = args['preflight_timeout']
+    metrics_file: str = args['metrics_file']
+    metrics_per_job: bool = args['metrics_per_job']
+    job_log_dir: str = args['job_log_dir']
+    log_tail: int = args['log_tail']
+    workspace_root: str = args['workspace_root']
+    keep_failed: int = args['keep_failed']
 
     com.execute(dry_run, workflow_file, inventory_file, auth_extra_vars,
-                extra_vars)
+                extra_vars, plan_file=plan_file,
+                provenance_file=provenance_file, max_parallel=max_parallel,
+                workflow_timeout=workflow_timeout, max_slots=max_slots,
+                pools=pools, output_format=output_format,
+                output_file=output_file, trace_file=trace_file,
+                profile=profile, profile_file=profile_file,
+                history_file=history_file, schedule=schedule,
+                preflight=preflight, preflight_forks=preflight_forks,
+                preflight_timeout=preflight_timeout,
+                metrics_file=metrics_file, metrics_per_job=metrics_per_job,
+                job_log_dir=job_log_dir, log_tail=log_tail,
+                workspace_root=workspace_root, keep_failed=keep_failed)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+$ python3 workflow_runner_client.py 'workflow file path'
+
+Client of `workflow_runner.py serve`.
+This takes the same arguments as `workflow_runner.py`.
+Server's socket path can be specified by `WORKFLOW_RUNNER_SOCKET`.
+"""
+
+import sys
+
+from internal import arguments
+from internal import client
+
+
+def main():
+    """
+    Request workflow run to server.
+    """
+
+    command, args = arguments.parse_command(sys.argv[1:])
+    if command == 'watch':
+        print('`--watch` is not available by server. '
+              'Please use `workflow_runner.py`.')
+        sys.exit(2)
+
+    sys.exit(client.request(command, args))
+
+
+if __name__ == '__main__':
+    main()
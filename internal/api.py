@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Python API to load, dry run and run workflows in the calling process.
+
+    workflow = api.Workflow.load('workflow.yml', extra_vars={'env': 'dev'})
+    report = workflow.dry_run()
+    report.raise_for_missing()
+    records = workflow.run(api.Credentials(private_key='id_rsa'),
+                           'inventory.txt', on_event=print)
+
+Unlike command line, nothing is prompted and results are returned.
+Progress messages are given to `on_event` instead of printed.
+Errors are raised as `WorkflowError`, except `CredentialsInvalid`
+raised by `Credentials`.
+Each `dry_run` builds own workflow tree, so it can be called from several
+threads at the same time. `run` changes Ansible's settings and output of
+the whole process, so runs in one process wait each other.
+Use separate processes to run workflows at the same time.
+Job_template files and playbooks' analysis are cached in the process.
+"""
+
+import tempfile
+import threading
+import time
+
+import yaml
+
+from internal.auth_info import Credentials, CredentialsInvalid
+from internal.workflow import parser as w_parser
+from internal.workflow import plan as w_plan
+from internal.workflow import provenance
+from internal.workflow import resource as w_resource
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+from internal.workflow.runner import JobRecord
+
+__all__ = ('Credentials', 'CredentialsInvalid', 'DryRunReport', 'JobRecord',
+           'LoadFailed', 'VariablesMissing', 'Workflow', 'WorkflowError')
+
+# Held while a workflow runs in this process.
+_run_lock = threading.Lock()
+
+
+class WorkflowError(Exception):
+    """
+    Base of errors raised by workflow API.
+    """
+
+    def __init__(self, message):
+        super(WorkflowError, self).__init__()
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class LoadFailed(WorkflowError):
+    """
+    Workflow or plan file can not be loaded.
+    """
+
+
+class VariablesMissing(WorkflowError):
+    """
+    Dry run found variables not defined at running jobs.
+    """
+
+    def __init__(self, message, report):
+        super(VariablesMissing, self).__init__(message)
+        self.report: DryRunReport = report
+
+
+class DryRunReport:
+    """
+    Variables check of each node in written order.
+    Sub-workflow is checked as one node like command line dry run.
+    """
+
+    def __init__(self, index: provenance.ProvenanceIndex):
+        self.nodes = []
+        for number, _node in enumerate(index.nodes, 1):
+            missing: list = sorted(index.missing.get(number, ()))
+            self.nodes.append({
+                'number': number,
+                'name': _node.node_name,
+                'type': _node.node_type,
+                'playbook': _node.playbook_path,
+                'missing': missing,
+                'explanation': index.explain_missing(number)
+                               if missing else ''})
+
+    @property
+    def ok(self) -> bool:
+        """ Whether all of variables are defined. """
+        return not self.get_failed_nodes()
+
+    def get_failed_nodes(self) -> list:
+        """ Nodes which have missing variables. """
+        return [_node for _node in self.nodes if _node['missing']]
+
+    def raise_for_missing(self):
+        """ Raise `VariablesMissing` for the first failed node. """
+
+        failed: list = self.get_failed_nodes()
+        if failed:
+            _node: dict = failed[0]
+            raise VariablesMissing(
+                "Necessary variables not defined. node: '{}' (#{}), "
+                "variable: {}. {}.".format(_node['name'], _node['number'],
+                                           set(_node['missing']),
+                                           _node['explanation']), self)
+
+    def to_dict(self) -> dict:
+        """ Report as JSON serializable dict. """
+        return {'ok': self.ok, 'nodes': self.nodes}
+
+
+class Workflow:
+    """
+    Workflow file or compiled plan with it's `extra_vars`.
+    """
+
+    def __init__(self, workflow_file: str, extra_vars: dict,
+                 plan: dict = None):
+        self.workflow_file = workflow_file
+        self.extra_vars = extra_vars
+        # Compiled plan which is used instead of parsing workflow file.
+        self.plan = plan
+
+    @classmethod
+    def load(cls, workflow_file: str = None, extra_vars: dict = None,
+             plan_file: str = None) -> 'Workflow':
+        """
+        Load workflow file or compiled plan file,
+        and check it can be parsed.
+        """
+
+        if bool(workflow_file) == bool(plan_file):
+            raise LoadFailed('Please specify only one of `workflow_file` '
+                             'and `plan_file`.')
+        if extra_vars is not None and not isinstance(extra_vars, dict):
+            raise LoadFailed('`extra_vars` has to be dict.')
+
+        plan: dict = None
+        if plan_file:
+            try:
+                plan = w_plan.read_plan(plan_file)
+            except (OSError, ValueError, w_plan.PlanInvalid) as exc:
+                raise LoadFailed(_get_message(exc)) from exc
+            workflow_file = plan['workflow_file']
+
+        workflow = cls(workflow_file, dict(extra_vars or {}), plan)
+        workflow._parse(True)
+        return workflow
+
+    def _parse(self, dry_run: bool) -> w_parser.WorkflowNode:
+        try:
+            if self.plan is None:
+                return w_parser.parse(self.workflow_file, dry_run,
+                                      self.extra_vars)
+            top_node = w_plan.load_plan(self.plan, dry_run, self.extra_vars)
+            return w_parser.WorkflowNode(top_node, self.plan['pools'])
+        except (OSError, yaml.YAMLError, tree.ParseFailed) as exc:
+            raise LoadFailed(_get_message(exc)) from exc
+
+    def dry_run(self) -> DryRunReport:
+        """
+        Check each Ansible playbook's all of variables are defined
+        at running it.
+        """
+
+        workflow_node: w_parser.WorkflowNode = self._parse(True)
+        return DryRunReport(
+            provenance.ProvenanceIndex(workflow_node.current_node))
+
+    def run(self, credentials: Credentials, inventory_file: str,
+            executor=None, on_event=None, max_parallel: int = 1,
+            workflow_timeout: float = None, max_slots: int = None,
+            pools: dict = None, work_dir: str = None) -> list:
+        """
+        Execute each Ansible playbook, and return `JobRecord` of each job.
+        `credentials` can be `dict` of `Credentials` arguments.
+        `executor` runs each playbook instead of Ansible in this process
+        with the same arguments as `runner.run_playbook`.
+        `on_event` is called with each finished job's `JobRecord`,
+        and with each progress message as `str`.
+        Temporary files are written to `work_dir`, or new directory
+        which is removed after the run.
+        This waits other runs in this process to end.
+        """
+
+        if isinstance(credentials, dict):
+            credentials = Credentials(**credentials)
+        auth_extra_vars: str = credentials.to_extra_vars()
+
+        workflow_node: w_parser.WorkflowNode = self._parse(False)
+        workflow_node.executor = executor
+        workflow_node.on_message = on_event or _ignore_message
+
+        deadline: float = None
+        if workflow_timeout is not None:
+            deadline = time.monotonic() + workflow_timeout
+        limiter: w_resource.ResourceLimiter = None
+        if max_slots is not None or pools or workflow_node.pools:
+            limiter = w_resource.ResourceLimiter(
+                max_slots, dict(workflow_node.pools, **(pools or {})))
+        workflow = w_run.WorkflowRunner(inventory_file, max_parallel,
+                                        deadline, limiter, on_record=on_event)
+
+        with _run_lock:
+            if work_dir:
+                return workflow.run(workflow_node, auth_extra_vars, work_dir)
+            with tempfile.TemporaryDirectory(prefix='workflow_runner-') as tmp:
+                return workflow.run(workflow_node, auth_extra_vars, tmp)
+
+
+def _ignore_message(_: str):
+    pass
+
+
+def _get_message(exc: Exception) -> str:
+    return getattr(exc, 'message', None) or str(exc)
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Command line arguments of workflow runner and it's client.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from internal import auth_info as aui
+from internal import history
+from internal import job_log
+from internal import profiling
+from internal import result_writer
+from internal import workspace
+from internal import yaml_loader
+from internal.workflow import schedule
+
+# Pre-flight check's action for unreachable hosts.
+PREFLIGHT_MODES = ('abort', 'exclude')
+# Hosts logged in at the same time, and seconds to wait each host.
+DEFAULT_PREFLIGHT_FORKS = 20
+DEFAULT_PREFLIGHT_TIMEOUT = 5
+
+
+def parse_extra_vars(extra_vars: str) -> dict:
+    """ Parse `-e` option value to extra_vars dict. """
+
+    def _is_json(text: str) -> bool:
+        try:
+            json.loads(text)
+        except json.JSONDecodeError:
+            return False
+        except ValueError:
+            return False
+
+        return True
+
+    if not extra_vars:
+        extra_vars_arg: dict = {}
+
+    elif extra_vars.startswith('@'):
+        extra_vars_arg: dict = yaml_loader.load_file(extra_vars[1:])
+
+    elif _is_json(extra_vars):
+        extra_vars_arg: dict = json.loads(extra_vars)
+
+    else:
+        extra_vars_arg: dict = yaml_loader.loads(extra_vars)
+        if not isinstance(extra_vars_arg, dict):
+            print()
+            print('<< Invalid argument. >>')
+            print('Specified `extra_vars` format is invalid.')
+            sys.exit(2)
+
+    return extra_vars_arg
+
+
+def add_workspace_arguments(parser: argparse.ArgumentParser):
+    """ Add options of temporary files' workspace to the parser. """
+
+    parser.add_argument('--workspace',
+                        type=str,
+                        help='Root directory of each run\'s workspace for '
+                             'temporary files, like a directory on tmpfs. '
+                             'Default is `${}` or `{}`.'.format(
+                                 workspace.WORKSPACE_ENV,
+                                 workspace.DEFAULT_ROOT))
+    parser.add_argument('--keep-failed',
+                        type=int,
+                        default=workspace.DEFAULT_KEEP_FAILED,
+                        help='Number of the latest failed runs\' '
+                             'workspaces kept. Default is `{}`.'.format(
+                                 workspace.DEFAULT_KEEP_FAILED))
+
+
+def add_auth_arguments(parser: argparse.ArgumentParser):
+    """ Add remote login auth options to the parser. """
+
+    parser.add_argument('-u', '--user',
+                        type=str,
+                        help="Ansible's `ansible_ssh_user` option. "
+                             "Default is current user.")
+    parser.add_argument('--port',
+                        type=int,
+                        help="Ansible's `ansible_port` option. "
+                             "Default is `22`.")
+    parser.add_argument('--become-user',
+                        type=str,
+                        help="Ansible's `ansible_become_user` option. "
+                             "Default is `root`.")
+    parser.add_argument('-K', '--ask-become-pass',
+                        action='store_true',
+                        help="Ansible's `ansible_become_pass` option.")
+
+    auth_method = parser.add_mutually_exclusive_group(required=True)
+    auth_method.add_argument('-k', '--ask-pass',
+                             action='store_true',
+                             help='Password auth enable '
+                                  'for ansible remote login. '
+                                  'Please specify this or `--private-key`.')
+    auth_method.add_argument('--private-key',
+                             type=str,
+                             help='Private key file path '
+                                  'for ansible remote login. '
+                                  'Please specify this or `--ask-pass`.')
+    auth_method.add_argument('--dry_run',
+                             action='store_true',
+                             help='Run with `dry_run` mode.')
+
+
+def generate_auth_extra_vars(args: argparse.Namespace) -> str:
+    """ Generate auth extra_vars JSON from parsed auth options. """
+
+    auth_info: aui.AuthInfo = aui.AuthInfo(args.ask_pass,
+                                           args.private_key,
+                                           args.user,
+                                           args.port,
+                                           args.become_user,
+                                           args.ask_become_pass)
+    return auth_info.generate_auth_extra_vars()
+
+
+def _parse_pools(parser: argparse.ArgumentParser, pool_args: list) -> dict:
+    pools = {}
+    for pool_arg in pool_args:
+        pool_name, _, slots = pool_arg.partition('=')
+        if not pool_name or not slots.isdigit() or int(slots) <= 0:
+            parser.error('`--pool` has to be `NAME=SLOTS`. '
+                         'value: {}'.format(pool_arg))
+        pools[pool_name] = int(slots)
+    return pools
+
+
+def parse_args(argv: list) -> dict:
+    """ Parse arguments of running workflow. """
+
+    usage = ("""
+  Ansible workflow runner on local command line.
+
+  Please use this command as follows:
+    $ python3 %(prog)s `workflow file path`\
+ -i `inventory file path`\
+ (--ask-pass or --private-key `file path`)\
+ [-e '@extra-vars_file_path']\
+ [--max-parallel `number`] [--schedule `lpt|written`]\
+ [--workflow-timeout `seconds`]\
+ [--max-slots `number`] [--pool `name=slots`]\
+ [--output-format `table|json|jsonl|csv`] [--output-file `file path`]\
+ [--trace `trace file path`] [--preflight `abort|exclude`]\
+ [--metrics-file `file path` [--metrics-per-job]]\
+ [--job-log-dir `directory path` [--log-tail `lines`]]\
+ [--workspace `directory path`] [--keep-failed `runs`]
+
+  If you want to check settings correctness, you can use `dry_run` mode.
+    $ python3 %(prog)s `workflow file path`\
+ -i `inventory file path`\
+ --dry_run\
+ [-e '@extra-vars_file_path']
+
+  If you want to know which job_template provides each variable,
+  you can write it with dry run.
+    $ python3 %(prog)s `workflow file path`\
+ -i `inventory file path`\
+ --dry_run --provenance `JSON file path`
+
+  If dry run is slow, you can profile parsing and dry run.
+    $ python3 %(prog)s `workflow file path`\
+ -i `inventory file path`\
+ --dry_run --profile (cpu or mem) [--profile-file `report file path`]
+
+  If you run the same workflow many times, you can compile it beforehand.
+    $ python3 %(prog)s compile `workflow file path` -o `plan file path`
+    $ python3 %(prog)s --plan `plan file path`\
+ -i `inventory file path`\
+ (--ask-pass or --private-key `file path`)
+
+  If you run many workflows or extra_vars sets, you can run them in batch.
+    $ python3 %(prog)s batch `manifest file path`\
+ (--ask-pass or --private-key `file path` or --dry_run)\
+ [--max-parallel `number`]
+
+  If you are editing playbooks, you can check again at every change.
+    $ python3 %(prog)s `workflow file path`\
+ --dry_run --watch\
+ [-e '@extra-vars_file_path']
+
+  If you want to know whether job_templates got slower, you can see
+  durations recorded by past runs.
+    $ python3 %(prog)s history [--history `database file path`]\
+ [--template `name`] [--window `runs`] [--threshold `ratio`]
+
+  If you call this command many times, you can keep it running as server.
+  `workflow_runner_client.py` takes the same arguments as this command.
+    $ python3 workflow_runner.py serve [--socket `socket file path`]
+    $ python3 workflow_runner_client.py `workflow file path`\
+ -i `inventory file path`\
+ --dry_run
+  
+""")
+
+    parser = argparse.ArgumentParser(usage=usage, add_help=True)
+
+    parser.add_argument('workflow_file',
+                        type=str,
+                        nargs='?',
+                        help='Target workflow file path.')
+    parser.add_argument('--plan',
+                        type=str,
+                        help='Compiled plan file path. '
+                             'This is used instead of `workflow_file`.')
+    parser.add_argument('-i', '--inventory_file',
+                        type=str,
+                        help='Target inventory file path.')
+
+    parser.add_argument('-e', '--extra-vars',
+                        type=str,
+                        help="Ansible's extra_vars option. "
+                             "Default is `None`.")
+    parser.add_argument('--max-parallel',
+                        type=int,
+                        default=1,
+                        help='Number of sibling jobs executed at the same '
+                             'time. Default is `1`.')
+    parser.add_argument('--schedule',
+                        type=str,
+                        choices=schedule.SCHEDULES,
+                        default='lpt',
+                        help='Dispatch order of sibling jobs. `lpt` '
+                             'dispatches the longest critical path by '
+                             'run history first. Default is `lpt`.')
+    parser.add_argument('--preflight',
+                        type=str,
+                        choices=PREFLIGHT_MODES,
+                        help='Log in all hosts of inventory before the '
+                             'first job, and `abort` the run or `exclude` '
+                             'unreachable hosts from all jobs.')
+    parser.add_argument('--preflight-forks',
+                        type=int,
+                        default=DEFAULT_PREFLIGHT_FORKS,
+                        help='Number of hosts logged in at the same time '
+                             'by `--preflight`. Default is `{}`.'
+                             .format(DEFAULT_PREFLIGHT_FORKS))
+    parser.add_argument('--preflight-timeout',
+                        type=int,
+                        default=DEFAULT_PREFLIGHT_TIMEOUT,
+                        help='Seconds until a host is unreachable '
+                             'by `--preflight`. Default is `{}`.'
+                             .format(DEFAULT_PREFLIGHT_TIMEOUT))
+    parser.add_argument('--workflow-timeout',
+                        type=float,
+                        help='Seconds until running jobs are killed and '
+                             'the rest of jobs are canceled. '
+                             'Default is no limit.')
+    parser.add_argument('--max-slots',
+                        type=int,
+                        help='Number of slots which running jobs use in '
+                             'total. Each job uses it\'s `weight`. '
+                             'Default is no limit.')
+    parser.add_argument('--pool',
+                        type=str,
+                        action='append',
+                        default=[],
+                        metavar='NAME=SLOTS',
+                        help='Number of slots of the resource pool. '
+                             'This overrides `pools` in workflow file.')
+    parser.add_argument('--output-format',
+                        type=str,
+                        choices=result_writer.FORMATS,
+                        default='table',
+                        help='Format of job results. Except `table`, each '
+                             'job\'s result is written as soon as it '
+                             'finished. Default is `table`.')
+    parser.add_argument('--output-file',
+                        type=str,
+                        help='File path to write job results '
+                             'except `table` format. Default is stdout.')
+    parser.add_argument('--trace',
+                        type=str,
+                        help='Write timeline of parsing and each job to '
+                             'this file in Chrome trace-event format.')
+    parser.add_argument('--metrics-file',
+                        type=str,
+                        help='Write metrics of the run to this file '
+                             'in OpenMetrics text format at the end.')
+    parser.add_argument('--metrics-per-job',
+                        action='store_true',
+                        help='Write `--metrics-file` also at each '
+                             'finished job.')
+    parser.add_argument('--job-log-dir',
+                        type=str,
+                        help='Write each job\'s output to compressed file '
+                             'in new directory of the run under this '
+                             'directory, instead of terminal.')
+    parser.add_argument('--log-tail',
+                        type=int,
+                        default=job_log.DEFAULT_TAIL,
+                        help='Number of the last lines of output printed '
+                             'for failed jobs with `--job-log-dir`. '
+                             'Default is `{}`.'.format(job_log.DEFAULT_TAIL))
+    parser.add_argument('--profile',
+                        type=str,
+                        choices=profiling.MODES,
+                        help='Profile parsing and dry run by `cpu` time '
+                             'or `mem` allocations.')
+    parser.add_argument('--profile-file',
+                        type=str,
+                        help='File path to write profile of each stage. '
+                             'Default is `workflow_runner_<mode>.prof.txt`.')
+    parser.add_argument('--history',
+                        type=str,
+                        help='Run history database file path. Default is '
+                             '`${}` or `{}`.'.format(history.HISTORY_ENV,
+                                                    history.DEFAULT_HISTORY))
+    parser.add_argument('--no-history',
+                        action='store_true',
+                        help='Don\'t record this run to run history.')
+    parser.add_argument('--provenance',
+                        type=str,
+                        help='Write which node provides each variable '
+                             'to this JSON file. Only with `--dry_run`.')
+    parser.add_argument('--watch',
+                        action='store_true',
+                        help='Check again whenever workflow or job_template '
+                             'files are changed. Only with `--dry_run`.')
+
+    add_workspace_arguments(parser)
+    add_auth_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if not args.workflow_file and not args.plan:
+        parser.error('Please specify `workflow_file` or `--plan`.')
+    if args.workflow_file and args.plan:
+        parser.error('Please specify only one of `workflow_file` '
+                     'and `--plan`.')
+    if args.watch and (not args.dry_run or args.plan):
+        parser.error('`--watch` is available with `workflow_file` '
+                     'and `--dry_run`.')
+    if args.workflow_timeout is not None and args.workflow_timeout <= 0:
+        parser.error('`--workflow-timeout` has to be positive.')
+    if args.preflight and (args.dry_run or not args.inventory_file):
+        parser.error('`--preflight` is available with `--inventory_file` '
+                     'without `--dry_run`.')
+    if args.preflight_forks <= 0 or args.preflight_timeout <= 0:
+        parser.error('`--preflight-forks` and `--preflight-timeout` '
+                     'have to be positive.')
+    if args.max_slots is not None and args.max_slots <= 0:
+        parser.error('`--max-slots` has to be positive.')
+    pools: dict = _parse_pools(parser, args.pool)
+    if args.output_file and args.output_format == 'table':
+        parser.error('`--output-file` is available with `--output-format` '
+                     'except `table`.')
+    if args.profile_file and not args.profile:
+        parser.error('`--profile-file` is available with `--profile`.')
+    if args.profile and not args.profile_file:
+        args.profile_file = 'workflow_runner_{}.prof.txt'.format(
+            args.profile)
+    if args.profile and args.watch:
+        parser.error('`--profile` is not available with `--watch`.')
+    if args.history and args.no_history:
+        parser.error('Please specify only one of `--history` '
+                     'and `--no-history`.')
+    if args.metrics_file and args.dry_run:
+        parser.error('`--metrics-file` is not available with `--dry_run`.')
+    if args.metrics_per_job and not args.metrics_file:
+        parser.error('`--metrics-per-job` is available with '
+                     '`--metrics-file`.')
+    if args.job_log_dir and args.dry_run:
+        parser.error('`--job-log-dir` is not available with `--dry_run`.')
+    if args.log_tail < 0:
+        parser.error('`--log-tail` has to be zero or positive.')
+    if args.keep_failed < 0:
+        parser.error('`--keep-failed` has to be zero or positive.')
+    if args.trace and args.watch:
+        parser.error('`--trace` is not available with `--watch`.')
+    if args.provenance and (not args.dry_run or args.watch):
+        parser.error('`--provenance` is available with `--dry_run` '
+                     'without `--watch`.')
+
+    auth_extra_vars: str = generate_auth_extra_vars(args)
+
+    extra_vars: str = args.extra_vars
+    extra_vars_dict: dict = parse_extra_vars(extra_vars)
+
+    return {'dry_run': args.dry_run,
+            'workflow_file': args.workflow_file,
+            'plan_file': args.plan,
+            'inventory_file': args.inventory_file,
+            'extra_vars': extra_vars_dict,
+            'auth_extra_vars': auth_extra_vars,
+            'provenance_file': args.provenance,
+            'max_parallel': args.max_parallel,
+            'workflow_timeout': args.workflow_timeout,
+            'max_slots': args.max_slots,
+            'pools': pools,
+            'output_format': args.output_format,
+            'output_file': args.output_file,
+            'trace_file': args.trace,
+            'profile': args.profile,
+            'profile_file': args.profile_file,
+            'history_file': None if args.no_history
+            else history.get_history_path(args.history),
+            'schedule': args.schedule,
+            'preflight': args.preflight,
+            'preflight_forks': args.preflight_forks,
+            'preflight_timeout': args.preflight_timeout,
+            'metrics_file': args.metrics_file,
+            'metrics_per_job': args.metrics_per_job,
+            'job_log_dir': args.job_log_dir,
+            'log_tail': args.log_tail,
+            'workspace_root': workspace.get_workspace_root(args.workspace),
+            'keep_failed': args.keep_failed,
+            'watch': args.watch}
+
+
+def parse_compile_args(argv: list) -> dict:
+    """ Parse arguments of `compile` sub command. """
+
+    prog: str = '{} compile'.format(os.path.basename(sys.argv[0]))
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description='Compile workflow file '
+                                                 'to plan file.')
+
+    parser.add_argument('workflow_file',
+                        type=str,
+                        help='Target workflow file path.')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        required=True,
+                        help='Output plan file path.')
+
+    args = parser.parse_args(argv)
+
+    return {'workflow_file': args.workflow_file,
+            'plan_file': args.output}
+
+
+def parse_batch_args(argv: list) -> dict:
+    """ Parse arguments of `batch` sub command. """
+
+    prog: str = '{} batch'.format(os.path.basename(sys.argv[0]))
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description='Run all of workflow runs '
+                                                 'in batch manifest file.')
+
+    parser.add_argument('manifest_file',
+                        type=str,
+                        help='Batch manifest file path.')
+    parser.add_argument('--max-parallel',
+                        type=int,
+                        default=1,
+                        help='Number of workflow runs executed at the same '
+                             'time. Default is `1`.')
+
+    add_workspace_arguments(parser)
+    add_auth_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if args.keep_failed < 0:
+        parser.error('`--keep-failed` has to be zero or positive.')
+
+    auth_extra_vars: str = generate_auth_extra_vars(args)
+
+    return {'dry_run': args.dry_run,
+            'manifest_file': args.manifest_file,
+            'max_parallel': args.max_parallel,
+            'auth_extra_vars': auth_extra_vars,
+            'workspace_root': workspace.get_workspace_root(args.workspace),
+            'keep_failed': args.keep_failed}
+
+
+def parse_history_args(argv: list) -> dict:
+    """ Parse arguments of `history` sub command. """
+
+    prog: str = '{} history'.format(os.path.basename(sys.argv[0]))
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description='Show durations of each '
+                                                 'job_template in run '
+                                                 'history.')
+
+    parser.add_argument('--history',
+                        type=str,
+                        help='Run history database file path. Default is '
+                             '`${}` or `{}`.'.format(history.HISTORY_ENV,
+                                                    history.DEFAULT_HISTORY))
+    parser.add_argument('--template',
+                        type=str,
+                        help='Show only this job_template.')
+    parser.add_argument('--window',
+                        type=int,
+                        default=history.DEFAULT_WINDOW,
+                        help='Number of the latest successful runs of each '
+                             'job_template. Default is `{}`.'
+                             .format(history.DEFAULT_WINDOW))
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=history.DEFAULT_THRESHOLD,
+                        help='The latest run slower than this times the '
+                             'median of earlier runs is regression. '
+                             'Default is `{}`.'
+                             .format(history.DEFAULT_THRESHOLD))
+
+    args = parser.parse_args(argv)
+    if args.window <= 1:
+        parser.error('`--window` has to be more than `1`.')
+    if args.threshold <= 0:
+        parser.error('`--threshold` has to be positive.')
+
+    return {'history_file': history.get_history_path(args.history),
+            'template': args.template,
+            'window': args.window,
+            'threshold': args.threshold}
+
+
+def parse_command(argv: list) -> (str, dict):
+    """
+    Parse command line arguments and return sub command name and it's args.
+    The args have the same names as `subcommand` function's parameters.
+    """
+
+    if argv[:1] == ['compile']:
+        return 'compile', parse_compile_args(argv[1:])
+
+    if argv[:1] == ['batch']:
+        return 'batch', parse_batch_args(argv[1:])
+
+    if argv[:1] == ['history']:
+        return 'history', parse_history_args(argv[1:])
+
+    args: dict = parse_args(argv)
+    if args.pop('watch'):
+        return 'watch', {'workflow_file': args['workflow_file'],
+                         'extra_vars': args['extra_vars']}
+
+    return 'execute', args
@@ -38,32 +38,80 @@ class AuthInfo:
         Generate Ansible extra_vars json for remote login auth.
         """
 
+        password: str = None
+        if self._ask_pass:
+            password = getpass.getpass('SSH password: ')
+
+        become_password: str = None
+        if self._ask_become_pass:
+            become_password = getpass.getpass('SUDO password: ')
+
+        credentials = Credentials(user=self._user, port=self._port,
+                                  password=password,
+                                  private_key=self._private_key,
+                                  become_user=self._become_user,
+                                  become_password=become_password)
+        return credentials.to_extra_vars()
+
+
+class CredentialsInvalid(Exception):
+    """
+    Given remote login auth can not be used.
+    """
+
+    def __init__(self, message):
+        super(CredentialsInvalid, self).__init__()
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class Credentials:
+    """
+    Data class for Ansible remote login auth given as values.
+    This doesn't prompt, so it's available without terminal.
+    """
+
+    def __init__(self, user: str = None, port: int = None,
+                 password: str = None, private_key: str = None,
+                 become_user: str = None, become_password: str = None):
+        if private_key and not os.path.isfile(private_key):
+            raise CredentialsInvalid("Specified private key not found. "
+                                     "private_key: '{}'".format(private_key))
+
+        self.user = user
+        self.port = port
+        self.password = password
+        self.private_key = private_key
+        self.become_user = become_user
+        self.become_password = become_password
+
+    def to_extra_vars(self) -> str:
+        """
+        Generate Ansible extra_vars json for remote login auth.
+        """
+
         auth_extra_vars = {}
 
         # necessary auth vars
-        if self._ask_pass:
-            ask_pass: str = getpass.getpass('SSH password: ')
-
-            auth_extra_vars['ansible_ssh_pass']: str = ask_pass
+        if self.password is not None:
+            auth_extra_vars['ansible_ssh_pass'] = self.password
         else:
-            auth_extra_vars['ansible_ssh_private_key_file']: str = \
-                self._private_key
+            auth_extra_vars['ansible_ssh_private_key_file'] = \
+                self.private_key
 
         # other options
-        if self._user:
-            auth_extra_vars['ansible_ssh_user']: str = self._user
+        if self.user:
+            auth_extra_vars['ansible_ssh_user'] = self.user
 
-        if self._port:
-            auth_extra_vars['ansible_port']: str = self._port
-
-        if self._become_user:
-            auth_extra_vars['ansible_become_user']: str = self._become_user
-
-        if self._ask_become_pass:
-            become_pass: str = getpass.getpass('SUDO password: ')
+        if self.port:
+            auth_extra_vars['ansible_port'] = self.port
 
-            auth_extra_vars['ansible_become_user']: str = become_pass
+        if self.become_user:
+            auth_extra_vars['ansible_become_user'] = self.become_user
 
-        auth_extra_vars_json: str = json.dumps(auth_extra_vars)
+        if self.become_password is not None:
+            auth_extra_vars['ansible_become_pass'] = self.become_password
 
-        return auth_extra_vars_json
+        return json.dumps(auth_extra_vars)
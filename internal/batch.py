@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Batch runner for many workflow runs in one process.
+"""
+
+from datetime import datetime, timezone
+import glob
+import itertools
+import json
+import multiprocessing
+from multiprocessing import connection
+import sys
+
+from internal import workspace, yaml_loader
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import node, tree
+
+
+class ManifestInvalid(Exception):
+    """
+    Batch manifest file is invalid.
+    """
+
+    def __init__(self, message):
+        super(ManifestInvalid, self).__init__()
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class BatchEntry:
+    """ Data class for one workflow run in batch. """
+
+    def __init__(self, index: int, workflow_file: str, inventory_file: str,
+                 extra_vars: dict, extra_vars_name: str):
+        self.index = index
+        self.workflow_file = workflow_file
+        self.inventory_file = inventory_file
+        self.extra_vars = extra_vars
+        self.extra_vars_name = extra_vars_name
+
+
+class BatchResult:
+    """ Data class for recording result of one workflow run in batch. """
+
+    def __init__(self, entry: BatchEntry):
+        self._start: datetime = datetime.now(timezone.utc)
+        self._end: datetime = self._start
+
+        self.entry: BatchEntry = entry
+        self.records: list = []
+        self.status: str = ''
+        self.message: str = ''
+        # Workspace of the failed run kept after the run.
+        self.kept_path: str = None
+
+    def set_records(self, records: list):
+        """ record job results of the workflow run """
+        self.records = records
+        self.status = records[-1].status if records else 'failed'
+        self._end = datetime.now(timezone.utc)
+
+    def set_successful(self):
+        """ record dry run result """
+        self.status = 'successful'
+        self._end = datetime.now(timezone.utc)
+
+    def set_error(self, message: str):
+        """ record the workflow run couldn't be completed """
+        self.status = 'failed'
+        self.message = message
+        self._end = datetime.now(timezone.utc)
+
+    def get_created_time(self) -> str:
+        """ get `created_time` for printing """
+        return self._start.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+    def get_elapsed_seconds(self) -> float:
+        """ get `elapsed` seconds of the workflow run """
+        return (self._end - self._start).total_seconds()
+
+
+def _as_list(value) -> list:
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _load_extra_vars(extra_vars) -> list:
+    """ Load `extra_vars` item in manifest to (name, dict) list. """
+
+    if isinstance(extra_vars, dict):
+        return [(json.dumps(extra_vars), extra_vars)]
+
+    if not extra_vars:
+        return [('', {})]
+
+    if isinstance(extra_vars, str) and extra_vars.startswith('@'):
+        # `@` path can be glob pattern to run each extra_vars file.
+        extra_vars_files: list = sorted(glob.glob(extra_vars[1:]))
+        if not extra_vars_files:
+            raise ManifestInvalid("extra_vars file not found: `{}`"
+                                  .format(extra_vars))
+
+        loaded = []
+        for extra_vars_file in extra_vars_files:
+            extra_vars_dict = yaml_loader.load_file(extra_vars_file)
+            loaded.append(('@{}'.format(extra_vars_file),
+                           extra_vars_dict or {}))
+        return loaded
+
+    extra_vars_dict = yaml_loader.loads(str(extra_vars))
+    if not isinstance(extra_vars_dict, dict):
+        raise ManifestInvalid("Specified `extra_vars` format is invalid: `{}`"
+                              .format(extra_vars))
+
+    return [(str(extra_vars), extra_vars_dict)]
+
+
+def read_manifest(manifest_file_path: str) -> [BatchEntry]:
+    """
+    Read batch manifest file.
+    Each run's `workflow_file`, `inventory_file` and `extra_vars` can be
+    list, and all of those combinations are run.
+    """
+
+    manifest = yaml_loader.load_file(manifest_file_path)
+
+    if not isinstance(manifest, dict) or \
+            not isinstance(manifest.get('runs'), list):
+        raise ManifestInvalid("Manifest file has to have `runs` list. "
+                              "manifest: '{}'".format(manifest_file_path))
+
+    entries = []
+    for run in manifest['runs']:
+        if 'workflow_file' not in run:
+            raise ManifestInvalid("`workflow_file` is not specified: `{}`"
+                                  .format(run))
+
+        workflow_files: list = _as_list(run['workflow_file'])
+        inventory_files: list = _as_list(run.get('inventory_file'))
+        extra_vars_list: list = []
+        for extra_vars in _as_list(run.get('extra_vars')):
+            extra_vars_list.extend(_load_extra_vars(extra_vars))
+
+        for workflow_file, inventory_file, (extra_vars_name, extra_vars) in \
+                itertools.product(workflow_files, inventory_files,
+                                  extra_vars_list):
+            entries.append(BatchEntry(len(entries) + 1, workflow_file,
+                                      inventory_file, extra_vars,
+                                      extra_vars_name))
+
+    return entries
+
+
+class BatchRunner:
+    """
+    Runner for many workflow runs.
+    Workflow files and playbooks are parsed once in this process,
+    and each run is executed by process forked from this process.
+    """
+
+    def __init__(self, entries: [BatchEntry], max_parallel: int = 1):
+        self.entries = entries
+        self.max_parallel = max(max_parallel, 1)
+
+        # parsed workflow tree and parse error by (workflow file, dry_run).
+        self._workflow_nodes = {}
+        self._parse_errors = {}
+
+    def _print_started(self, entry: BatchEntry):
+        print()
+        print('------ Batch run {}/{} started: {} {} ------'.format(
+            entry.index, len(self.entries), entry.workflow_file,
+            entry.extra_vars_name))
+
+    def _parse_workflow(self, workflow_file: str, dry_run: bool) -> str:
+        """
+        Parse workflow file once for each mode.
+        Return error message if it can not be parsed.
+        """
+
+        parse_key: tuple = (workflow_file, dry_run)
+        if parse_key not in self._workflow_nodes and \
+                parse_key not in self._parse_errors:
+            try:
+                self._workflow_nodes[parse_key] = \
+                    w_parser.parse(workflow_file, dry_run, {})
+            except OSError as exc:
+                self._parse_errors[parse_key] = str(exc)
+            except tree.ParseFailed as exc:
+                self._parse_errors[parse_key] = exc.message
+
+        return self._parse_errors.get(parse_key)
+
+    def dry_run(self):
+        """ Dry run each workflow run, and yield the result. """
+
+        for entry in self.entries:
+            self._print_started(entry)
+
+            result = BatchResult(entry)
+            parse_error: str = self._parse_workflow(entry.workflow_file, True)
+            if parse_error:
+                result.set_error(parse_error)
+                yield result
+                continue
+
+            # Parsed tree is prepared again with each run's `extra_vars`.
+            workflow_node: w_parser.WorkflowNode = \
+                self._workflow_nodes[(entry.workflow_file, True)]
+            top_node: node.Node = workflow_node.current_node
+            try:
+                tree.prepare_workflow_tree(top_node, True, entry.extra_vars)
+                w_run.WorkflowRunner(entry.inventory_file).dry_run(
+                    w_parser.WorkflowNode(top_node))
+            except w_parser.DryRunFailed as exc:
+                result.set_error(exc.message)
+            else:
+                result.set_successful()
+
+            yield result
+
+    def _run_entry(self, entry: BatchEntry, auth_extra_vars: str,
+                   workspace_root: str, keep_failed: int, result_conn):
+        """
+        This method is called in forked process.
+        Each run has own workspace which is kept if the run failed.
+        """
+
+        p_run.separate_local_tmp()
+
+        result = BatchResult(entry)
+        run_space = workspace.Workspace(workspace_root, keep_failed)
+        try:
+            with run_space:
+                workflow_node: w_parser.WorkflowNode = \
+                    self._workflow_nodes[(entry.workflow_file, False)]
+                workflow_node.current_node.prepare_job_node(
+                    False, extra_vars_arg=entry.extra_vars)
+
+                workflow = w_run.WorkflowRunner(entry.inventory_file)
+                result.set_records(workflow.run(
+                    workflow_node, auth_extra_vars, run_space.path))
+                if result.status != 'successful':
+                    run_space.mark_failed()
+        except BaseException as exc:
+            # Parent process waits this result, so it has to be sent
+            # even if Ansible exits by `sys.exit`.
+            result.set_error(repr(exc))
+        result.kept_path = run_space.kept_path
+
+        sys.stdout.flush()
+        result_conn.send(result)
+        result_conn.close()
+
+    @staticmethod
+    def _receive_result(result_conn, entry: BatchEntry,
+                        process) -> BatchResult:
+        try:
+            result: BatchResult = result_conn.recv()
+        except EOFError:
+            result = None
+        result_conn.close()
+        process.join()
+
+        if result is None:
+            # Process was killed or exited before sending the result.
+            result = BatchResult(entry)
+            result.set_error("Workflow run process exited without result. "
+                             "exitcode: {}".format(process.exitcode))
+        return result
+
+    def run(self, auth_extra_vars: str, workspace_root: str = None,
+            keep_failed: int = workspace.DEFAULT_KEEP_FAILED):
+        """
+        Run each workflow run with `max_parallel` processes,
+        and yield the result in finished order.
+        Each run has own workspace under `workspace_root`.
+        """
+
+        pending = []
+        for entry in self.entries:
+            parse_error: str = self._parse_workflow(entry.workflow_file,
+                                                    False)
+            if parse_error:
+                result = BatchResult(entry)
+                result.set_error(parse_error)
+                yield result
+            else:
+                pending.append(entry)
+
+        context = multiprocessing.get_context('fork')
+
+        # result receiving connection -> (entry, process)
+        running = {}
+        while pending or running:
+            while pending and len(running) < self.max_parallel:
+                entry: BatchEntry = pending.pop(0)
+                self._print_started(entry)
+
+                # Not flushed output would be printed by child process too.
+                sys.stdout.flush()
+                result_conn, child_conn = context.Pipe(duplex=False)
+                process = context.Process(target=self._run_entry,
+                                          args=(entry, auth_extra_vars,
+                                                workspace_root, keep_failed,
+                                                child_conn))
+                process.start()
+                child_conn.close()
+                running[result_conn] = (entry, process)
+
+            # Wait result or exit of any process.
+            sentinels: list = [process.sentinel
+                               for _, process in running.values()]
+            ready: list = connection.wait(list(running) + sentinels)
+
+            for result_conn, (entry, process) in list(running.items()):
+                if result_conn in ready or process.sentinel in ready:
+                    del running[result_conn]
+                    yield self._receive_result(result_conn, entry, process)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Client for workflow runner server.
+This module doesn't import Ansible, so it starts fast.
+"""
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = '/tmp/workflow_runner/workflow_runner.sock'
+
+
+def get_socket_path(socket_path: str = None) -> str:
+    """ Socket path from argument, environment variable or default. """
+
+    if socket_path:
+        return socket_path
+    return os.environ.get('WORKFLOW_RUNNER_SOCKET', DEFAULT_SOCKET)
+
+
+def send_message(conn: socket.socket, message: dict):
+    """ Send one JSON line message. """
+    conn.sendall((json.dumps(message) + '\n').encode())
+
+
+def request(command: str, args: dict, socket_path: str = None,
+            output=None) -> int:
+    """
+    Send sub command request to server, and write output streamed back.
+    Return exit code of the sub command.
+    """
+
+    if output is None:
+        output = sys.stdout
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(get_socket_path(socket_path))
+        send_message(conn, {'command': command,
+                            'cwd': os.getcwd(),
+                            'args': args})
+
+        with conn.makefile('rb') as rfile:
+            for line in rfile:
+                message: dict = json.loads(line)
+                if 'exit_code' in message:
+                    return message['exit_code']
+
+                output.write(message['output'])
+                output.flush()
+
+    output.write('Server closed the connection before the end.\n')
+    return 1
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Run history of workflows and jobs in local SQLite database.
+
+Each finished job's record is written in one transaction,
+including jobs of it's sub-workflow.
+Durations of each job_template are summarized by percentiles,
+and the latest run slower than `threshold` times the median of
+earlier runs is flagged as regression.
+Medians are also used to decide dispatch order of sibling jobs.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import time
+
+from internal import result_writer
+
+HISTORY_ENV = 'WORKFLOW_RUNNER_HISTORY'
+DEFAULT_HISTORY = os.path.join('~', '.workflow_runner', 'history.db')
+
+# Number of the latest successful runs of each job_template summarized.
+DEFAULT_WINDOW = 100
+# The latest run slower than this times the median is regression.
+DEFAULT_THRESHOLD = 1.5
+# Number of earlier runs needed to judge regression.
+MIN_BASELINE = 3
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY,
+        workflow TEXT NOT NULL,
+        started REAL NOT NULL,
+        status TEXT NOT NULL,
+        elapsed REAL)""",
+    """CREATE TABLE IF NOT EXISTS jobs (
+        run_id INTEGER NOT NULL,
+        workflow TEXT NOT NULL,
+        job_id TEXT NOT NULL,
+        node_id INTEGER NOT NULL,
+        template TEXT NOT NULL,
+        type TEXT NOT NULL,
+        playbook_hash TEXT,
+        status TEXT NOT NULL,
+        started REAL NOT NULL,
+        elapsed REAL NOT NULL,
+        hosts INTEGER)""",
+    # Summary reads the latest runs of each job_template by this index.
+    """CREATE INDEX IF NOT EXISTS jobs_template
+        ON jobs (template, status, started)""",
+    "CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id)")
+
+
+def get_history_path(history_path: str = None) -> str:
+    """ History database path by argument, environment or default. """
+
+    if not history_path:
+        history_path = os.environ.get(HISTORY_ENV) or DEFAULT_HISTORY
+    return os.path.expanduser(history_path)
+
+
+def connect(history_file: str) -> sqlite3.Connection:
+    """ Open history database, and create tables if those don't exist. """
+
+    dir_path: str = os.path.dirname(os.path.abspath(history_file))
+    os.makedirs(dir_path, exist_ok=True)
+
+    conn = sqlite3.connect(history_file)
+    # Readers of summary don't block writing runs.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+class HistoryRecorder:
+    """ Writer of one workflow run's records. """
+
+    def __init__(self, history_file: str, workflow_file: str,
+                 host_counter=None):
+        self.workflow_file: str = os.path.abspath(workflow_file)
+        # Object which has `count(playbook_path)` returning hosts number.
+        # Ansible isn't imported by this module for `history` command.
+        self.host_counter = host_counter
+
+        self._conn: sqlite3.Connection = connect(history_file)
+        with self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (workflow, started, status) '
+                'VALUES (?, ?, ?)', (self.workflow_file, time.time(),
+                                     'running'))
+        self.run_id: int = cursor.lastrowid
+
+        # Each file is read once in the run.
+        self._hashes = {}
+
+    def _get_hash(self, file_path: str) -> str:
+        if file_path not in self._hashes:
+            digest: str = None
+            if os.path.isfile(file_path):
+                with open(file_path, 'rb') as hsf:
+                    digest = hashlib.sha256(hsf.read()).hexdigest()
+            self._hashes[file_path] = digest
+        return self._hashes[file_path]
+
+    def _count_hosts(self, playbook_path: str) -> int:
+        if self.host_counter is None:
+            return None
+        try:
+            return self.host_counter.count(playbook_path)
+        except Exception:
+            # Failure of counting hosts doesn't stop recording.
+            return None
+
+    def record_job(self, record):
+        """ Write the finished `JobRecord` and it's sub-workflow's records. """
+
+        rows = []
+        for job_id, job_record in result_writer.walk_records([record]):
+            hosts: int = None
+            if job_record.type == 'job_template':
+                hosts = self._count_hosts(job_record.playbook_path)
+
+            rows.append((self.run_id, self.workflow_file, job_id,
+                         job_record.node_id, job_record.job_template_name,
+                         job_record.type,
+                         self._get_hash(job_record.playbook_path),
+                         job_record.status,
+                         job_record.get_created_timestamp(),
+                         job_record.get_elapsed_seconds(), hosts))
+
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows)
+
+    def record_workflow(self, status: str, elapsed: float):
+        """ Write the ended workflow's result. """
+
+        with self._conn:
+            self._conn.execute(
+                'UPDATE runs SET status = ?, elapsed = ? WHERE run_id = ?',
+                (status, elapsed, self.run_id))
+
+    def close(self):
+        """ Close database. """
+        self._conn.close()
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    """ Nearest-rank percentile. """
+
+    rank: int = math.ceil(len(sorted_values) * percent / 100)
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def get_durations(history_file: str,
+                  window: int = DEFAULT_WINDOW) -> dict:
+    """
+    Median seconds of the latest successful runs of each job_template
+    or sub-workflow. Empty if nothing has been recorded.
+    """
+
+    if not os.path.exists(history_file):
+        return {}
+    return {summary['template']: summary['p50']
+            for summary in summarize(history_file, window=window)}
+
+
+def summarize(history_file: str, template: str = None,
+              window: int = DEFAULT_WINDOW,
+              threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Percentile durations of the latest successful runs of each
+    job_template or sub-workflow, and whether the latest run regressed.
+    """
+
+    conn: sqlite3.Connection = connect(history_file)
+    try:
+        if template:
+            templates = [template]
+        else:
+            templates = [row[0] for row in conn.execute(
+                'SELECT DISTINCT template FROM jobs ORDER BY template')]
+
+        summaries = []
+        for name in templates:
+            # Latest first.
+            durations = [row[0] for row in conn.execute(
+                'SELECT elapsed FROM jobs '
+                "WHERE template = ? AND status = 'successful' "
+                'ORDER BY started DESC LIMIT ?', (name, window))]
+            if not durations:
+                continue
+
+            sorted_durations: list = sorted(durations)
+            baseline: list = sorted(durations[1:])
+            ratio: float = None
+            if len(baseline) >= MIN_BASELINE:
+                median: float = _percentile(baseline, 50)
+                ratio = durations[0] / median if median else None
+
+            summaries.append({
+                'template': name,
+                'runs': len(durations),
+                'p50': _percentile(sorted_durations, 50),
+                'p90': _percentile(sorted_durations, 90),
+                'p95': _percentile(sorted_durations, 95),
+                'max': sorted_durations[-1],
+                'latest': durations[0],
+                'ratio': ratio,
+                'regressed': ratio is not None and ratio > threshold})
+    finally:
+        conn.close()
+
+    return summaries
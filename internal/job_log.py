@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Capture of each job's output to compressed log file.
+
+While a job runs, stdout and stderr of the process are redirected to
+a pipe, including Ansible's forked workers and it's own `sys.stdout`.
+Output is streamed from the pipe to gzip file, and only the last lines
+are kept in memory, so memory doesn't grow with verbose playbooks.
+Redirection is for the whole process, so jobs captured at the same
+time have to run in separate processes like forked jobs.
+
+Workflow runner isn't imported, so client doesn't import Ansible.
+"""
+
+import codecs
+import collections
+import gzip
+import os
+import select
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+# Number of the last lines of each job kept in memory.
+DEFAULT_TAIL = 20
+# Characters kept of each line in tail. Log file has whole lines.
+MAX_LINE = 4096
+
+# Bytes read from pipe at once.
+_READ_SIZE = 65536
+# Seconds to wait output of processes which outlive the job.
+_DRAIN_TIMEOUT = 1.0
+
+
+def create_log_file(log_dir: str, job_name: str) -> str:
+    """
+    Create empty log file of the job in `log_dir`.
+    File name is unique among jobs of the same name in forked processes.
+    """
+
+    fd, log_path = tempfile.mkstemp(prefix='{}-'.format(job_name),
+                                    suffix='.log.gz', dir=log_dir)
+    os.close(fd)
+    return log_path
+
+
+class _Tail:
+    """ Ring buffer of the last lines of output stream. """
+
+    def __init__(self, max_lines: int):
+        self.lines = collections.deque(maxlen=max_lines)
+        # Last line which isn't ended by newline yet.
+        self._partial = ''
+
+    def feed(self, text: str):
+        """ Add output, and keep the last lines. """
+
+        lines: list = (self._partial + text).split('\n')
+        self._partial = lines.pop()[:MAX_LINE]
+        self.lines.extend(line[:MAX_LINE] for line in lines)
+
+    def get_lines(self) -> tuple:
+        """ The last lines including not ended line. """
+
+        if not self.lines.maxlen:
+            return ()
+        lines: list = list(self.lines)
+        if self._partial:
+            lines.append(self._partial)
+        return tuple(lines[-self.lines.maxlen:])
+
+
+class OutputCapture:
+    """
+    Context manager which writes stdout and stderr to `log_path`.
+    The last `tail_lines` lines are `tail` after exiting.
+    """
+
+    def __init__(self, log_path: str, tail_lines: int = DEFAULT_TAIL):
+        self.log_path = log_path
+        self._tail = _Tail(tail_lines)
+        self._read_fd: int = None
+        self._saved_fds: tuple = ()
+        self._saved_streams: tuple = ()
+        # `time.monotonic()` until when output is read after exiting.
+        self._drain_end: float = None
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def tail(self) -> tuple:
+        """ The last lines of captured output. """
+        return self._tail.get_lines()
+
+    def _read_output(self):
+        # Multi-byte character may be split between chunks.
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        with gzip.open(self.log_path, 'wb') as lgf:
+            while True:
+                readable, _, _ = select.select([self._read_fd], [], [],
+                                               _DRAIN_TIMEOUT)
+                if readable:
+                    data: bytes = os.read(self._read_fd, _READ_SIZE)
+                    if not data:
+                        break
+                    lgf.write(data)
+                    self._tail.feed(decoder.decode(data))
+                # Writer may be kept open by process outliving the job.
+                if self._stopping.is_set() and \
+                        (not readable or time.monotonic() > self._drain_end):
+                    break
+            self._tail.feed(decoder.decode(b'', True))
+        os.close(self._read_fd)
+
+    def __enter__(self) -> 'OutputCapture':
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        self._read_fd, write_fd = os.pipe()
+        self._saved_fds = (os.dup(1), os.dup(2))
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        os.close(write_fd)
+
+        # `sys.stdout` may not be fd 1, like output stream of server.
+        self._saved_streams = (sys.stdout, sys.stderr)
+        sys.stdout = sys.stderr = open(os.dup(1), 'w', buffering=1,
+                                       errors='backslashreplace')
+
+        self._thread = threading.Thread(target=self._read_output,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        capture_stream = sys.stdout
+        sys.stdout, sys.stderr = self._saved_streams
+        capture_stream.close()
+
+        for fd, saved_fd in zip((1, 2), self._saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+
+        self._drain_end = time.monotonic() + _DRAIN_TIMEOUT
+        self._stopping.set()
+        self._thread.join()
+        return False
+
+
+def read_tail(log_path: str, tail_lines: int = DEFAULT_TAIL) -> tuple:
+    """
+    The last lines of log file.
+    Log file of killed job may be cut off, and it's readable part is read.
+    """
+
+    tail = _Tail(tail_lines)
+    try:
+        with gzip.open(log_path, 'rt', errors='replace') as lgf:
+            for line in lgf:
+                tail.feed(line)
+    except (OSError, EOFError, zlib.error):
+        pass
+    return tail.get_lines()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Metrics of a workflow run in OpenMetrics text format.
+
+The file is written for node-exporter's textfile collector,
+at the end of the run and optionally at each finished job.
+It's written to temporary file and renamed,
+so scrapers don't read half written metrics.
+Every metric has `workflow` label of workflow file name,
+so runs of different workflows can be written to the same directory.
+
+Workflow runner isn't imported, so client doesn't import Ansible.
+"""
+
+import math
+import os
+import pathlib
+import tempfile
+import time
+
+from internal import result_writer
+
+PREFIX = 'workflow_runner'
+
+# Upper bounds of seconds of each bucket. `+Inf` is added at writing.
+DURATION_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+                    1800.0, 3600.0)
+QUEUE_WAIT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_labels(labels: tuple) -> str:
+    return '{{{}}}'.format(','.join('{}="{}"'.format(name, _escape(value))
+                                    for name, value in labels))
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """ Cumulative histogram of observed values. """
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple):
+        self.buckets: tuple = tuple(buckets) + (math.inf,)
+        self.counts: list = [0] * len(self.buckets)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float):
+        """ Add value to buckets which upper bound is not less than it. """
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsWriter:
+    """ Collector of one workflow run's metrics and writer of the file. """
+
+    def __init__(self, metrics_file: str, workflow_file: str,
+                 host_counter=None, per_job: bool = False):
+        self.metrics_file = metrics_file
+        self.workflow_name: str = pathlib.Path(workflow_file).name
+        # Object which has `count(playbook_path)` returning hosts number.
+        self.host_counter = host_counter
+        # Write the file at each finished job, not only at the end.
+        self.per_job = per_job
+
+        self.started: float = time.time()
+        # key: label values without `workflow`.
+        self._durations = {}
+        self._queue_waits = {}
+        self._jobs = {}
+        self._stats_capture = {}
+        self._hosts = {}
+        # (status, elapsed) of the ended workflow.
+        self._workflow: tuple = None
+
+    def _count_hosts(self, playbook_path: str) -> int:
+        if self.host_counter is None:
+            return None
+        try:
+            return self.host_counter.count(playbook_path)
+        except Exception:
+            # Failure of counting hosts doesn't stop writing metrics.
+            return None
+
+    def record_job(self, record):
+        """ Add the finished `JobRecord` and it's sub-workflow's records. """
+
+        for _, job in result_writer.walk_records([record]):
+            template: tuple = (('template', job.job_template_name),)
+            key: tuple = template + (('type', job.type),
+                                     ('status', job.status))
+            self._jobs[key] = self._jobs.get(key, 0) + 1
+            if job.type == 'workflow_job':
+                # Sub-workflow's time is observed by it's jobs.
+                continue
+
+            self._queue_waits.setdefault(
+                template, Histogram(QUEUE_WAIT_BUCKETS)).observe(
+                    job.get_queue_wait_seconds())
+            if job.status == 'canceled':
+                # Skipped or killed job didn't process hosts.
+                continue
+
+            self._durations.setdefault(
+                template, Histogram(DURATION_BUCKETS)).observe(
+                    job.get_elapsed_seconds())
+            self._stats_capture[template] = \
+                self._stats_capture.get(template, 0.0) + \
+                job.get_stats_capture_seconds()
+            hosts: int = self._count_hosts(job.playbook_path)
+            if hosts is not None:
+                self._hosts[template] = self._hosts.get(template, 0) + hosts
+
+        if self.per_job:
+            self.write()
+
+    def record_workflow(self, status: str, elapsed: float):
+        """ Add the ended workflow's result, and write the file. """
+
+        self._workflow = (status, elapsed)
+        self.write()
+
+    def _get_lines(self) -> list:
+        workflow: tuple = (('workflow', self.workflow_name),)
+        lines = []
+
+        def add_family(name: str, metric_type: str, help_text: str,
+                       unit: str = None):
+            lines.append('# TYPE {}_{} {}'.format(PREFIX, name, metric_type))
+            if unit:
+                lines.append('# UNIT {}_{} {}'.format(PREFIX, name, unit))
+            lines.append('# HELP {}_{} {}'.format(PREFIX, name, help_text))
+
+        def add_sample(name: str, labels: tuple, value: float):
+            lines.append('{}_{}{} {}'.format(PREFIX, name,
+                                             _format_labels(workflow + labels),
+                                             _format_value(value)))
+
+        def add_histograms(name: str, histograms: dict):
+            for labels, histogram in sorted(histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    add_sample('{}_bucket'.format(name),
+                               labels + (('le', _format_value(bound)),),
+                               count)
+                add_sample('{}_count'.format(name), labels, histogram.count)
+                add_sample('{}_sum'.format(name), labels, histogram.sum)
+
+        def add_counters(name: str, counters: dict):
+            for labels, value in sorted(counters.items()):
+                add_sample('{}_total'.format(name), labels, value)
+
+        add_family('workflow_start_timestamp_seconds', 'gauge',
+                   'Unix time when the workflow run started.', 'seconds')
+        add_sample('workflow_start_timestamp_seconds', (), self.started)
+        if self._workflow:
+            status, elapsed = self._workflow
+            add_family('workflow_duration_seconds', 'gauge',
+                       'Seconds from start to end of the workflow run.',
+                       'seconds')
+            add_sample('workflow_duration_seconds', (), elapsed)
+            add_family('workflow_successful', 'gauge',
+                       '1 if the workflow run was successful, or 0.')
+            add_sample('workflow_successful', (),
+                       int(status == 'successful'))
+
+        add_family('job_duration_seconds', 'histogram',
+                   'Seconds each job_template ran including retries.',
+                   'seconds')
+        add_histograms('job_duration_seconds', self._durations)
+        add_family('job_queue_wait_seconds', 'histogram',
+                   'Seconds each job waited for parent job or slots.',
+                   'seconds')
+        add_histograms('job_queue_wait_seconds', self._queue_waits)
+        add_family('jobs', 'counter', 'Finished jobs by status.')
+        add_counters('jobs', self._jobs)
+        add_family('set_stats_capture_seconds', 'counter',
+                   'Seconds reading `set_stats` values after jobs.',
+                   'seconds')
+        add_counters('set_stats_capture_seconds', self._stats_capture)
+        add_family('hosts_processed', 'counter',
+                   'Inventory hosts targeted by finished jobs.')
+        add_counters('hosts_processed', self._hosts)
+
+        lines.append('# EOF')
+        return lines
+
+    def write(self):
+        """ Replace the metrics file with the current metrics. """
+
+        dir_path: str = os.path.dirname(os.path.abspath(self.metrics_file))
+        # Temporary file is in the same directory to be renamed atomically.
+        # Collector ignores it because it doesn't end with `.prom`.
+        fd, tmp_path = tempfile.mkstemp(
+            prefix='.{}.'.format(os.path.basename(self.metrics_file)),
+            suffix='.tmp', dir=dir_path)
+        try:
+            with os.fdopen(fd, 'w') as mtf:
+                mtf.write('\n'.join(self._get_lines()))
+                mtf.write('\n')
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.metrics_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -1,42 +1,54 @@
 #!/usr/bin/env python3
 """
 Parse playbook structure and extract local variables.
+
+Playbook is analyzed with files which it refers by `import_playbook`,
+`vars_files`, `roles`, `include_tasks`, `import_tasks`, `include_role`
+and `import_role`. Analysis of each file is memoized in this process,
+so files shared by many playbooks are parsed once.
 """
 
-import yaml
+import os
+
+from internal import yaml_loader
 
 ANSIBLE_RESERVED_WORDS = {'inventory_dir', 'inventory_hostname'}
 
+TASK_LIST_KEYS = ('pre_tasks', 'roles', 'tasks', 'post_tasks', 'handlers')
+BLOCK_KEYS = ('block', 'rescue', 'always')
+INCLUDE_TASKS_KEYS = ('include_tasks', 'import_tasks', 'include')
+INCLUDE_ROLE_KEYS = ('include_role', 'import_role')
+# Keys of role entry in `roles` which are not role parameters.
+ROLE_ENTRY_KEYS = {'role', 'name', 'tags', 'when', 'become', 'become_user',
+                   'vars', 'environment', 'delegate_to'}
 
-def get_defined_variable_keys(playbook_path: str) -> dict:
-    """ Extract local defined variables in target playbook. """
+# Analysis result by file.
+# key: (kind, path), value: (dependent files' stat, analysis)
+_analysis_cache = {}
 
-    set_stats = []
-    set_fact = {}
 
-    with open(playbook_path, 'r') as pbf:
-        playbook: dict = yaml.load(stream=pbf, Loader=yaml.SafeLoader)[0]
+def _get_file_key(file_path: str) -> tuple:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
-        if 'vars' in playbook:
-            defined_on_vars_header: set = set(playbook['vars'].keys())
-        else:
-            defined_on_vars_header = set()
 
-        tasks: list = playbook['tasks']
-        for idx, task in enumerate(tasks):
-            if 'set_stats' in task:
-                for stats_name in task['set_stats']['data'].keys():
-                    set_stats.append(stats_name)
+def _is_valid(files: tuple) -> bool:
+    return all(_get_file_key(path) == file_key for path, file_key in files)
 
-            defined_fact = set()
-            if 'set_fact' in task:
-                for fact_name in task['set_fact'].keys():
-                    defined_fact.add(fact_name)
 
-            set_fact[idx]: set = defined_fact
+def _load_yaml(file_path: str):
+    return yaml_loader.load_file(file_path)
 
-    return {'set_stats': set_stats, 'set_fact': set_fact,
-            'vars': defined_on_vars_header}
+
+def _find_yaml(dir_path: str, name: str) -> str:
+    for suffix in ('.yml', '.yaml', ''):
+        file_path: str = os.path.join(dir_path, name + suffix)
+        if os.path.isfile(file_path):
+            return file_path
+    return ''
 
 
 def _is_variable(value) -> bool:
@@ -90,30 +102,415 @@ def _parse_task_dick(task_dict: dict, necessary: set) -> set:
     return necessary
 
 
-def get_necessary_variable_keys(playbook_path: str) -> tuple:
+def _get_vars_necessary(vars_dict: dict) -> set:
+    """ Variables which are used in values of `vars` like section. """
+
+    necessary = set()
+    for value in vars_dict.values():
+        if _is_variable(value):
+            necessary = necessary | _get_variable_name(value)
+    return necessary
+
+
+class _Analysis:
+    """
+    Variables analysis of a sequence of steps.
+    Each step's necessary variables which are defined by former steps
+    are not necessary for the whole sequence.
+    """
+
+    def __init__(self):
+        self.necessary = set()
+        self.defined = set()
+        self.set_stats = []
+        # variable name -> locations which define it.
+        self.set_fact = {}
+        self.vars = {}
+        # dependent files and those stat.
+        self.files = set()
+
+    def add_step(self, necessary: set, defined: set = frozenset()):
+        """ Add step which runs after former steps. """
+        self.necessary |= necessary - self.defined
+        self.defined |= defined
+
+    def add_fact(self, fact_name: str, location: str):
+        """ Add variable defined by `set_fact` task. """
+        self.set_fact.setdefault(fact_name, []).append(location)
+        self.defined.add(fact_name)
+
+    def add_vars(self, var_names, location: str):
+        """ Add variables defined by vars section. """
+        for var_name in var_names:
+            self.vars.setdefault(var_name, []).append(location)
+        self.defined |= set(var_names)
+
+    def add_analysis(self, other, extra_defined: set = frozenset()):
+        """ Add other file's analysis as one step. """
+        self.add_step(other.necessary - extra_defined, other.defined)
+        for fact_name, locations in other.set_fact.items():
+            self.set_fact.setdefault(fact_name, []).extend(locations)
+        for var_name, locations in other.vars.items():
+            self.vars.setdefault(var_name, []).extend(locations)
+        self.files |= other.files
+
+    def add_file(self, file_path: str):
+        """ Record the file which this analysis depends on. """
+        self.files.add((file_path, _get_file_key(file_path)))
+
+
+def _get_cached(kind: str, file_path: str) -> _Analysis:
+    cached: tuple = _analysis_cache.get((kind, file_path))
+    if cached and _is_valid(cached[0]):
+        return cached[1]
+    return None
+
+
+def _set_cached(kind: str, file_path: str, analysis: _Analysis):
+    _analysis_cache[(kind, file_path)] = (tuple(analysis.files), analysis)
+
+
+def _get_loop_vars(task: dict) -> set:
+    loop_keys = [key for key in task if key == 'loop' or
+                 key.startswith('with_')]
+    if not loop_keys:
+        return set()
+
+    loop_control = task.get('loop_control')
+    if isinstance(loop_control, dict) and 'loop_var' in loop_control:
+        return {loop_control['loop_var']}
+    return {'item'}
+
+
+def _get_static_path(value) -> str:
+    """ File path which is not templated, or empty string. """
+
+    if isinstance(value, dict):
+        value = value.get('file', '')
+    if not isinstance(value, str) or '{{' in value:
+        return ''
+    return value.split()[0] if value else ''
+
+
+def _analyze_task(task: dict, base_dir: str, location: str,
+                  analysis: _Analysis, stack: list):
+    task_vars: dict = task.get('vars') if isinstance(task.get('vars'),
+                                                     dict) else {}
+    local_defined: set = set(task_vars) | _get_loop_vars(task)
+
+    if any(key in task for key in BLOCK_KEYS):
+        # Block's own keywords like `when` are evaluated first.
+        block_dict = {key: val for key, val in task.items()
+                      if key not in BLOCK_KEYS}
+        analysis.add_step(_parse_task_dick(block_dict, set()) -
+                          local_defined)
+        for key in BLOCK_KEYS:
+            sub: _Analysis = _analyze_tasks(
+                task.get(key), base_dir, '{}.{}'.format(location, key), stack)
+            analysis.add_analysis(sub, local_defined)
+        return
+
+    necessary: set = _parse_task_dick(task, set()) - local_defined
+
+    defined = set()
+    if isinstance(task.get('set_fact'), dict):
+        for fact_name in task['set_fact'].keys():
+            analysis.add_fact(fact_name, location)
+            defined.add(fact_name)
+    analysis.add_step(necessary - defined)
+
+    for key in INCLUDE_TASKS_KEYS:
+        include_path: str = _get_static_path(task.get(key))
+        if include_path:
+            sub = _analyze_task_file(os.path.join(base_dir, include_path),
+                                     stack)
+            if sub:
+                analysis.add_analysis(sub, local_defined)
+
+    for key in INCLUDE_ROLE_KEYS:
+        role_value = task.get(key)
+        role_name = role_value.get('name') if isinstance(role_value, dict) \
+            else role_value
+        if isinstance(role_name, str):
+            sub = _analyze_role(role_name, base_dir, stack)
+            if sub:
+                analysis.add_analysis(sub, local_defined)
+
+
+def _analyze_tasks(tasks: list, base_dir: str, location: str,
+                   stack: list) -> _Analysis:
+    """ Analyze task list in order. """
+
+    analysis = _Analysis()
+    for idx, task in enumerate(tasks or []):
+        if isinstance(task, dict):
+            _analyze_task(task, base_dir, '{}[{}]'.format(location, idx),
+                          analysis, stack)
+    return analysis
+
+
+def _analyze_task_file(file_path: str, stack: list) -> _Analysis:
+    """ Analyze included task file. It's result is memoized. """
+
+    file_path = os.path.abspath(file_path)
+    cached: _Analysis = _get_cached('tasks', file_path)
+    if cached:
+        return cached
+    if file_path in stack or not os.path.isfile(file_path):
+        # Circular include or not resolvable file isn't followed.
+        return None
+
+    stack.append(file_path)
+    analysis: _Analysis = _analyze_tasks(_load_yaml(file_path),
+                                         os.path.dirname(file_path),
+                                         file_path, stack)
+    stack.pop()
+
+    analysis.add_file(file_path)
+    _set_cached('tasks', file_path, analysis)
+    return analysis
+
+
+def _find_role_dir(role_name: str, base_dir: str) -> str:
+    search_dirs: list = [os.path.join(base_dir, 'roles'), base_dir,
+                         os.path.dirname(base_dir)]
+    roles_path: str = os.environ.get('ANSIBLE_ROLES_PATH', '')
+    search_dirs.extend(path for path in roles_path.split(os.pathsep) if path)
+
+    for search_dir in search_dirs:
+        role_dir: str = os.path.join(search_dir, role_name)
+        if os.path.isdir(os.path.join(role_dir, 'tasks')) or \
+                os.path.isdir(os.path.join(role_dir, 'defaults')):
+            return os.path.abspath(role_dir)
+    return ''
+
+
+def _get_role_entry(entry) -> (str, set):
+    """ Role name and parameters of `roles` or `dependencies` entry. """
+
+    if isinstance(entry, str):
+        return entry, set()
+    if not isinstance(entry, dict):
+        return '', set()
+
+    role_name = entry.get('role', entry.get('name', ''))
+    params: set = {key for key in entry if key not in ROLE_ENTRY_KEYS}
+    if isinstance(entry.get('vars'), dict):
+        params |= set(entry['vars'])
+    return role_name, params
+
+
+def _analyze_role(role_name: str, base_dir: str, stack: list) -> _Analysis:
+    """ Analyze role's defaults, vars, dependencies, tasks and handlers. """
+
+    role_dir: str = _find_role_dir(role_name, base_dir)
+    if not role_dir:
+        return None
+
+    cached: _Analysis = _get_cached('role', role_dir)
+    if cached:
+        return cached
+    if role_dir in stack:
+        return None
+
+    stack.append(role_dir)
+    analysis = _Analysis()
+    location: str = 'role:{}'.format(role_name)
+
+    for vars_dir in ('defaults', 'vars'):
+        vars_path: str = _find_yaml(os.path.join(role_dir, vars_dir), 'main')
+        if vars_path:
+            analysis.add_file(vars_path)
+            role_vars = _load_yaml(vars_path)
+            if isinstance(role_vars, dict):
+                analysis.add_step(_get_vars_necessary(role_vars))
+                analysis.add_vars(role_vars.keys(),
+                                  '{}/{}'.format(location, vars_dir))
+
+    meta_path: str = _find_yaml(os.path.join(role_dir, 'meta'), 'main')
+    if meta_path:
+        analysis.add_file(meta_path)
+        meta = _load_yaml(meta_path)
+        dependencies: list = []
+        if isinstance(meta, dict) and meta.get('dependencies'):
+            dependencies = meta['dependencies']
+        for dependency in dependencies:
+            dependency_name, params = _get_role_entry(dependency)
+            if dependency_name:
+                sub: _Analysis = _analyze_role(dependency_name, role_dir,
+                                               stack)
+                if sub:
+                    analysis.add_analysis(sub, params)
+
+    for tasks_dir in ('tasks', 'handlers'):
+        tasks_path: str = _find_yaml(os.path.join(role_dir, tasks_dir),
+                                     'main')
+        if tasks_path:
+            sub = _analyze_task_file(tasks_path, stack)
+            if sub:
+                analysis.add_analysis(sub)
+
+    stack.pop()
+
+    _set_cached('role', role_dir, analysis)
+    return analysis
+
+
+def _analyze_play(play: dict, base_dir: str, location: str,
+                  analysis: _Analysis, stack: list):
+    play_analysis = _Analysis()
+
+    for key in ('vars', 'environment'):
+        if isinstance(play.get(key), dict):
+            play_analysis.add_step(_get_vars_necessary(play[key]))
+    if isinstance(play.get('vars'), dict):
+        play_analysis.add_vars(play['vars'].keys(),
+                               '{}.vars'.format(location))
+
+    vars_files = play.get('vars_files') or []
+    for vars_file in vars_files if isinstance(vars_files, list) else []:
+        vars_path: str = _get_static_path(vars_file)
+        if vars_path:
+            vars_path = os.path.join(base_dir, vars_path)
+        if vars_path and os.path.isfile(vars_path):
+            play_analysis.add_file(os.path.abspath(vars_path))
+            file_vars = _load_yaml(vars_path)
+            if isinstance(file_vars, dict):
+                play_analysis.add_vars(file_vars.keys(),
+                                       'vars_files:{}'.format(vars_path))
+
+    for key in TASK_LIST_KEYS:
+        if key != 'roles':
+            play_analysis.add_analysis(_analyze_tasks(
+                play.get(key), base_dir, '{}.{}'.format(location, key),
+                stack))
+            continue
+
+        for role_entry in play.get('roles') or []:
+            role_name, params = _get_role_entry(role_entry)
+            sub: _Analysis = _analyze_role(role_name, base_dir, stack) \
+                if role_name else None
+            if sub:
+                play_analysis.add_analysis(sub, params)
+
+    # Facts are kept over plays, but play's vars are not.
+    play_defined: set = set(play_analysis.set_fact)
+    analysis.add_step(play_analysis.necessary, play_defined)
+    for fact_name, locations in play_analysis.set_fact.items():
+        analysis.set_fact.setdefault(fact_name, []).extend(locations)
+    for var_name, locations in play_analysis.vars.items():
+        analysis.vars.setdefault(var_name, []).extend(locations)
+    analysis.files |= play_analysis.files
+
+
+def _get_set_stats(playbook: list) -> list:
+    """
+    `set_stats` variables in the first play's tasks.
+    Only those are passed to next job_template by workflow runner.
+    """
+
+    set_stats = []
+    first_play = playbook[0] if playbook else {}
+    for task in first_play.get('tasks') or []:
+        if isinstance(task, dict) and 'set_stats' in task:
+            for stats_name in task['set_stats']['data'].keys():
+                set_stats.append(stats_name)
+    return set_stats
+
+
+def _analyze_playbook_file(playbook_path: str, stack: list) -> _Analysis:
+    playbook_path = os.path.abspath(playbook_path)
+    cached: _Analysis = _get_cached('playbook', playbook_path)
+    if cached:
+        return cached
+    if playbook_path in stack:
+        return None
+
+    stack.append(playbook_path)
+    playbook: list = _load_yaml(playbook_path) or []
+    base_dir: str = os.path.dirname(playbook_path)
+
+    analysis = _Analysis()
+    for idx, play in enumerate(playbook):
+        if not isinstance(play, dict):
+            continue
+
+        import_path: str = _get_static_path(play.get('import_playbook'))
+        if import_path:
+            sub: _Analysis = _analyze_playbook_file(
+                os.path.join(base_dir, import_path), stack)
+            if sub:
+                analysis.add_analysis(sub)
+            continue
+
+        location: str = 'play[{}]'.format(idx) if idx else 'play'
+        _analyze_play(play, base_dir, location, analysis, stack)
+    stack.pop()
+
+    analysis.set_stats = _get_set_stats(playbook)
+    analysis.add_file(playbook_path)
+    _set_cached('playbook', playbook_path, analysis)
+    return analysis
+
+
+def analyze_playbook(playbook_path: str) -> dict:
     """
-    Search and collect necessary variable keys in playbook.
+    Analyze variables of the playbook and files which it refers.
+    Returned dict is shared by callers, so don't update it.
+    {
+        'necessary': variables which have to be defined at starting,
+        'set_stats': variables passed to next job_template,
+        'set_fact': {variable: [defined locations]},
+        'vars': {variable: [defined locations]},
+        'files': ((dependent file path, (mtime, size)), ...)
+    }
     """
 
-    with open(playbook_path, 'r') as pbp:
-        playbook: dict = yaml.load(stream=pbp, Loader=yaml.SafeLoader)
+    playbook_path = os.path.abspath(playbook_path)
+    cached: tuple = _analysis_cache.get(('result', playbook_path))
+    if cached and _is_valid(cached[0]):
+        return cached[1]
 
-    necessary_keys_at_started = set()
-    necessary_keys_in_tasks = {}
-    playbook_dict: dict = playbook[0]
-    for key, sub_dict in playbook_dict.items():
-        if key in ('vars', 'environment'):
-            for value in sub_dict.values():
-                if _is_variable(value):
-                    necessary_keys_at_started = \
-                        necessary_keys_at_started | _get_variable_name(value)
+    analysis: _Analysis = _analyze_playbook_file(playbook_path, [])
+    result = {'necessary': frozenset(analysis.necessary),
+              'set_stats': analysis.set_stats,
+              'set_fact': analysis.set_fact,
+              'vars': analysis.vars,
+              'files': tuple(sorted(analysis.files))}
+    _analysis_cache[('result', playbook_path)] = (result['files'], result)
+    return result
+
+
+def register_analysis(playbook_path: str, result: dict):
+    """
+    Register analysis result which is analyzed beforehand.
+    `result['files']` is dependent file paths, and the result is used
+    while those files are not changed.
+    """
+
+    playbook_path = os.path.abspath(playbook_path)
+    files: tuple = tuple((path, _get_file_key(path))
+                         for path in result['files'])
+    registered = dict(result)
+    registered['necessary'] = frozenset(result['necessary'])
+    registered['files'] = files
+    _analysis_cache[('result', playbook_path)] = (files, registered)
+
+
+def drop_stale_analysis() -> set:
+    """
+    Drop analysis results which dependent files are changed.
+    Return changed playbook paths which still exist.
+    """
 
-        if 'tasks' in key:
-            # `tasks` is list of task dictionary.
+    changed = set()
+    for cache_key, (files, _) in list(_analysis_cache.items()):
+        if _is_valid(files):
+            continue
 
-            for idx, task_dict in enumerate(sub_dict):
-                necessary_in_task = set()
-                necessary_keys_in_tasks[idx] = \
-                    _parse_task_dick(task_dict, necessary_in_task)
+        del _analysis_cache[cache_key]
+        kind, file_path = cache_key
+        if kind == 'result' and os.path.exists(file_path):
+            changed.add(file_path)
 
-    return necessary_keys_at_started, necessary_keys_in_tasks
+    return changed
@@ -3,15 +3,61 @@
 Runner method to start running playbook.
 """
 
+import os
 import shutil
+import tempfile
 
 from ansible.cli import playbook
 import ansible.constants as conf_param
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+
+from internal import yaml_loader
+
+# Playbook which only logs in each host without changing it.
+PREFLIGHT_PLAYBOOK = [{'name': 'Pre-flight check',
+                       'hosts': 'all',
+                       'gather_facts': False,
+                       'tasks': [{'name': 'Check host is reachable',
+                                  'ping': None}]}]
+
+
+class HostsUnreachable(Exception):
+    """
+    Hosts in inventory can not be logged in before running jobs.
+    """
+
+    def __init__(self, message, hosts: list):
+        super(HostsUnreachable, self).__init__()
+        self.message = message
+        self.hosts = hosts
+
+    def __str__(self):
+        return repr(self.message)
+
+
+def separate_local_tmp():
+    """
+    Use own Ansible local tmp directory in forked process.
+    `run_playbook` removes it after running, so processes forked from
+    the same parent must not share it.
+    """
+
+    conf_param.DEFAULT_LOCAL_TMP = tempfile.mkdtemp(prefix='ansible-local-')
 
 
 def run_playbook(playbook_path: str, inventory_path: str,
-                 auth_extra_vars: str, extra_vars_json: str = None):
-    """ Execute ansible-playbook. """
+                 auth_extra_vars: str, extra_vars_json: str = None,
+                 limit: str = None, retry_dir: str = None,
+                 forks: int = None, timeout: int = None):
+    """
+    Execute ansible-playbook.
+    `limit` is host pattern given to `--limit` option.
+    Ansible writes hosts failed or unreachable to retry file
+    in `retry_dir`, if it is given. Read them by `read_retry_hosts`.
+    `forks` and `timeout` override Ansible's parallel processes
+    and connection timeout seconds.
+    """
 
     ansible_path: str = shutil.which('ansible-playbook')
     args = [ansible_path, '-i', inventory_path, '-e', auth_extra_vars]
@@ -20,11 +66,134 @@ def run_playbook(playbook_path: str, inventory_path: str,
         args.append('-e')
         args.append(extra_vars_json)
 
+    if limit:
+        args.append('--limit')
+        args.append(limit)
+
+    if forks:
+        args.append('--forks')
+        args.append(str(forks))
+
+    if timeout:
+        args.append('--timeout')
+        args.append(str(timeout))
+
     args.append(playbook_path)
 
-    cli = playbook.PlaybookCLI(args)
-    cli.parse()
-    exit_code: int = cli.run()
+    retry_conf: tuple = (conf_param.RETRY_FILES_ENABLED,
+                         conf_param.RETRY_FILES_SAVE_PATH)
+    if retry_dir is not None:
+        conf_param.RETRY_FILES_ENABLED = True
+        conf_param.RETRY_FILES_SAVE_PATH = retry_dir
+
+    try:
+        cli = playbook.PlaybookCLI(args)
+        cli.parse()
+        exit_code: int = cli.run()
+    finally:
+        conf_param.RETRY_FILES_ENABLED, conf_param.RETRY_FILES_SAVE_PATH = \
+            retry_conf
 
     shutil.rmtree(conf_param.DEFAULT_LOCAL_TMP, True)
     return exit_code
+
+
+def get_retry_file_path(playbook_path: str, retry_dir: str) -> str:
+    """ Retry file which Ansible writes for the playbook. """
+
+    retry_name: str = os.path.splitext(os.path.basename(playbook_path))[0]
+    return os.path.join(retry_dir, '{}.retry'.format(retry_name))
+
+
+def read_retry_hosts(playbook_path: str, retry_dir: str) -> list:
+    """
+    Hosts failed or unreachable in the last run of the playbook.
+    Retry file is removed, so the next run writes it again.
+    Empty list means the failure isn't caused by any host.
+    """
+
+    retry_path: str = get_retry_file_path(playbook_path, retry_dir)
+    try:
+        with open(retry_path, 'r') as rtf:
+            hosts = [line.strip() for line in rtf if line.strip()]
+    except FileNotFoundError:
+        return []
+
+    os.remove(retry_path)
+    return hosts
+
+
+def get_exclude_limit(hosts: list) -> str:
+    """ `--limit` pattern of all hosts except `hosts`. """
+    return ':'.join(['all'] + ['!{}'.format(host) for host in hosts])
+
+
+def check_reachable(inventory_path: str, auth_extra_vars: str,
+                    work_dir: str, forks: int, timeout: int) -> list:
+    """
+    Log in all hosts of inventory at the same time up to `forks`,
+    and return hosts unreachable in `timeout` seconds or failed.
+    """
+
+    check_dir: str = tempfile.mkdtemp(prefix='preflight-', dir=work_dir)
+    try:
+        playbook_path: str = os.path.join(check_dir, 'preflight.yml')
+        with open(playbook_path, 'w') as pbf:
+            pbf.write(yaml_loader.dumps(PREFLIGHT_PLAYBOOK))
+
+        r_code: int = run_playbook(playbook_path, inventory_path,
+                                   auth_extra_vars, retry_dir=check_dir,
+                                   forks=forks, timeout=timeout)
+        hosts: list = read_retry_hosts(playbook_path, check_dir)
+    finally:
+        shutil.rmtree(check_dir, True)
+
+    if r_code != 0 and not hosts:
+        raise HostsUnreachable('Pre-flight check failed without hosts. '
+                               'exit code: {}'.format(r_code), hosts)
+
+    inventory = InventoryManager(loader=DataLoader(),
+                                 sources=[inventory_path])
+    if hosts and {host.name for host in inventory.get_hosts('all')} <= \
+            set(hosts):
+        raise HostsUnreachable('No host is reachable.', hosts)
+    return hosts
+
+
+def _get_host_patterns(playbook_path: str) -> list:
+    plays = yaml_loader.load_file(playbook_path)
+
+    patterns = []
+    for play in plays or []:
+        hosts = play.get('hosts') if isinstance(play, dict) else None
+        if hosts is None:
+            continue
+        if '{{' in str(hosts):
+            # Pattern is given by variables at running.
+            return ['all']
+        patterns.extend(hosts if isinstance(hosts, list) else [hosts])
+
+    return [str(pattern) for pattern in patterns] or ['all']
+
+
+class HostCounter:
+    """
+    Number of hosts in inventory which plays of each playbook target.
+    Inventory is parsed at the first count, and counts are memoized.
+    """
+
+    def __init__(self, inventory_path: str):
+        self.inventory_path = inventory_path
+        self._inventory: InventoryManager = None
+        self._counts = {}
+
+    def count(self, playbook_path: str) -> int:
+        """ Number of hosts which the playbook targets. """
+
+        if playbook_path not in self._counts:
+            if self._inventory is None:
+                self._inventory = InventoryManager(
+                    loader=DataLoader(), sources=[self.inventory_path])
+            self._counts[playbook_path] = len(self._inventory.get_hosts(
+                _get_host_patterns(playbook_path)))
+        return self._counts[playbook_path]
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Profiling of parse and dry run stages.
+
+    - `cpu`: each stage runs under `cProfile`. Report has the stage's time,
+      number of calls, self time of each category and top functions.
+    - `mem`: each stage runs under `tracemalloc`. Report has the stage's
+      peak and allocated memory, and top allocating lines.
+
+Stages must not be nested, because only one profiler can be enabled.
+When profiling isn't started, `stage` returns shared empty context.
+"""
+
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+MODES = ('cpu', 'mem')
+
+# Number of functions or lines written to report of each stage.
+TOP_ENTRIES = 25
+
+# Categories of self time by source file path of functions.
+CATEGORIES = (
+    ('yaml', ('{0}yaml{0}'.format(os.sep),
+              os.path.join('internal', 'yaml_loader.py'))),
+    ('glob', ('{}glob.py'.format(os.sep), '{}fnmatch.py'.format(os.sep))),
+    ('variable scan', (os.path.join('internal', 'playbook', 'parser.py'),)),
+    ('copy', ('{}copy.py'.format(os.sep),)))
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+def _get_category(file_name: str) -> str:
+    for category, patterns in CATEGORIES:
+        if any(pattern in file_name for pattern in patterns):
+            return category
+    return 'other'
+
+
+def _format_size(size: int) -> str:
+    return '{:.1f} KiB'.format(size / 1024)
+
+
+class CpuStage:
+    """ Result of one stage under `cProfile`. """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.elapsed: float = 0.0
+        self.calls: int = 0
+        self.categories = {}
+        self.stats: pstats.Stats = None
+
+    @contextlib.contextmanager
+    def measure(self):
+        """ Profile the block. """
+
+        profile = cProfile.Profile()
+        start: float = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.elapsed = time.perf_counter() - start
+            self._collect(profile)
+
+    def _collect(self, profile: cProfile.Profile):
+        self.stats = pstats.Stats(profile)
+        self.calls = self.stats.total_calls
+        for (file_name, _, _), (_, _, self_time, _, _) \
+                in self.stats.stats.items():
+            category: str = _get_category(file_name)
+            self.categories[category] = \
+                self.categories.get(category, 0.0) + self_time
+
+    def summary(self) -> str:
+        """ One line summary. """
+
+        categories: str = ', '.join(
+            '{} {:.3f}s'.format(category, self.categories.get(category, 0.0))
+            for category, _ in CATEGORIES)
+        return '{}: {:.3f}s, {} calls ({})'.format(
+            self.name, self.elapsed, self.calls, categories)
+
+    def report(self) -> str:
+        """ Top functions by cumulative time. """
+
+        stream = io.StringIO()
+        self.stats.stream = stream
+        self.stats.sort_stats('cumulative').print_stats(TOP_ENTRIES)
+        return stream.getvalue()
+
+
+class MemStage:
+    """ Result of one stage under `tracemalloc`. """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.peak: int = 0
+        self.allocated: int = 0
+        self.top_stats: list = []
+
+    @contextlib.contextmanager
+    def measure(self):
+        """ Trace memory allocations in the block. """
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            _, self.peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.top_stats = after.compare_to(before, 'lineno')
+            self.allocated = sum(stat.size_diff for stat in self.top_stats)
+
+    def summary(self) -> str:
+        """ One line summary. """
+        return '{}: peak {}, allocated {}'.format(
+            self.name, _format_size(self.peak),
+            _format_size(self.allocated))
+
+    def report(self) -> str:
+        """ Top lines by allocated size. """
+        return ''.join('{}\n'.format(stat)
+                       for stat in self.top_stats[:TOP_ENTRIES])
+
+
+class Profiler:
+    """ Profiles of each stage in running order. """
+
+    def __init__(self, mode: str, output_file: str):
+        self.mode = mode
+        self.output_file = output_file
+        self.stages = []
+
+    def stage(self, name: str):
+        """ Context manager which profiles the block as stage. """
+
+        result = CpuStage(name) if self.mode == 'cpu' else MemStage(name)
+        self.stages.append(result)
+        return result.measure()
+
+    def write(self):
+        """ Write report of all stages. """
+
+        with open(self.output_file, 'w') as pff:
+            for result in self.stages:
+                pff.write('===== {} =====\n'.format(result.summary()))
+                pff.write(result.report())
+                pff.write('\n')
+
+    def print_summary(self):
+        """ Print each stage's summary. """
+
+        print()
+        print('------ Profile ({}) ------'.format(self.mode))
+        for result in self.stages:
+            print(result.summary())
+        print("Wrote profile to '{}'.".format(self.output_file))
+        print()
+
+
+_profiler: Profiler = None
+
+
+def start(mode: str, output_file: str):
+    """ Start profiling stages. """
+
+    global _profiler
+    _profiler = Profiler(mode, output_file)
+
+
+def stop():
+    """ Write report and print summary of profiled stages. """
+
+    global _profiler
+    profiler: Profiler = _profiler
+    _profiler = None
+    if profiler is not None and profiler.stages:
+        profiler.write()
+        profiler.print_summary()
+
+
+def stage(name: str):
+    """ Context manager which profiles the block, if profiling started. """
+
+    if _profiler is None:
+        return _NO_STAGE
+    return _profiler.stage(name)
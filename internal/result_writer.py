@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Machine readable writers of job results.
+
+Each job's rows are written as soon as the job finished,
+and the workflow's row is written at the end.
+    - `json`: one JSON array of rows.
+    - `jsonl`: one JSON object of row in each line.
+    - `csv`: CSV with header line.
+
+Workflow runner isn't imported, so client doesn't import Ansible.
+"""
+
+import csv
+import json
+import pathlib
+
+# `table` is printed by `subcommand` after the workflow ended.
+FORMATS = ('table', 'json', 'jsonl', 'csv')
+
+FIELDS = ('id', 'name', 'type', 'status', 'attempts', 'created',
+          'queue_wait', 'elapsed', 'log')
+
+
+def walk_records(results: list, id_prefix: str = '') -> list:
+    """
+    `JobRecord` list as `(job id, record)` list.
+    Sub-workflow's jobs follow it's `workflow_job` record with nested id.
+    """
+
+    walked = []
+    # Depth first search by own stack instead of recursive call.
+    stack = [(record, id_prefix) for record in reversed(results)]
+    while stack:
+        record, prefix = stack.pop()
+        job_id: str = '{}{}'.format(prefix, record.job_id)
+        walked.append((job_id, record))
+
+        stack.extend((sub_record, '{}.'.format(job_id))
+                     for sub_record in reversed(record.sub_records))
+
+    return walked
+
+
+def get_job_rows(results: list, id_prefix: str = '') -> list:
+    """ Rows of `JobRecord` list as dict of `FIELDS`. """
+
+    rows = []
+    for job_id, record in walk_records(results, id_prefix):
+        attempts: int = None
+        if record.type != 'workflow_job':
+            attempts = len(record.attempts)
+
+        rows.append({'id': job_id,
+                     'name': record.job_template_name,
+                     'type': record.type,
+                     'status': record.status,
+                     'attempts': attempts,
+                     'created': record.get_created_time(),
+                     'queue_wait': record.get_queue_wait_seconds(),
+                     'elapsed': record.get_elapsed_seconds(),
+                     'log': record.log_path or None})
+
+    return rows
+
+
+def get_workflow_row(workflow_file: str, created: str, status: str,
+                     elapsed: float) -> dict:
+    """ Row of the whole workflow's result. """
+
+    return {'id': None,
+            'name': pathlib.Path(workflow_file).name,
+            'type': 'workflow',
+            'status': status,
+            'attempts': None,
+            'created': created,
+            'queue_wait': None,
+            'elapsed': elapsed,
+            'log': None}
+
+
+class ResultWriter:
+    """ Base class of writers to the stream. """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def _write_row(self, row: dict):
+        raise NotImplementedError
+
+    def write_job(self, record):
+        """ Write rows of the finished job. """
+
+        for row in get_job_rows([record]):
+            self._write_row(row)
+        self.stream.flush()
+
+    def write_workflow(self, workflow_file: str, created: str, status: str,
+                       elapsed: float):
+        """ Write row of the ended workflow. """
+
+        self._write_row(get_workflow_row(workflow_file, created, status,
+                                         elapsed))
+        self.stream.flush()
+
+    def close(self):
+        """ Finish the output. Stream itself isn't closed. """
+        self.stream.flush()
+
+
+class JsonWriter(ResultWriter):
+    """ Writer of JSON array. Array is closed by `close`. """
+
+    def __init__(self, stream):
+        super(JsonWriter, self).__init__(stream)
+        self._written = False
+
+    def _write_row(self, row: dict):
+        self.stream.write(',\n' if self._written else '[\n')
+        self.stream.write(json.dumps(row))
+        self._written = True
+
+    def close(self):
+        self.stream.write('\n]\n' if self._written else '[]\n')
+        super(JsonWriter, self).close()
+
+
+class JsonLinesWriter(ResultWriter):
+    """ Writer of JSON Lines. """
+
+    def _write_row(self, row: dict):
+        self.stream.write(json.dumps(row))
+        self.stream.write('\n')
+
+
+class CsvWriter(ResultWriter):
+    """ Writer of CSV. Empty field is written for `None`. """
+
+    def __init__(self, stream):
+        super(CsvWriter, self).__init__(stream)
+        self._writer = csv.DictWriter(stream, FIELDS, lineterminator='\n')
+        self._writer.writeheader()
+
+    def _write_row(self, row: dict):
+        self._writer.writerow(row)
+
+
+WRITERS = {'json': JsonWriter,
+           'jsonl': JsonLinesWriter,
+           'csv': CsvWriter}
+
+
+def create_writer(output_format: str, stream) -> ResultWriter:
+    """ Writer of the format. `None` for `table`. """
+    if output_format == 'table':
+        return None
+    return WRITERS[output_format](stream)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Workflow runner server on local Unix socket.
+
+Client sends one JSON line request,
+    {"command": "execute", "cwd": "/path/to/dir", "args": {...}}
+and server sends back printed output and exit code as JSON lines.
+    {"output": "..."}
+    {"exit_code": 0}
+"""
+
+import contextlib
+import io
+import json
+import os
+import select
+import socket
+import sys
+import time
+import traceback
+
+from internal import client
+from internal import subcommand as com
+from internal import yaml_loader
+from internal.workflow import node, tree
+
+# Interval seconds to check changed playbooks and finished processes.
+CHECK_INTERVAL = 1.0
+
+COMMANDS = {'execute': com.execute,
+            'compile': com.compile_workflow,
+            'batch': com.execute_batch,
+            'history': com.show_history}
+
+
+class ServerStartFailed(Exception):
+    """
+    Server can not listen the socket.
+    """
+
+    def __init__(self, message):
+        super(ServerStartFailed, self).__init__()
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class _OutputStream(io.TextIOBase):
+    """ Text stream which sends written text to client. """
+
+    def __init__(self, conn: socket.socket):
+        super(_OutputStream, self).__init__()
+        self._conn = conn
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            client.send_message(self._conn, {'output': text})
+        return len(text)
+
+
+class WorkflowServer:
+    """
+    Server which keeps job_template index and playbook analysis in memory.
+    Dry run and compile requests are handled in this process one by one.
+    Run requests are handled in forked process,
+    so running Ansible doesn't block other requests.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._sock: socket.socket = None
+
+        # forked processes which are handling requests.
+        self._children = set()
+        self._last_checked: float = 0.0
+
+    def _listen(self):
+        if os.path.exists(self.socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(self.socket_path)
+                except ConnectionRefusedError:
+                    # Socket file is left by stopped server.
+                    os.remove(self.socket_path)
+                else:
+                    raise ServerStartFailed("Server is already running. "
+                                            "socket: '{}'"
+                                            .format(self.socket_path))
+
+        socket_dir: str = os.path.dirname(self.socket_path)
+        if socket_dir and not os.path.exists(socket_dir):
+            os.makedirs(socket_dir)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen()
+
+    def _check_files(self):
+        """ Drop changed files from caches, and analyze them again. """
+
+        tree.drop_stale_resource_files()
+        yaml_loader.drop_stale_documents()
+        for playbook_path in sorted(node.drop_stale_playbook_vars()):
+            try:
+                node.load_playbook_vars(playbook_path)
+            except Exception as exc:
+                # Playbook may be in the middle of editing.
+                # It is analyzed again at the next request.
+                print("Failed to reload playbook '{}': {!r}"
+                      .format(playbook_path, exc))
+            else:
+                print("Reloaded playbook '{}'".format(playbook_path))
+
+    def _collect_children(self):
+        for pid in list(self._children):
+            finished_pid, _ = os.waitpid(pid, os.WNOHANG)
+            if finished_pid:
+                self._children.remove(pid)
+
+    @staticmethod
+    def _handle(conn: socket.socket, request: dict) -> int:
+        command = COMMANDS[request['command']]
+        with contextlib.redirect_stdout(_OutputStream(conn)):
+            try:
+                os.chdir(request['cwd'])
+                command(**request['args'])
+            except SystemExit as exc:
+                return exc.code if isinstance(exc.code, int) else 1
+            except Exception:
+                print(traceback.format_exc(), end='')
+                return 1
+            finally:
+                sys.stdout.flush()
+
+        return 0
+
+    def _fork_handle(self, conn: socket.socket, request: dict):
+        sys.stdout.flush()
+        pid: int = os.fork()
+        if pid:
+            self._children.add(pid)
+            return
+
+        # Forked process.
+        exit_code: int = 1
+        try:
+            self._sock.close()
+            exit_code = self._handle(conn, request)
+            client.send_message(conn, {'exit_code': exit_code})
+        finally:
+            os._exit(exit_code)
+
+    def _accept(self):
+        conn, _ = self._sock.accept()
+        with conn:
+            server_dir: str = os.getcwd()
+            try:
+                with conn.makefile('rb') as rfile:
+                    request: dict = json.loads(rfile.readline())
+
+                if request['args'].get('dry_run', True):
+                    exit_code: int = self._handle(conn, request)
+                    client.send_message(conn, {'exit_code': exit_code})
+                else:
+                    self._fork_handle(conn, request)
+            except (OSError, ValueError, KeyError) as exc:
+                # Client is disconnected or request is broken.
+                print('Request failed: {!r}'.format(exc))
+            finally:
+                os.chdir(server_dir)
+
+    def serve(self):
+        """ Handle requests until interrupted. """
+
+        self._listen()
+        print("Workflow runner server is listening on '{}'"
+              .format(self.socket_path))
+        sys.stdout.flush()
+
+        try:
+            while True:
+                readable, _, _ = select.select([self._sock], [], [],
+                                               CHECK_INTERVAL)
+                if readable:
+                    self._accept()
+
+                now: float = time.monotonic()
+                if now - self._last_checked >= CHECK_INTERVAL:
+                    self._last_checked = now
+                    self._collect_children()
+                    self._check_files()
+                sys.stdout.flush()
+        finally:
+            self._sock.close()
+            os.remove(self.socket_path)
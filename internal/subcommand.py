@@ -4,37 +4,58 @@ routing sub command process.
 """
 
 from datetime import datetime, timezone
+import functools
 import os
 import pathlib
 import re
+import shutil
+import sys
+import time
 
 import texttable as ttb
 
+from internal import batch
+from internal import history
+from internal import job_log
+from internal import metrics
+from internal import profiling
+from internal import result_writer
+from internal import trace
+from internal import watch
+from internal import workspace
+from internal.playbook import runner as p_run
 from internal.workflow import parser as w_parser
+from internal.workflow import plan as w_plan
+from internal.workflow import provenance
+from internal.workflow import resource as w_resource
 from internal.workflow import runner as w_run
+from internal.workflow import schedule as w_schedule
 
-DEFAULT_DIR = '/tmp/workflow_runner'
 
+@functools.lru_cache(maxsize=None)
+def _get_tty_width() -> int:
+    # Terminal size is queried once. `0` is no limit.
+    width, _ = shutil.get_terminal_size((0, 0))
+    return width
 
-def _prepare_work_directory(dir_path='') -> str:
-    if not dir_path:
-        dir_path = DEFAULT_DIR
 
-    if not os.path.exists(dir_path):
-        os.mkdir(dir_path)
+def _get_job_result_rows(results: [w_run.JobRecord]) -> list:
+    # Sub-workflow's jobs are nested under it's `workflow_job` row.
+    rows = []
+    for row in result_writer.get_job_rows(results):
+        rows.append([row['id'],
+                     row['name'],
+                     row['type'],
+                     row['status'],
+                     '' if row['attempts'] is None else str(row['attempts']),
+                     row['created'],
+                     '{:.6f}'.format(row['queue_wait']),
+                     '{:.6f}'.format(row['elapsed'])])
 
-    return dir_path
+    return rows
 
 
-def _get_tty_width():
-    tty_size = os.popen('stty size 2> /dev/null', 'r').read().split()
-    if len(tty_size) != 2:
-        return 0
-    _, width = tty_size
-    return int(width)
-
-
-def _print_job_results(results: [w_run.JobRecord]):
+def _create_table(headers: list) -> ttb.Texttable:
     table = ttb.Texttable(max_width=_get_tty_width())
 
     table.set_deco(ttb.Texttable.HEADER |
@@ -45,91 +66,449 @@ def _print_job_results(results: [w_run.JobRecord]):
                      ' ',  # corner
                      '='])  # header
 
-    headers = ["id", "name", "type", "status", "created", "elapsed"]
     table.header(headers)
     table.set_cols_dtype(['t' for _ in headers])
     table.set_cols_align(['l' for _ in headers])
 
-    for res in results:
-        record = [res.job_id,
-                  res.job_template_name,
-                  res.type,
-                  res.status,
-                  res.get_created_time(),
-                  res.get_elapsed()]
+    return table
+
+
+def _draw_table(table: ttb.Texttable) -> str:
+    return re.sub('^ ', '',
+                  table.draw().replace('\n ', '\n').replace('\r ', '\r'))
+
+
+def _print_job_results(results: [w_run.JobRecord]):
+    headers = ["id", "name", "type", "status", "attempts", "created",
+               "queue wait", "elapsed"]
+    table: ttb.Texttable = _create_table(headers)
+
+    for record in _get_job_result_rows(results):
         table.add_row(record)
 
     print()
     print('------ Job results ------')
-    job_results: str = \
-        re.sub('^ ', '',
-               table.draw().replace('\n ', '\n').replace('\r ', '\r'))
+    job_results: str = _draw_table(table)
     print(job_results)
     print()
 
 
 def _print_workflow_result(workflow_file: str, workflow_start: str,
                            workflow_status: str):
-    table = ttb.Texttable(max_width=_get_tty_width())
-
-    table.set_deco(ttb.Texttable.HEADER |
-                   ttb.Texttable.VLINES |
-                   ttb.Texttable.BORDER)
-    table.set_chars(['=',  # horizontal
-                     ' ',  # vertical
-                     ' ',  # corner
-                     '='])  # header
-
     headers = ["workflow_job_template", "created", "status"]
-    table.header(headers)
-    table.set_cols_dtype(['t' for _ in headers])
-    table.set_cols_align(['l' for _ in headers])
+    table: ttb.Texttable = _create_table(headers)
 
     workflow_name: str = pathlib.Path(workflow_file).name
     table.add_row([workflow_name, workflow_start, workflow_status])
 
     print('------ Workflow process ended ------')
-    workflow_results: str = \
-        re.sub('^ ', '',
-               table.draw().replace('\n ', '\n').replace('\r ', '\r'))
+    workflow_results: str = _draw_table(table)
     print(workflow_results)
     print()
 
 
+def _print_critical_path(elapsed: float, critical_path: float,
+                         estimated: float = None):
+    print('------ Critical path ------')
+    ratio: str = '{:.1f}%'.format(100 * critical_path / elapsed) \
+        if elapsed else '-'
+    print('Makespan: {:.3f}s, critical path lower bound: {:.3f}s '
+          '({} of makespan).'.format(elapsed, critical_path, ratio))
+    if estimated is not None:
+        print('Estimated critical path by recorded durations: '
+              '{:.3f}s.'.format(estimated))
+    print()
+
+
+def _print_failed_logs(results: [w_run.JobRecord]):
+    # The last lines of output are printed for failed jobs.
+    for job_id, record in result_writer.walk_records(results):
+        if record.status not in ('failed', 'timeout') or \
+                not record.log_path:
+            continue
+        print("------ Output of {} job {}: '{}' ------".format(
+            record.status, job_id, record.job_template_name))
+        for line in record.log_tail:
+            print(line)
+        print("<< Whole output is in '{}' >>".format(record.log_path))
+        print()
+
+
+def _create_log_dir(log_root: str, run_id: str) -> str:
+    log_dir: str = os.path.join(log_root, run_id)
+    os.makedirs(log_dir)
+    return log_dir
+
+
+def _print_kept_workspace(kept_path: str):
+    if kept_path:
+        print("<< Temporary files of the failed run are kept in '{}' >>"
+              .format(kept_path))
+        print()
+
+
 def _print_result(workflow_file: str, workflow_start: str,
                   workflow_status: str, job_results: [w_run.JobRecord]):
     _print_job_results(job_results)
     _print_workflow_result(workflow_file, workflow_start, workflow_status)
 
 
+def _parse_workflow(dry_run: bool, workflow_file: str, plan_file: str,
+                    extra_vars: dict) -> (str, w_parser.WorkflowNode):
+    with trace.span('parse', file=plan_file or workflow_file), \
+            profiling.stage('parse'):
+        return _load_workflow(dry_run, workflow_file, plan_file, extra_vars)
+
+
+def _load_workflow(dry_run: bool, workflow_file: str, plan_file: str,
+                   extra_vars: dict) -> (str, w_parser.WorkflowNode):
+    if not plan_file:
+        workflow_node: w_parser.WorkflowNode = \
+            w_parser.parse(workflow_file, dry_run, extra_vars)
+        return workflow_file, workflow_node
+
+    # Compiled plan doesn't need to parse workflow and playbooks.
+    plan: dict = w_plan.read_plan(plan_file)
+    workflow_node = w_parser.WorkflowNode(w_plan.load_plan(plan, dry_run,
+                                                           extra_vars),
+                                          plan['pools'])
+    return plan['workflow_file'], workflow_node
+
+
+def compile_workflow(workflow_file: str, plan_file: str):
+    """
+    Compile workflow file and it's playbooks to plan file.
+    """
+
+    plan: dict = w_plan.compile_plan(workflow_file)
+    w_plan.write_plan(plan, plan_file)
+
+    print("Compiled workflow '{}' to plan '{}'.".format(workflow_file,
+                                                        plan_file))
+
+
 def execute(dry_run: bool, workflow_file: str, inventory_file: str,
-            auth_extra_vars: str, extra_vars: dict):
+            auth_extra_vars: str, extra_vars: dict, plan_file: str = None,
+            provenance_file: str = None, max_parallel: int = 1,
+            workflow_timeout: float = None, max_slots: int = None,
+            pools: dict = None, output_format: str = 'table',
+            output_file: str = None, trace_file: str = None,
+            profile: str = None, profile_file: str = None,
+            history_file: str = None, schedule: str = 'lpt',
+            preflight: str = None, preflight_forks: int = None,
+            preflight_timeout: int = None, metrics_file: str = None,
+            metrics_per_job: bool = False, job_log_dir: str = None,
+            log_tail: int = job_log.DEFAULT_TAIL, workspace_root: str = None,
+            keep_failed: int = workspace.DEFAULT_KEEP_FAILED):
     """
     Run sub command with switching 'dry_run' option.
+    `pools` overrides number of slots declared in workflow file.
+    Job results except `table` format are written to `output_file`
+    or stdout as soon as each job finished.
+    Timeline of the run is written to `trace_file`.
+    Parse and dry run are profiled by `profile` mode to `profile_file`.
+    Each job's result is recorded to `history_file` database.
+    Siblings are dispatched by `schedule` order with `max_parallel`.
+    With `preflight`, all hosts are logged in before the first job,
+    and unreachable hosts `abort` the run or are `exclude`d from jobs.
+    Metrics of the run are written to `metrics_file` at the end,
+    and also at each finished job with `metrics_per_job`.
+    Each job's output is written to compressed file in directory
+    of this run's id under `job_log_dir`, and failed jobs' last
+    `log_tail` lines are printed with the results.
+    Temporary files are written to this run's own workspace under
+    `workspace_root`, and the latest `keep_failed` failed runs' are kept.
     """
 
-    work_dir: str = _prepare_work_directory()
-
-    workflow_node: w_parser.WorkflowNode = w_parser.parse(workflow_file,
-                                                          dry_run, extra_vars)
-    workflow = w_run.WorkflowRunner(inventory_file)
+    if trace_file:
+        trace.start(trace_file)
+    if profile:
+        profiling.start(profile, profile_file)
+    try:
+        _execute(dry_run, workflow_file, inventory_file, auth_extra_vars,
+                 extra_vars, plan_file, provenance_file, max_parallel,
+                 workflow_timeout, max_slots, pools, output_format,
+                 output_file, history_file, schedule, preflight,
+                 preflight_forks, preflight_timeout, metrics_file,
+                 metrics_per_job, job_log_dir, log_tail, workspace_root,
+                 keep_failed)
+    finally:
+        profiling.stop()
+        trace.stop()
+
+
+def _execute(dry_run: bool, workflow_file: str, inventory_file: str,
+             auth_extra_vars: str, extra_vars: dict, plan_file: str,
+             provenance_file: str, max_parallel: int,
+             workflow_timeout: float, max_slots: int, pools: dict,
+             output_format: str, output_file: str, history_file: str,
+             schedule: str, preflight: str, preflight_forks: int,
+             preflight_timeout: int, metrics_file: str,
+             metrics_per_job: bool, job_log_dir: str, log_tail: int,
+             workspace_root: str, keep_failed: int):
+    workflow_file, workflow_node = _parse_workflow(dry_run, workflow_file,
+                                                   plan_file, extra_vars)
+    deadline: float = None
+    if workflow_timeout is not None:
+        deadline = time.monotonic() + workflow_timeout
+    limiter: w_resource.ResourceLimiter = None
+    if max_slots is not None or pools or workflow_node.pools:
+        limiter = w_resource.ResourceLimiter(
+            max_slots, dict(workflow_node.pools, **(pools or {})))
+    estimator: w_schedule.DurationEstimator = None
+    if not dry_run and schedule == 'lpt' and max_parallel > 1 and \
+            history_file:
+        # Order of sequential jobs doesn't change the elapsed time.
+        estimator = w_schedule.DurationEstimator(
+            history.get_durations(history_file))
+    workflow = w_run.WorkflowRunner(inventory_file, max_parallel, deadline,
+                                    limiter, estimator=estimator)
 
     if dry_run:
         print()
         print('Check all variables are defined at running each job_template.')
         print('------')
 
-        workflow.dry_run(workflow_node)
+        if provenance_file:
+            # Index is written before checking to diagnose failure.
+            index = provenance.ProvenanceIndex(workflow_node.current_node)
+            index.dump(provenance_file)
+            print("Wrote variable providers to '{}'.".format(
+                provenance_file))
+            print()
+
+        with trace.span('dry_run'), profiling.stage('dry_run'):
+            workflow.dry_run(workflow_node)
 
         print("Dry run complete.")
-    else:
+        return
+
+    with workspace.Workspace(workspace_root, keep_failed) as run_space:
+        work_dir: str = run_space.path
+        if preflight and inventory_file:
+            workflow_node.exclude_hosts = tuple(_check_preflight(
+                inventory_file, auth_extra_vars, work_dir, preflight,
+                preflight_forks, preflight_timeout))
+
+        if job_log_dir:
+            workflow_node.log_dir = _create_log_dir(job_log_dir,
+                                                    run_space.run_id)
+            workflow_node.log_tail = log_tail
+            print("Job outputs are written to '{}'.".format(
+                workflow_node.log_dir))
+
+        # Inventory is parsed once for history and metrics.
+        host_counter: p_run.HostCounter = None
+        if inventory_file:
+            host_counter = p_run.HostCounter(inventory_file)
+        recorder: history.HistoryRecorder = None
+        if history_file:
+            recorder = history.HistoryRecorder(history_file, workflow_file,
+                                               host_counter)
+        metrics_writer: metrics.MetricsWriter = None
+        if metrics_file:
+            metrics_writer = metrics.MetricsWriter(
+                metrics_file, workflow_file, host_counter, metrics_per_job)
+        workflow_status: str = _run_workflow(
+            workflow, workflow_file, workflow_node, auth_extra_vars,
+            work_dir, output_format, output_file, recorder, metrics_writer)
+        if workflow_status != 'successful':
+            run_space.mark_failed()
+
+    _print_kept_workspace(run_space.kept_path)
+
+
+def _check_preflight(inventory_file: str, auth_extra_vars: str,
+                     work_dir: str, preflight: str, forks: int,
+                     timeout: int) -> list:
+    print()
+    print('Check all hosts are reachable before running jobs.')
+    print('------')
+
+    with trace.span('preflight'):
+        unreachable: list = p_run.check_reachable(
+            inventory_file, auth_extra_vars, work_dir, forks, timeout)
+    if not unreachable:
+        print('- OK. All hosts are reachable.')
+        print()
+        return []
+
+    print("<< Unreachable hosts: {} >>".format(', '.join(unreachable)))
+    if preflight == 'abort':
+        raise p_run.HostsUnreachable(
+            'Hosts are unreachable before running jobs. '
+            'hosts: {}'.format(unreachable), unreachable)
+
+    print('<< Unreachable hosts are excluded from all jobs. >>')
+    print()
+    return unreachable
+
+
+def _run_workflow(workflow: w_run.WorkflowRunner, workflow_file: str,
+                  workflow_node: w_parser.WorkflowNode, auth_extra_vars: str,
+                  work_dir: str, output_format: str, output_file: str,
+                  recorder: history.HistoryRecorder,
+                  metrics_writer: metrics.MetricsWriter = None) -> str:
+    output = open(output_file, 'w') if output_file else sys.stdout
+    writer: result_writer.ResultWriter = \
+        result_writer.create_writer(output_format, output)
+    if writer:
+        workflow.add_record_listener(writer.write_job)
+    if recorder:
+        workflow.add_record_listener(recorder.record_job)
+    if metrics_writer:
+        workflow.add_record_listener(metrics_writer.record_job)
+
+    estimated: float = None
+    if workflow.estimator:
+        estimated = workflow.estimator.critical_path(
+            workflow_node.current_node)
+
+    try:
         workflow_start: str = \
             datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+        started: float = time.monotonic()
 
         job_result: [w_run.JobRecord] = workflow.run(workflow_node,
                                                      auth_extra_vars,
                                                      work_dir)
 
         workflow_status: str = job_result[-1].status
-        _print_result(workflow_file, workflow_start, workflow_status,
-                      job_result)
+        elapsed: float = time.monotonic() - started
+        if recorder:
+            recorder.record_workflow(workflow_status, elapsed)
+        if metrics_writer:
+            metrics_writer.record_workflow(workflow_status, elapsed)
+        if writer:
+            writer.write_workflow(workflow_file, workflow_start,
+                                  workflow_status, elapsed)
+        else:
+            _print_result(workflow_file, workflow_start, workflow_status,
+                          job_result)
+        if not writer or output_file:
+            _print_failed_logs(job_result)
+            _print_critical_path(elapsed, workflow.critical_path, estimated)
+        return workflow_status
+    finally:
+        if writer:
+            writer.close()
+        if output_file:
+            output.close()
+        if recorder:
+            recorder.close()
+
+
+def watch_dry_run(workflow_file: str, extra_vars: dict):
+    """
+    Dry run workflow, and check it again whenever files are changed.
+    """
+
+    print()
+    print('Check all variables are defined at running each job_template.')
+    print('------')
+
+    watcher = watch.DryRunWatcher(workflow_file, extra_vars)
+    watcher.watch()
+
+
+def show_history(history_file: str, template: str = None,
+                 window: int = history.DEFAULT_WINDOW,
+                 threshold: float = history.DEFAULT_THRESHOLD):
+    """
+    Print percentile durations of each job_template in run history,
+    and the latest runs which regressed beyond `threshold`.
+    """
+
+    summaries: list = history.summarize(history_file, template, window,
+                                        threshold)
+
+    headers = ["name", "runs", "p50", "p90", "p95", "max", "latest",
+               "ratio", "regressed"]
+    table: ttb.Texttable = _create_table(headers)
+    for summary in summaries:
+        ratio: float = summary['ratio']
+        table.add_row([summary['template'],
+                       summary['runs'],
+                       '{:.3f}'.format(summary['p50']),
+                       '{:.3f}'.format(summary['p90']),
+                       '{:.3f}'.format(summary['p95']),
+                       '{:.3f}'.format(summary['max']),
+                       '{:.3f}'.format(summary['latest']),
+                       '' if ratio is None else '{:.2f}'.format(ratio),
+                       'yes' if summary['regressed'] else ''])
+
+    print()
+    print('------ Job durations (seconds) ------')
+    print(_draw_table(table))
+    print()
+
+    for summary in summaries:
+        if summary['regressed']:
+            print("<< Regressed: '{}' took {:.3f}s, {:.2f} times of the "
+                  "median of earlier runs >>".format(
+                      summary['template'], summary['latest'],
+                      summary['ratio']))
+
+
+def _print_batch_summary(results: [batch.BatchResult]):
+    headers = ["run", "workflow_job_template", "inventory", "extra_vars",
+               "status", "jobs", "created", "elapsed"]
+    table: ttb.Texttable = _create_table(headers)
+
+    for res in sorted(results, key=lambda result: result.entry.index):
+        entry: batch.BatchEntry = res.entry
+        table.add_row([entry.index,
+                       pathlib.Path(entry.workflow_file).name,
+                       entry.inventory_file or '',
+                       entry.extra_vars_name,
+                       res.status,
+                       len(res.records),
+                       res.get_created_time(),
+                       '{:.6f}'.format(res.get_elapsed_seconds())])
+
+    successful: int = len([res for res in results
+                           if res.status == 'successful'])
+
+    print('------ Batch summary ------')
+    print(_draw_table(table))
+    print()
+    print('successful: {}, failed: {}, total: {}'.format(
+        successful, len(results) - successful, len(results)))
+    print()
+
+
+def execute_batch(dry_run: bool, manifest_file: str, auth_extra_vars: str,
+                  max_parallel: int, workspace_root: str = None,
+                  keep_failed: int = workspace.DEFAULT_KEEP_FAILED):
+    """
+    Run all of workflow runs in batch manifest file.
+    Each run has own workspace under `workspace_root`.
+    """
+
+    entries: [batch.BatchEntry] = batch.read_manifest(manifest_file)
+    batch_runner = batch.BatchRunner(entries, max_parallel)
+
+    if dry_run:
+        results = batch_runner.dry_run()
+    else:
+        results = batch_runner.run(auth_extra_vars, workspace_root,
+                                   keep_failed)
+
+    finished = []
+    for result in results:
+        entry: batch.BatchEntry = result.entry
+
+        print()
+        print('------ Batch run {}/{} ended: {} ------'.format(
+            entry.index, len(entries), result.status))
+        if result.message:
+            print(result.message)
+            print()
+        if result.records:
+            _print_result(entry.workflow_file, result.get_created_time(),
+                          result.status, result.records)
+        _print_kept_workspace(result.kept_path)
+
+        finished.append(result)
+
+    _print_batch_summary(finished)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Timeline of workflow run in Chrome trace-event format.
+
+Spans are written as complete events (`"ph": "X"`) to the trace file
+while running, and the file is rewritten to JSON object format
+`{"traceEvents": [...]}` by `stop`.
+Jobs running in forked processes write to the same file descriptor,
+so their spans are shown on each process's own track.
+When tracing isn't started, `span` returns shared empty context.
+"""
+
+import contextlib
+import json
+import os
+import time
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """ Writer of trace events which is shared with forked processes. """
+
+    def __init__(self, trace_file: str):
+        self.trace_file = trace_file
+        # Only the process which started tracing finishes the file.
+        self.owner_pid: int = os.getpid()
+        # Monotonic clock is the same in forked processes.
+        self._origin: int = time.monotonic_ns()
+        # Appended events are not mixed with other processes' events,
+        # because each event is written by one `write`.
+        self._fd: int = os.open(trace_file, os.O_WRONLY | os.O_CREAT |
+                                os.O_TRUNC | os.O_APPEND, 0o644)
+
+    def _get_timestamp(self) -> float:
+        """ Microseconds since tracing started. """
+        return (time.monotonic_ns() - self._origin) / 1000
+
+    def _write(self, event: dict):
+        os.write(self._fd, (json.dumps(event) + '\n').encode())
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, args: dict):
+        """ Record time of the block as one span. """
+
+        start: float = self._get_timestamp()
+        try:
+            yield
+        finally:
+            pid: int = os.getpid()
+            self._write({'name': name, 'cat': category, 'ph': 'X',
+                         'ts': start, 'dur': self._get_timestamp() - start,
+                         'pid': pid, 'tid': pid, 'args': args})
+
+    def name_process(self, name: str):
+        """ Name the track of this process. """
+
+        pid: int = os.getpid()
+        self._write({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                     'tid': pid, 'args': {'name': name}})
+
+    def close(self):
+        """ Rewrite appended events to JSON object. """
+
+        os.close(self._fd)
+        with open(self.trace_file, 'r') as tcf:
+            events = [json.loads(line) for line in tcf if line.strip()]
+
+        tmp_file: str = '{}.tmp'.format(self.trace_file)
+        with open(tmp_file, 'w') as tcf:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, tcf)
+            tcf.write('\n')
+        os.replace(tmp_file, self.trace_file)
+
+
+_tracer: Tracer = None
+
+
+def start(trace_file: str):
+    """ Start recording spans to the file. """
+
+    global _tracer
+    _tracer = Tracer(trace_file)
+    _tracer.name_process('workflow_runner')
+
+
+def stop():
+    """ Finish the trace file started in this process. """
+
+    global _tracer
+    tracer: Tracer = _tracer
+    _tracer = None
+    if tracer is not None and tracer.owner_pid == os.getpid():
+        tracer.close()
+
+
+def span(name: str, category: str = 'workflow', **args):
+    """ Context manager which records the block, if tracing is started. """
+
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, category, args)
+
+
+def name_process(name: str):
+    """ Name the track of this process, if tracing is started. """
+
+    if _tracer is not None:
+        _tracer.name_process(name)
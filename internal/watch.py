@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Watch mode which checks workflow again when files are changed.
+"""
+
+import os
+import time
+
+from internal.workflow import node as w_node
+from internal.workflow import parser as w_parser
+from internal.workflow import tree
+
+# Interval seconds to check files are changed.
+WATCH_INTERVAL = 0.5
+
+YAML_SUFFIXES = ('.yml', '.yaml')
+
+
+def _get_file_stat(file_path: str) -> tuple:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DryRunWatcher:
+    """
+    Dry run checker which keeps parsed workflow tree in memory.
+    When a playbook is changed, only nodes which run it are checked again.
+    And if it's `set_stats` are changed, it's descendants are also checked
+    again, because those variables are passed to them.
+    """
+
+    def __init__(self, workflow_file: str, extra_vars: dict):
+        self.workflow_file = workflow_file
+        self.extra_vars = extra_vars
+
+        self._top_node: w_node.Node = None
+        # Parent node of each node in the top level workflow.
+        self._parents = {}
+        # Nodes in the top level workflow by playbook path.
+        self._nodes_by_playbook = {}
+        # Sub-workflow files and playbooks used in those.
+        # Sub-workflow is analyzed as one unit, so it is parsed again
+        # when any of those is changed.
+        self._sub_workflow_paths = set()
+        self._sub_workflow_playbooks = set()
+
+        self._workflow_stats = {}
+        self._job_template_stats = {}
+
+        # Undefined variables of each node.
+        self._failures = {}
+        # Number of nodes checked at the last time.
+        self.checked_count: int = 0
+
+    def _index_tree(self):
+        self._parents = {self._top_node: None}
+        self._nodes_by_playbook = {}
+        self._sub_workflow_paths = set()
+        self._sub_workflow_playbooks = set()
+
+        stack = [(self._top_node, False)]
+        visited_sub_workflows = set()
+        while stack:
+            _node, in_sub_workflow = stack.pop()
+            children: tuple = _node.success + _node.failed + _node.always
+
+            if in_sub_workflow:
+                self._sub_workflow_playbooks.add(_node.playbook_path)
+            else:
+                self._nodes_by_playbook.setdefault(_node.playbook_path,
+                                                   []).append(_node)
+                for child in children:
+                    self._parents[child] = _node
+
+            if isinstance(_node, w_node.WorkflowJobNode) and \
+                    _node.sub_workflow not in visited_sub_workflows:
+                visited_sub_workflows.add(_node.sub_workflow)
+                self._sub_workflow_paths.add(_node.playbook_path)
+                stack.append((_node.sub_workflow.top_node, True))
+
+            stack.extend((child, in_sub_workflow) for child in children)
+
+    def _get_workflow_stats(self) -> dict:
+        workflow_files: set = {self.workflow_file} | self._sub_workflow_paths
+        return {path: _get_file_stat(path) for path in workflow_files}
+
+    @staticmethod
+    def _get_job_template_stats() -> dict:
+        stats = {}
+        job_template_dir: str = tree.get_resource_dir(tree.JOB_TEMPLATE_DIR)
+        for dir_path, _, file_names in os.walk(job_template_dir):
+            for file_name in file_names:
+                if file_name.endswith(YAML_SUFFIXES):
+                    file_path: str = os.path.join(dir_path, file_name)
+                    stats[file_path] = _get_file_stat(file_path)
+        return stats
+
+    def _check_node(self, _node: w_node.Node):
+        defined = _node.before_extra_vars.keys()
+
+        undefined = {}
+        for playbook_path, necessary in \
+                _node.get_necessary_variable_keys().items():
+            missing: set = necessary - defined
+            if missing:
+                undefined[playbook_path] = missing
+
+        if undefined:
+            self._failures[_node] = undefined
+        else:
+            self._failures.pop(_node, None)
+
+    def _print_result(self, elapsed: float):
+        for _node, undefined in sorted(self._failures.items(),
+                                       key=lambda item: item[0].node_id):
+            for playbook_path, missing in undefined.items():
+                print("- NG. Necessary variables not defined. "
+                      "node: '{}', playbook: '{}', variable: {}"
+                      .format(_node.node_name, playbook_path, missing))
+
+        print("Checked {} nodes in {:.1f} ms. Failed nodes: {}"
+              .format(self.checked_count, elapsed * 1000,
+                      len(self._failures)))
+        print()
+
+    def check_all(self):
+        """ Parse workflow file, and check all of nodes. """
+
+        started: float = time.perf_counter()
+
+        # Files are recorded before parsing,
+        # so broken file is parsed again only after it is changed.
+        self._workflow_stats = self._get_workflow_stats()
+        self._job_template_stats = self._get_job_template_stats()
+
+        workflow_node: w_parser.WorkflowNode = \
+            w_parser.parse(self.workflow_file, True, self.extra_vars)
+        self._top_node = workflow_node.current_node
+        self._index_tree()
+        self._workflow_stats = self._get_workflow_stats()
+
+        self._failures = {}
+        for _node in self._parents:
+            self._check_node(_node)
+        self.checked_count = len(self._parents)
+
+        self._print_result(time.perf_counter() - started)
+
+    def _prepare_node(self, _node: w_node.Node):
+        parent_node: w_node.Node = self._parents[_node]
+        if parent_node:
+            _node.prepare_job_node_dry_run(parent_node=parent_node,
+                                           case_type=_node.case_type)
+        else:
+            _node.prepare_job_node_dry_run(extra_vars_arg=self.extra_vars)
+
+    def _check_changed_playbooks(self, changed_paths: set):
+        started: float = time.perf_counter()
+        # Playbooks whose included files or roles are changed.
+        changed_paths = changed_paths | w_node.drop_stale_playbook_vars()
+
+        # Nodes which defines different `set_stats` from before.
+        stats_changed = []
+        checked = set()
+        for playbook_path in changed_paths:
+            for _node in self._nodes_by_playbook.get(playbook_path, ()):
+                defined_stats: set = set(_node.define_stats)
+                self._prepare_node(_node)
+                self._check_node(_node)
+                checked.add(_node)
+
+                if set(_node.define_stats) != defined_stats:
+                    stats_changed.append(_node)
+
+        # Descendants are prepared with new `set_stats` and checked again.
+        stack: list = stats_changed
+        while stack:
+            _node = stack.pop()
+            for child in _node.success + _node.failed + _node.always:
+                self._prepare_node(child)
+                self._check_node(child)
+                checked.add(child)
+                stack.append(child)
+
+        self.checked_count = len(checked)
+        self._print_result(time.perf_counter() - started)
+
+    def poll(self) -> bool:
+        """
+        Check files are changed, and check affected nodes again.
+        Return `True` if any file is changed.
+        """
+
+        workflow_stats: dict = self._get_workflow_stats()
+        job_template_stats: dict = self._get_job_template_stats()
+
+        workflow_changed: bool = workflow_stats != self._workflow_stats
+        # Added or removed job_template may change playbook file lookup.
+        job_template_added: bool = \
+            job_template_stats.keys() != self._job_template_stats.keys()
+        changed_paths = {path for path, stat in job_template_stats.items()
+                         if self._job_template_stats.get(path) != stat}
+
+        self._workflow_stats = workflow_stats
+        self._job_template_stats = job_template_stats
+        if not workflow_changed and not job_template_added and \
+                not changed_paths:
+            return False
+
+        print('------ Changed: {} ------'.format(
+            ', '.join(sorted(changed_paths) or [self.workflow_file])))
+
+        if workflow_changed or job_template_added or \
+                self._top_node is None or \
+                changed_paths & self._sub_workflow_playbooks:
+            tree.drop_stale_resource_files()
+            w_node.drop_stale_playbook_vars()
+            self.check_all()
+        else:
+            self._check_changed_playbooks(changed_paths)
+
+        return True
+
+    def watch(self):
+        """ Check workflow again at every file change until interrupted. """
+
+        try:
+            self.check_all()
+        except Exception as exc:
+            self._top_node = None
+            print('Failed to check workflow: {!r}'.format(exc))
+            print()
+
+        print('Watching changes of workflow and job_template files. '
+              'Press Ctrl+C to stop.')
+        print()
+
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                self.poll()
+            except Exception as exc:
+                # File may be in the middle of editing.
+                # It is checked again at the next change.
+                self._top_node = None
+                print('Failed to check workflow: {!r}'.format(exc))
+                print()
@@ -3,6 +3,9 @@
 Node object for job_template information..
 """
 
+import os
+import types
+
 from internal.playbook import parser
 
 
@@ -37,40 +40,142 @@ class SwitchJobResult:
         return state in result_keywords
 
 
+# Shared empty variables.
+# Nodes share variables dict by reference and never update it in place,
+# so nodes which don't define new variables don't have own copy.
+# Shared variables are read-only view, so updating it fails loudly.
+NO_VARS: types.MappingProxyType = types.MappingProxyType({})
+
+# `set_stats` variables of each playbook as node's `define_stats`.
+# Nodes running the same playbook share these objects.
+# key: playbook path, value: (playbook analysis, define_stats)
+_define_stats_cache = {}
+
+
+def _get_playbook_vars(playbook_path: str) -> tuple:
+    analysis: dict = parser.analyze_playbook(playbook_path)
+
+    cached: tuple = _define_stats_cache.get(playbook_path)
+    if cached and cached[0] is analysis:
+        return cached
+
+    define_stats: dict = NO_VARS
+    if analysis['set_stats']:
+        define_stats = _read_only({key: None
+                                   for key in analysis['set_stats']})
+
+    _define_stats_cache[playbook_path] = (analysis, define_stats)
+    return analysis, define_stats
+
+
+def register_playbook_vars(playbook_path: str, analysis: dict):
+    """
+    Register playbook's variables which are analyzed beforehand.
+    `analysis` has the same format as playbook parser's result,
+    and nodes running the playbook use it without parsing.
+    """
+
+    parser.register_analysis(playbook_path, analysis)
+
+
+def _read_only(extra_vars: dict) -> types.MappingProxyType:
+    """ Read-only copy of `extra_vars` which can be shared by nodes. """
+
+    if not extra_vars:
+        return NO_VARS
+    return types.MappingProxyType(dict(extra_vars))
+
+
+def drop_stale_playbook_vars() -> set:
+    """
+    Drop cached variables of playbooks which are changed or removed
+    after analyzed. Playbook is also changed when it's included files
+    or roles are changed. Return changed playbook paths which still exist.
+    """
+
+    changed: set = parser.drop_stale_analysis()
+    for playbook_path in list(_define_stats_cache.keys()):
+        if not os.path.exists(playbook_path) or playbook_path in changed:
+            del _define_stats_cache[playbook_path]
+
+    return changed
+
+
+def load_playbook_vars(playbook_path: str):
+    """ Analyze playbook's variables beforehand. """
+    _get_playbook_vars(playbook_path)
+
+
 class Node:
     """
     workflow job_template node in workflow tree.
+    `extra_vars` attributes are read-only, because they are shared by
+    parent and child nodes. Set new dict instead of updating them.
     """
 
+    __slots__ = ('node_id', 'node_name', 'playbook_path', 'case_type',
+                 '_children', 'before_extra_vars', 'define_stats',
+                 'after_extra_vars', 'after_extra_vars_failed', 'timeout',
+                 'fail_fast', 'pool', 'weight', 'attempts', 'retry_backoff')
+
+    node_type = 'job_template'
+
     def __init__(self, node_id: int, node_name: str, playbook_path: str):
         self.node_id = node_id
         self.node_name = node_name
         self.playbook_path = playbook_path
 
-        # child job_template list.
-        self.success = []
-        self.failed = []
-        self.always = []
+        # result keyword of the edge from parent job_template.
+        self.case_type: str = None
+        # child job_template list. `None` until the first child is added.
+        self._children: list = None
 
         # extra_vars at this job_template stage.
-        self.before_extra_vars = {}
-        self.define_stats = {}
-        self.define_fact = {}
-        self.define_vars_header = set()
-        self.after_extra_vars = {}
-        self.after_extra_vars_failed = {}
+        self.before_extra_vars: dict = NO_VARS
+        self.define_stats: dict = NO_VARS
+        self.after_extra_vars: dict = NO_VARS
+        self.after_extra_vars_failed: dict = NO_VARS
+
+        # Seconds until the running job is killed. `None` is no limit.
+        self.timeout: float = None
+        # Cancel siblings which are running or waiting when this job failed.
+        self.fail_fast: bool = False
+        # Resource pool name and number of slots which the job uses.
+        self.pool: str = None
+        self.weight: int = 1
+        # Number of runs on failed hosts and seconds before the first retry.
+        self.attempts: int = 1
+        self.retry_backoff: float = 0
+
+    def _get_children(self, keywords: set) -> tuple:
+        if not self._children:
+            return ()
+        return tuple(child for child in self._children
+                     if child.case_type in keywords)
+
+    @property
+    def success(self) -> tuple:
+        """ child job_template list run after job succeeded. """
+        return self._get_children(SwitchJobResult.success_keyword)
+
+    @property
+    def failed(self) -> tuple:
+        """ child job_template list run after job failed. """
+        return self._get_children(SwitchJobResult.failed_keyword)
+
+    @property
+    def always(self) -> tuple:
+        """ child job_template list run after job ended. """
+        return self._get_children(SwitchJobResult.always_keyword)
 
     def _set_job_extra_vars_run(self, parent=None,
                                 extra_vars_arg: dict = None):
-        extra_vars_dict = {}
-
         if parent:
-            extra_vars_dict.update(parent.after_extra_vars)
+            extra_vars_dict: dict = parent.after_extra_vars
         else:
             # Top level node case.
-            if extra_vars_arg:
-                # If `extra_vars` are given by command line args.
-                extra_vars_dict.update(extra_vars_arg)
+            # If `extra_vars` are given by command line args.
+            extra_vars_dict = _read_only(extra_vars_arg)
 
         # `extra_vars` at start of job_template executing.
         self.before_extra_vars = extra_vars_dict
@@ -78,44 +183,43 @@ class Node:
     def _set_job_extra_vars_dry_run(self, parent=None,
                                     extra_vars_arg: dict = None,
                                     case_type: str = None):
-        extra_vars_dict = {}
-
         if parent:
             if SwitchJobResult.is_success(case_type):
-                extra_vars_dict.update(parent.after_extra_vars)
+                extra_vars_dict: dict = parent.after_extra_vars
             else:
                 # `failed` and `always` situation
                 # doesn't include `set_stats` vars.
-                extra_vars_dict.update(parent.after_extra_vars_failed)
+                extra_vars_dict = parent.after_extra_vars_failed
         else:
             # Top level node case.
-            if extra_vars_arg:
-                # If `extra_vars` are given by command line args.
-                extra_vars_dict.update(extra_vars_arg)
+            # If `extra_vars` are given by command line args.
+            extra_vars_dict = _read_only(extra_vars_arg)
 
         # `extra_vars` at start of job_template executing.
         self.before_extra_vars = extra_vars_dict
 
     def _set_define_vars(self):
-        defined: dict = parser.get_defined_variable_keys(self.playbook_path)
-        stats: list = defined['set_stats']
-        fact: dict = defined['set_fact']
-        self.define_vars_header: set = defined['vars']
-        # `fact` is dictionary to contain defined variables.
-        # These dict's keys mean defined task timing in the playbook.
-        # And the values mean defined variables name.
+        _, self.define_stats = _get_playbook_vars(self.playbook_path)
 
-        if stats:
-            self.define_stats = {key: None for key in stats}
+    def _set_dry_run_after_extra_vars(self):
+        self.after_extra_vars_failed = self.before_extra_vars
 
-        if [v_key for v_key in fact.values() if v_key]:
-            self.define_fact = fact
+        if self.define_stats:
+            after_extra_vars = dict(self.before_extra_vars)
+            after_extra_vars.update(self.define_stats)
+            self.after_extra_vars = types.MappingProxyType(after_extra_vars)
+        else:
+            self.after_extra_vars = self.before_extra_vars
 
-    def _set_dry_run_after_extra_vars(self):
-        self.after_extra_vars.update(self.before_extra_vars)
-        self.after_extra_vars_failed.update(self.before_extra_vars)
+    def get_necessary_variable_keys(self) -> dict:
+        """
+        Collect variables which have to be defined in `before_extra_vars`.
+        Returned dict's keys are playbook path, and values are variables name.
+        """
 
-        self.after_extra_vars.update(self.define_stats)
+        analysis, _ = _get_playbook_vars(self.playbook_path)
+        necessary: frozenset = analysis['necessary']
+        return {self.playbook_path: necessary}
 
     def prepare_job_node_run(self, parent_node=None,
                              extra_vars_arg: dict = None):
@@ -160,16 +264,115 @@ class Node:
 
     def set_after_extra_vars(self, after_extra_vars: dict):
         """ setter for Node's `after_extra_vars` """
-        self.after_extra_vars = after_extra_vars
+        self.after_extra_vars = _read_only(after_extra_vars)
+
+    def _add_parent(self, parent, case_type: str):
+        self.case_type = case_type
+        if parent._children is None:
+            parent._children = []
+        parent._children.append(self)
 
     def add_parent_success(self, parent):
         """ Add target Node to parent Node's `success` child list. """
-        parent.success.append(self)
+        self._add_parent(parent, 'success')
 
     def add_parent_failed(self, parent):
         """ Add target Node to parent Node's `failed` child list. """
-        parent.failed.append(self)
+        self._add_parent(parent, 'failure')
 
     def add_parent_always(self, parent):
         """ Add target Node to parent Node's `always` child list. """
-        parent.always.append(self)
+        self._add_parent(parent, 'always')
+
+
+class WorkflowJobNode(Node):
+    """
+    workflow node which runs another workflow file as one job.
+    """
+
+    __slots__ = ('sub_workflow',)
+
+    node_type = 'workflow'
+
+    def __init__(self, node_id: int, node_name: str, sub_workflow):
+        super(WorkflowJobNode, self).__init__(node_id, node_name,
+                                              sub_workflow.workflow_path)
+        self.sub_workflow: SubWorkflow = sub_workflow
+
+    def _set_define_vars(self):
+        # Sub-workflow defines variables which are defined
+        # at every end of it.
+        provided: set = self.sub_workflow.provided_success
+        if provided:
+            self.define_stats = _read_only({key: None for key in provided})
+
+    def _set_dry_run_after_extra_vars(self):
+        super(WorkflowJobNode, self)._set_dry_run_after_extra_vars()
+
+        provided_failed: set = self.sub_workflow.provided_failed
+        if provided_failed:
+            after_extra_vars_failed = dict(self.before_extra_vars)
+            after_extra_vars_failed.update(
+                {key: None for key in provided_failed})
+            self.after_extra_vars_failed = \
+                types.MappingProxyType(after_extra_vars_failed)
+
+    def get_necessary_variable_keys(self) -> dict:
+        """ Variables which sub-workflow needs from parent workflow. """
+        return self.sub_workflow.required
+
+
+class SubWorkflow:
+    """
+    Compiled workflow file which is referred by `workflow` node.
+    This is shared by every node which refers the same workflow file.
+    """
+
+    def __init__(self, workflow_path: str, top_node: Node):
+        self.workflow_path = workflow_path
+        self.top_node = top_node
+        # Resource pools' slots declared in the workflow file.
+        self.pools = {}
+
+        # dry run analysis result.
+        self.required = {}
+        self.provided_success = set()
+        self.provided_failed = set()
+
+    def analyze(self):
+        """
+        Collect variables which have to be given by parent workflow,
+        and variables which are defined after this workflow ended.
+        Sub-workflow's nodes are prepared without parent's `extra_vars`,
+        so this result is available for any parent node.
+        """
+
+        success_ends = []
+        failed_ends = []
+
+        stack = [self.top_node]
+        while stack:
+            _node: Node = stack.pop()
+            defined: set = set(_node.before_extra_vars.keys())
+            necessary_keys: dict = _node.get_necessary_variable_keys()
+            for playbook_path, necessary in necessary_keys.items():
+                undefined: set = necessary - defined
+                if undefined:
+                    self.required[playbook_path] = \
+                        self.required.get(playbook_path, set()) | undefined
+
+            # Workflow ends at the node which has no next job.
+            if not _node.always:
+                if not _node.success:
+                    success_ends.append(set(_node.after_extra_vars.keys()))
+                if not _node.failed:
+                    failed_ends.append(
+                        set(_node.after_extra_vars_failed.keys()))
+
+            children: tuple = _node.success + _node.failed + _node.always
+            stack.extend(reversed(children))
+
+        if success_ends:
+            self.provided_success = set.intersection(*success_ends)
+        if failed_ends:
+            self.provided_failed = set.intersection(*failed_ends)
@@ -3,13 +3,20 @@
 Parse workflow structure.
 """
 
+import contextlib
+import copy
 from datetime import datetime
 import json
-
-import yaml
-
+import os
+import shutil
+import tempfile
+import time
+
+from internal import job_log
+from internal import trace
+from internal import yaml_loader
 from internal.workflow import tree, node
-from internal.playbook import runner, parser
+from internal.playbook import runner
 
 
 class DryRunFailed(Exception):
@@ -30,10 +37,34 @@ class WorkflowNode:
     workflow tree object.
     """
 
-    def __init__(self, top_node: node.Node):
+    def __init__(self, top_node: node.Node, pools: dict = None,
+                 executor=None, exclude_hosts: tuple = (),
+                 log_dir: str = None, log_tail: int = job_log.DEFAULT_TAIL):
         self.current_node: node.Node = top_node
         self.parent_node: node.Node = node.Node(0, 'None', '')
 
+        # Resource pools' number of slots declared in workflow file.
+        self.pools: dict = pools or {}
+
+        # Function which runs playbook like `runner.run_playbook`.
+        # `None` is Ansible in this process.
+        self.executor = executor
+        # Hosts which no job runs on, like unreachable at pre-flight check.
+        self.exclude_hosts: tuple = tuple(exclude_hosts)
+        # Directory to write each job's output. `None` is not captured.
+        self.log_dir: str = log_dir
+        # Number of the last lines of each job's output kept in memory.
+        self.log_tail: int = log_tail
+        # Function called with each progress message instead of printing.
+        self.on_message = None
+
+        # History of the last `run` as `dict` of each attempt.
+        self.attempts: tuple = ()
+        # Seconds to read `set_stats` values after the last `run`.
+        self.stats_capture: float = 0.0
+        # The last lines of output of the last `run` captured to log file.
+        self.output_tail: tuple = ()
+
     def check_var_defined(self, var_name: str):
         """ Check target extra_vars already defined. """
 
@@ -44,11 +75,38 @@ class WorkflowNode:
         self.parent_node = self.current_node
         self.current_node = next_node
 
+    def create_child(self, next_node: node.Node):
+        """ Create workflow tree object moved forward to `next_node`. """
+        child_workflow_node: WorkflowNode = copy.copy(self)
+        child_workflow_node.go_next_child(next_node)
+        return child_workflow_node
+
     def go_back(self, top_on_parent_node: node.Node):
         """ Move back current job_template node. """
         self.current_node = self.parent_node
         self.parent_node = top_on_parent_node
 
+    def echo(self, message: str, leading: tuple = ()):
+        """
+        Print progress message after `leading` lines,
+        or give only the message to `on_message` if it's set.
+        """
+
+        if self.on_message is not None:
+            self.on_message(message)
+            return
+        for line in leading:
+            print(line)
+        print(message)
+
+    def create_log_file(self) -> str:
+        """ Empty log file of current node, or '' without `log_dir`. """
+
+        if not self.log_dir:
+            return ''
+        return job_log.create_log_file(self.log_dir,
+                                       self.current_node.node_name)
+
     def _prepare_playbook(self, work_dir: str) -> (str, list):
         """ Generate copy playbook file with dump `set_stats` value. """
 
@@ -62,41 +120,41 @@ class WorkflowNode:
             copy_playbook_path: str = "{}/tmp_playbook_{}_{}.yml".format(
                 work_dir, node_id, p_time_stamp)
 
-            with open(self.current_node.playbook_path, 'r') as pbf:
-                playbook: dict = yaml.load(stream=pbf, Loader=yaml.SafeLoader)
-                tasks = playbook[0]['tasks']
-
-                skip_num: int = 1
-                for idx, task in enumerate(tasks):
-                    if 'set_stats' in task:
-                        for v_name, v_val in task['set_stats']['data'].items():
-
-                            # Prepare tmp file path.
-                            time_stamp: str = \
-                                datetime.now().strftime("%Y%m%d%H%M%S%f")
-                            stats_var_path: str = "{}/{}-{}-{}.txt".format(
-                                work_dir, node_id, v_name, time_stamp)
-                            set_stats_file_list.append(stats_var_path)
-
-                            # Insert task to register after var tmp file.
-                            echo_com = \
-                                "echo {} >> {}".format(v_val, stats_var_path)
-                            copy_task = {'name': 'Register after extra_vars '
-                                                 'temporarily file',
-                                         'shell': echo_com}
-                            if 'item' in v_val:
-                                # This task has `with_items`.
-                                copy_task['with_items'] = task['with_items']
-                                if 'when' in task:
-                                    copy_task['when'] = task['when']
-
-                            tasks = (tasks[:idx + skip_num] + [copy_task]
-                                     + tasks[idx + skip_num:])
-                            skip_num += 1
+            playbook: list = yaml_loader.thaw(
+                yaml_loader.load_file(self.current_node.playbook_path))
+            tasks = playbook[0]['tasks']
+
+            skip_num: int = 1
+            for idx, task in enumerate(tasks):
+                if 'set_stats' in task:
+                    for v_name, v_val in task['set_stats']['data'].items():
+
+                        # Prepare tmp file path.
+                        time_stamp: str = \
+                            datetime.now().strftime("%Y%m%d%H%M%S%f")
+                        stats_var_path: str = "{}/{}-{}-{}.txt".format(
+                            work_dir, node_id, v_name, time_stamp)
+                        set_stats_file_list.append(stats_var_path)
+
+                        # Insert task to register after var tmp file.
+                        echo_com = \
+                            "echo {} >> {}".format(v_val, stats_var_path)
+                        copy_task = {'name': 'Register after extra_vars '
+                                             'temporarily file',
+                                     'shell': echo_com}
+                        if 'item' in v_val:
+                            # This task has `with_items`.
+                            copy_task['with_items'] = task['with_items']
+                            if 'when' in task:
+                                copy_task['when'] = task['when']
+
+                        tasks = (tasks[:idx + skip_num] + [copy_task]
+                                 + tasks[idx + skip_num:])
+                        skip_num += 1
 
             playbook[0]['tasks'] = tasks
             with open(copy_playbook_path, 'w') as tpf:
-                tpf.write(yaml.dump(playbook))
+                tpf.write(yaml_loader.dumps(playbook))
 
             playbook_path = copy_playbook_path
         else:
@@ -113,7 +171,9 @@ class WorkflowNode:
                 try:
                     with open(stats_file, "r") as stf:
                         stats_value: str = stf.read().rstrip('\n').rstrip('\r')
-                        stats_key: str = stats_file.split('-')[1]
+                        # Directory may have '-' like run id.
+                        stats_key: str = \
+                            os.path.basename(stats_file).split('-')[1]
                         after_extra_vars.update({stats_key: stats_value})
                 except FileNotFoundError:
                     pass
@@ -121,20 +181,96 @@ class WorkflowNode:
         self.current_node.set_after_extra_vars(after_extra_vars)
 
     def run(self, inventory_file: str, auth_extra_vars: str,
-            work_dir: str) -> int:
-        """ Execute each playbook. """
-
-        playbook, set_stats_list = self._prepare_playbook(work_dir)
+            work_dir: str, log_path: str = '') -> int:
+        """
+        Execute each playbook.
+        Failed playbook is executed again up to node's `attempts`,
+        only on hosts which failed or were unreachable in the last attempt.
+        Output of playbook is written to `log_path` if it's given.
+        """
+
+        node_name: str = self.current_node.node_name
+        with trace.span('prepare_playbook', node=node_name):
+            playbook, set_stats_list = self._prepare_playbook(work_dir)
 
         if self.parent_node.node_id != 0:
             self.current_node.set_before_extra_vars(self.parent_node)
 
-        extra_vars_json: str = json.dumps(self.current_node.before_extra_vars)
+        extra_vars_json: str = json.dumps(
+            dict(self.current_node.before_extra_vars))
+
+        retry_dir: str = None
+        if self.current_node.attempts > 1:
+            retry_dir = tempfile.mkdtemp(prefix='retry-', dir=work_dir)
+
+        capture = contextlib.nullcontext()
+        if log_path:
+            self.echo("<< Output is written to '{}' >>".format(log_path))
+            capture = job_log.OutputCapture(log_path, self.log_tail)
+        try:
+            with capture:
+                r_code: int = self._run_attempts(
+                    playbook, inventory_file, auth_extra_vars,
+                    extra_vars_json, retry_dir)
+        finally:
+            if retry_dir:
+                shutil.rmtree(retry_dir, True)
+            if log_path:
+                self.output_tail = capture.tail
+
+        start: float = time.monotonic()
+        with trace.span('set_after_extra_vars', node=node_name):
+            self._set_after_extra_vars(set_stats_list)
+        self.stats_capture = time.monotonic() - start
+        return r_code
 
-        r_code = runner.run_playbook(playbook, inventory_file,
-                                     auth_extra_vars, extra_vars_json)
+    def _run_attempts(self, playbook: str, inventory_file: str,
+                      auth_extra_vars: str, extra_vars_json: str,
+                      retry_dir: str) -> int:
+        attempts = []
+        hosts: list = None
+        exclude_limit: str = None
+        if self.exclude_hosts:
+            exclude_limit = runner.get_exclude_limit(self.exclude_hosts)
+        for attempt in range(1, self.current_node.attempts + 1):
+            if hosts:
+                # Backoff doubles at each retry.
+                delay: float = \
+                    self.current_node.retry_backoff * 2 ** (attempt - 2)
+                self.echo("<< Retry job: '{}' attempt {}/{} on {} hosts "
+                          "after {} seconds >>".format(
+                              self.current_node.node_name, attempt,
+                              self.current_node.attempts, len(hosts),
+                              delay))
+                time.sleep(delay)
+
+            start: float = time.monotonic()
+            run_playbook = self.executor or runner.run_playbook
+            with trace.span('run_playbook', node=self.current_node.node_name,
+                            attempt=attempt):
+                r_code: int = run_playbook(
+                    playbook, inventory_file, auth_extra_vars,
+                    extra_vars_json,
+                    limit=','.join(hosts) if hosts else exclude_limit,
+                    retry_dir=retry_dir)
+
+            failed_hosts: list = []
+            if r_code != 0 and retry_dir:
+                failed_hosts = runner.read_retry_hosts(playbook, retry_dir)
+
+            attempts.append({'attempt': attempt,
+                             'hosts': hosts,
+                             'status': 'successful' if r_code == 0
+                             else 'failed',
+                             'failed_hosts': failed_hosts,
+                             'elapsed': time.monotonic() - start})
+            self.attempts = tuple(attempts)
+
+            # Failure without failed hosts isn't fixed by retrying hosts.
+            if r_code == 0 or not failed_hosts:
+                break
+            hosts = failed_hosts
 
-        self._set_after_extra_vars(set_stats_list)
         return r_code
 
     @staticmethod
@@ -146,33 +282,53 @@ class WorkflowNode:
                                                             undefined)
             raise DryRunFailed(message)
 
+    def enter_sub_workflow(self):
+        """ Create workflow tree object of current `workflow` node. """
+
+        if self.parent_node.node_id != 0:
+            self.current_node.set_before_extra_vars(self.parent_node)
+
+        # Compiled sub-workflow is shared, so `extra_vars` at entering are
+        # passed by parent of it's top node instead of set to the tree.
+        entry_node = node.Node(self.current_node.node_id,
+                               self.current_node.node_name, '')
+        entry_node.after_extra_vars = self.current_node.before_extra_vars
+
+        sub_top_node: node.Node = self.current_node.sub_workflow.top_node
+        sub_workflow_node = WorkflowNode(sub_top_node, executor=self.executor,
+                                         exclude_hosts=self.exclude_hosts,
+                                         log_dir=self.log_dir,
+                                         log_tail=self.log_tail)
+        sub_workflow_node.parent_node = entry_node
+        sub_workflow_node.on_message = self.on_message
+        return sub_workflow_node
+
+    def leave_sub_workflow(self, last_node: node.Node):
+        """ Take over `extra_vars` of sub-workflow's last executed job. """
+
+        after_extra_vars = {}
+        after_extra_vars.update(last_node.after_extra_vars)
+        self.current_node.set_after_extra_vars(after_extra_vars)
+
     def dry_run(self):
         """ Exec dry run check each playbook. """
 
-        playbook_path: str = self.current_node.playbook_path
-        result: tuple = parser.get_necessary_variable_keys(playbook_path)
-        necessary_at_started: set = result[0]
-        necessary_in_tasks: dict = result[1]
-
         defined_at_started: set = \
             set(self.current_node.before_extra_vars.keys())
-        set_fact_in_tasks: dict = self.current_node.define_fact
-        defined_on_vars_header: set = self.current_node.define_vars_header
+        necessary_keys: dict = self.current_node.get_necessary_variable_keys()
 
-        # Check variables defined for playbook header.
-        self._check_vars_covered(necessary_at_started, defined_at_started,
-                                 playbook_path)
+        # Check variables defined for playbook header and tasks.
+        for playbook_path, necessary in necessary_keys.items():
+            self._check_vars_covered(necessary, defined_at_started,
+                                     playbook_path)
 
-        # Check variables defined for playbook tasks.
-        defined: set = defined_at_started | defined_on_vars_header
-        for task_idx, necessary_key in necessary_in_tasks.items():
-            if set_fact_in_tasks:
-                defined = defined | set_fact_in_tasks[task_idx]
-
-            self._check_vars_covered(necessary_key, defined, playbook_path)
+        if isinstance(self.current_node, node.WorkflowJobNode):
+            checked_type = 'workflow'
+        else:
+            checked_type = 'playbook'
 
-        print("- OK. Variables in playbook '{}' are available at running."
-              .format(playbook_path))
+        print("- OK. Variables in {} '{}' are available at running."
+              .format(checked_type, self.current_node.playbook_path))
         print()
 
 
@@ -182,10 +338,12 @@ def parse(workflow_file_path: str, dry_run: bool,
     parse workflow file and return tree object.
     """
 
-    with open(workflow_file_path, "r") as wfp:
-        workflow_dict = yaml.load(stream=wfp, Loader=yaml.SafeLoader)
+    with trace.span('load_workflow_file', file=workflow_file_path):
+        workflow_dict = yaml_loader.load_file(workflow_file_path)
 
-    top_node: node.Node = tree.generate_workflow_tree(workflow_dict, dry_run,
-                                                      extra_vars_arg)
-    workflow = WorkflowNode(top_node)
+    with trace.span('build_tree', file=workflow_file_path):
+        top_node: node.Node = tree.generate_workflow_tree(
+            workflow_dict, dry_run, extra_vars_arg, workflow_file_path)
+    workflow = WorkflowNode(top_node,
+                            tree.get_pools(workflow_dict, top_node))
     return workflow
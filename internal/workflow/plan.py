@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Compiled workflow plan file.
+"""
+
+import hashlib
+import json
+import pathlib
+
+from internal import yaml_loader
+from internal.playbook import parser
+from internal.workflow import node, tree
+
+PLAN_VERSION = 6
+
+
+class PlanInvalid(Exception):
+    """
+    Compiled plan file can not be used.
+    """
+
+    def __init__(self, message):
+        super(PlanInvalid, self).__init__()
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+def _get_file_hash(file_path: str) -> str:
+    with open(file_path, 'rb') as tgf:
+        return hashlib.sha256(tgf.read()).hexdigest()
+
+
+def _dump_nodes(top_node: node.Node) -> list:
+    """ Flatten workflow tree to node list in depth first order. """
+
+    nodes = []
+    stack = [(top_node, None)]
+    while stack:
+        _node, parent_idx = stack.pop()
+
+        node_dict = {'id': _node.node_id,
+                     'name': _node.node_name,
+                     'type': _node.node_type,
+                     'path': _node.playbook_path,
+                     'parent': parent_idx,
+                     'case_type': _node.case_type,
+                     'timeout': _node.timeout,
+                     'fail_fast': _node.fail_fast,
+                     'pool': _node.pool,
+                     'weight': _node.weight,
+                     'attempts': _node.attempts,
+                     'retry_backoff': _node.retry_backoff}
+        nodes.append(node_dict)
+
+        idx = len(nodes) - 1
+        children: tuple = _node.success + _node.failed + _node.always
+        stack.extend((child, idx) for child in reversed(children))
+
+    return nodes
+
+
+def _load_nodes(nodes: list, dry_run: bool, extra_vars_arg: dict,
+                sub_workflows: dict) -> node.Node:
+    """ Build workflow tree from node list without parsing any file. """
+
+    loaded = []
+    for node_dict in nodes:
+        if node_dict['type'] == 'workflow':
+            _node = node.WorkflowJobNode(node_dict['id'], node_dict['name'],
+                                         sub_workflows[node_dict['path']])
+        else:
+            _node = node.Node(node_dict['id'], node_dict['name'],
+                              node_dict['path'])
+        tree.set_job_options(_node, node_dict)
+
+        if node_dict['parent'] is None:
+            _node.prepare_job_node(dry_run, extra_vars_arg=extra_vars_arg)
+        else:
+            parent_node: node.Node = loaded[node_dict['parent']]
+            _node.prepare_job_node(dry_run, parent_node=parent_node,
+                                   case_type=node_dict['case_type'])
+            tree.chain_parent_node(_node, parent_node, node_dict['case_type'])
+
+        loaded.append(_node)
+
+    return loaded[0]
+
+
+def _collect_sub_workflows(top_node: node.Node) -> list:
+    """ Sub-workflows in order that inner one comes first. """
+
+    sub_workflows = []
+    stack = [(top_node, False)]
+    while stack:
+        _node, visited = stack.pop()
+        if visited:
+            if _node.sub_workflow not in sub_workflows:
+                sub_workflows.append(_node.sub_workflow)
+            continue
+
+        if isinstance(_node, node.WorkflowJobNode) and \
+                _node.sub_workflow not in sub_workflows:
+            stack.append((_node, True))
+            stack.append((_node.sub_workflow.top_node, False))
+
+        children: tuple = _node.success + _node.failed + _node.always
+        stack.extend((child, False) for child in reversed(children))
+
+    return sub_workflows
+
+
+def _dump_playbook(playbook_path: str) -> dict:
+    analysis: dict = parser.analyze_playbook(playbook_path)
+
+    # Included files and roles are also checked at loading plan.
+    return {'files': {path: _get_file_hash(path)
+                      for path, _ in analysis['files']},
+            'necessary': sorted(analysis['necessary']),
+            'set_stats': list(analysis['set_stats']),
+            'set_fact': analysis['set_fact'],
+            'vars': analysis['vars']}
+
+
+def _load_playbook(playbook_path: str, playbook: dict):
+    analysis = {'necessary': set(playbook['necessary']),
+                'set_stats': playbook['set_stats'],
+                'set_fact': playbook['set_fact'],
+                'vars': playbook['vars'],
+                'files': list(playbook['files'])}
+
+    node.register_playbook_vars(playbook_path, analysis)
+
+
+def _dump_sub_workflow(sub_workflow: node.SubWorkflow) -> dict:
+    return {'path': sub_workflow.workflow_path,
+            'nodes': _dump_nodes(sub_workflow.top_node),
+            'required': {path: sorted(keys)
+                         for path, keys in sub_workflow.required.items()},
+            'provided_success': sorted(sub_workflow.provided_success),
+            'provided_failed': sorted(sub_workflow.provided_failed)}
+
+
+def _load_sub_workflow_analysis(sub_workflow: node.SubWorkflow,
+                                workflow: dict):
+    sub_workflow.required = {path: set(keys)
+                             for path, keys in workflow['required'].items()}
+    sub_workflow.provided_success = set(workflow['provided_success'])
+    sub_workflow.provided_failed = set(workflow['provided_failed'])
+
+
+def compile_plan(workflow_file_path: str) -> dict:
+    """
+    Parse workflow file and all of playbooks,
+    and return plan which is dumpable as JSON.
+    Plan contains variables analysis of each playbook and sub-workflow,
+    which doesn't depend on `extra_vars` given at running.
+    """
+
+    workflow_path: str = str(pathlib.Path(workflow_file_path).resolve())
+    workflow_dict = yaml_loader.load_file(workflow_path)
+
+    # Tree is prepared for dry run to analyze sub-workflows.
+    top_node: node.Node = tree.generate_workflow_tree(workflow_dict, True,
+                                                      {}, workflow_path)
+    sub_workflows: list = _collect_sub_workflows(top_node)
+
+    workflow_files = {workflow_path: _get_file_hash(workflow_path)}
+    workflows = []
+    for sub_workflow in sub_workflows:
+        workflow_files[sub_workflow.workflow_path] = \
+            _get_file_hash(sub_workflow.workflow_path)
+        workflows.append(_dump_sub_workflow(sub_workflow))
+
+    nodes: list = _dump_nodes(top_node)
+
+    playbooks = {}
+    stack: list = [top_node] + [sub_workflow.top_node
+                                for sub_workflow in sub_workflows]
+    while stack:
+        _node: node.Node = stack.pop()
+        if _node.node_type != 'workflow' and \
+                _node.playbook_path not in playbooks:
+            playbooks[_node.playbook_path] = \
+                _dump_playbook(_node.playbook_path)
+
+        stack.extend(_node.success + _node.failed + _node.always)
+
+    return {'version': PLAN_VERSION,
+            'workflow_file': workflow_path,
+            'workflow_files': workflow_files,
+            'playbooks': playbooks,
+            'sub_workflows': workflows,
+            'pools': tree.get_pools(workflow_dict, top_node),
+            'nodes': nodes}
+
+
+def write_plan(plan: dict, plan_file_path: str):
+    """ Write compiled plan to the file. """
+
+    with open(plan_file_path, 'w') as plf:
+        json.dump(plan, plf)
+
+
+def read_plan(plan_file_path: str) -> dict:
+    """ Read compiled plan file, and check it is still valid. """
+
+    with open(plan_file_path, 'r') as plf:
+        plan: dict = json.load(plf)
+
+    if plan.get('version') != PLAN_VERSION:
+        raise PlanInvalid("Plan file version is not supported. "
+                          "plan: '{}'".format(plan_file_path))
+
+    resources: dict = dict(plan['workflow_files'])
+    for playbook in plan['playbooks'].values():
+        resources.update(playbook['files'])
+    for resource_path, sha256 in resources.items():
+        try:
+            changed: bool = _get_file_hash(resource_path) != sha256
+        except FileNotFoundError:
+            changed = True
+
+        if changed:
+            raise PlanInvalid("Resource file is changed after compiled. "
+                              "Please compile plan again. "
+                              "file: '{}'".format(resource_path))
+
+    return plan
+
+
+def load_plan(plan: dict, dry_run: bool, extra_vars_arg: dict) -> node.Node:
+    """ Build workflow tree from compiled plan. """
+
+    for playbook_path, playbook in plan['playbooks'].items():
+        _load_playbook(playbook_path, playbook)
+
+    sub_workflows = {}
+    for workflow in plan['sub_workflows']:
+        sub_top_node: node.Node = _load_nodes(workflow['nodes'], dry_run,
+                                              None, sub_workflows)
+        sub_workflow = node.SubWorkflow(workflow['path'], sub_top_node)
+        if dry_run:
+            _load_sub_workflow_analysis(sub_workflow, workflow)
+        sub_workflows[workflow['path']] = sub_workflow
+
+    return _load_nodes(plan['nodes'], dry_run, extra_vars_arg, sub_workflows)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Variable provenance index of dry run workflow tree.
+
+Index answers which node provides each variable to which node.
+    - `extra_vars`: given by command line `-e` option.
+    - `set_stats`: defined by `set_stats` of the node's playbook.
+    - `workflow`: defined at every end of the node's sub-workflow.
+    - `vars`: defined by the node's playbook header, vars_files or role.
+    - `set_fact`: defined by `set_fact` task of the node's playbook.
+"""
+
+import json
+
+from internal.playbook import parser
+from internal.workflow import node as w_node
+
+# Nodes are numbered in written order from `1`, because `node_id` is
+# the depth of the node and it isn't unique.
+# Number `0` is provider of variables given by command line.
+EXTRA_VARS_ID = 0
+
+
+class Provider:
+    """ Data class of one variable's definition. """
+
+    __slots__ = ('provider_type', 'node_number', 'node_name', 'location')
+
+    def __init__(self, provider_type: str, node_number: int, node_name: str,
+                 location: str = ''):
+        self.provider_type = provider_type
+        self.node_number = node_number
+        self.node_name = node_name
+        self.location = location
+
+    def describe(self) -> str:
+        """ Provider description for printing. """
+
+        if self.provider_type == 'extra_vars':
+            return 'extra_vars'
+        description = "{} of node '{}' (#{})".format(
+            self.provider_type, self.node_name, self.node_number)
+        if self.location:
+            description += ' at {}'.format(self.location)
+        return description
+
+    def to_dict(self) -> dict:
+        """ Provider as JSON serializable dict. """
+        return {'type': self.provider_type,
+                'node_number': self.node_number,
+                'node_name': self.node_name,
+                'location': self.location}
+
+
+def _get_necessary(_node: w_node.Node) -> set:
+    necessary = set()
+    for variables in _node.get_necessary_variable_keys().values():
+        necessary |= variables
+    return necessary
+
+
+class ProvenanceIndex:
+    """
+    Index from variable name to it's providers,
+    and from provider node to nodes which consume it's variables.
+    Sub-workflow is indexed as one node like dry run checks it.
+    """
+
+    def __init__(self, top_node: w_node.Node):
+        # variable name -> [Provider]
+        self.providers = {}
+        # provider node number -> {consumer node number: {variable name}}
+        self.consumers = {}
+        # node number -> {variable name: Provider reaching the node}
+        self.consumed = {}
+        # node number -> variable names which no ancestor provides.
+        self.missing = {}
+        # Nodes in written order. Node number is the position from `1`.
+        self.nodes = []
+        self._numbers = {}
+        # node number -> parent node number
+        self._parents = {}
+
+        self._build(top_node)
+
+    def _register(self, var_name: str, provider: Provider):
+        self.providers.setdefault(var_name, []).append(provider)
+
+    def _register_local(self, _node: w_node.Node, number: int):
+        """ Variables which the playbook defines for itself. """
+
+        if isinstance(_node, w_node.WorkflowJobNode):
+            return
+
+        analysis: dict = parser.analyze_playbook(_node.playbook_path)
+        for provider_type in ('vars', 'set_fact'):
+            for var_name, locations in analysis[provider_type].items():
+                for location in locations:
+                    self._register(var_name, Provider(
+                        provider_type, number, _node.node_name, location))
+
+    def _get_outgoing(self, _node: w_node.Node, number: int,
+                      incoming: dict) -> tuple:
+        """ Variables' providers passed to success and failed children. """
+
+        provider_type = 'workflow' \
+            if isinstance(_node, w_node.WorkflowJobNode) else 'set_stats'
+
+        success: dict = incoming
+        if _node.define_stats:
+            provider = Provider(provider_type, number, _node.node_name)
+            success = dict(incoming)
+            for var_name in _node.define_stats:
+                success[var_name] = provider
+                self._register(var_name, provider)
+
+        failed: dict = incoming
+        if isinstance(_node, w_node.WorkflowJobNode) and \
+                _node.sub_workflow.provided_failed:
+            provider = Provider('workflow', number, _node.node_name,
+                                'failed')
+            failed = dict(incoming)
+            for var_name in _node.sub_workflow.provided_failed:
+                failed[var_name] = provider
+                self._register(var_name, provider)
+
+        return success, failed
+
+    def _build(self, top_node: w_node.Node):
+        extra_vars = Provider('extra_vars', EXTRA_VARS_ID, 'extra_vars')
+        incoming = {var_name: extra_vars
+                    for var_name in top_node.before_extra_vars}
+        for var_name in incoming:
+            self._register(var_name, extra_vars)
+
+        # Providers dict is shared by nodes while no variable is added.
+        stack = [(top_node, None, incoming)]
+        while stack:
+            _node, parent_number, incoming = stack.pop()
+            self.nodes.append(_node)
+            number: int = len(self.nodes)
+            self._numbers[_node] = number
+            self._parents[number] = parent_number
+
+            necessary: set = _get_necessary(_node)
+            consumed = {var_name: incoming[var_name]
+                        for var_name in necessary if var_name in incoming}
+            self.consumed[number] = consumed
+            for var_name, provider in consumed.items():
+                self.consumers.setdefault(provider.node_number, {}).setdefault(
+                    number, set()).add(var_name)
+
+            missing: set = necessary - incoming.keys()
+            if missing:
+                self.missing[number] = missing
+
+            self._register_local(_node, number)
+
+            success, failed = self._get_outgoing(_node, number, incoming)
+            children: tuple = _node.success + _node.failed + _node.always
+            stack.extend((child, number, success if w_node.SwitchJobResult
+                          .is_success(child.case_type) else failed)
+                         for child in reversed(children))
+
+    def get_node_number(self, _node: w_node.Node) -> int:
+        """ Number of the node in this index. """
+        return self._numbers[_node]
+
+    def get_providers(self, var_name: str) -> list:
+        """ All of providers of the variable in workflow. """
+        return self.providers.get(var_name, [])
+
+    def get_provider(self, node_number: int, var_name: str) -> Provider:
+        """ Provider of the variable which the node consumes. """
+        return self.consumed.get(node_number, {}).get(var_name)
+
+    def get_consumers(self, node_number: int) -> dict:
+        """
+        Nodes which consume variables provided by the node.
+        Use `EXTRA_VARS_ID` for variables given by command line.
+        """
+        return self.consumers.get(node_number, {})
+
+    def explain_missing(self, node_number: int) -> str:
+        """ Where the node's missing variables are defined in workflow. """
+
+        explanations = []
+        for var_name in sorted(self.missing.get(node_number, ())):
+            # Playbook's own variables are defined after it started.
+            providers: list = [provider.describe()
+                               for provider in self.get_providers(var_name)
+                               if provider.node_number != node_number]
+            if providers:
+                explanations.append(
+                    "'{}' is provided by {}, which doesn't run before "
+                    "this node".format(var_name, ', '.join(providers)))
+            else:
+                explanations.append(
+                    "'{}' is not provided by any node".format(var_name))
+
+        return '; '.join(explanations)
+
+    def to_dict(self) -> dict:
+        """ Index as JSON serializable dict. """
+
+        nodes = {}
+        for number, _node in enumerate(self.nodes, 1):
+            nodes[str(number)] = {
+                'name': _node.node_name,
+                'type': _node.node_type,
+                'playbook': _node.playbook_path,
+                'parent': self._parents[number],
+                'case_type': _node.case_type,
+                'consumes': {var_name: provider.to_dict()
+                             for var_name, provider
+                             in sorted(self.consumed[number].items())},
+                'missing': sorted(self.missing.get(number, ())),
+                'consumers': {str(consumer): sorted(variables)
+                              for consumer, variables
+                              in sorted(self.get_consumers(number).items())}}
+
+        return {'variables': {var_name: [provider.to_dict()
+                                         for provider in providers]
+                              for var_name, providers
+                              in sorted(self.providers.items())},
+                'extra_vars_consumers': {
+                    str(consumer): sorted(variables)
+                    for consumer, variables
+                    in sorted(self.get_consumers(EXTRA_VARS_ID).items())},
+                'nodes': nodes}
+
+    def dump(self, file_path: str):
+        """ Write index to JSON file. """
+
+        with open(file_path, 'w') as pvf:
+            json.dump(self.to_dict(), pvf, indent=2)
+            pvf.write('\n')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Slots of resources which running jobs use.
+"""
+
+import multiprocessing
+
+# Pool name of slots which every job_template uses.
+GLOBAL_POOL = ''
+
+
+class ResourceLimiter:
+    """
+    Used slots of the global limit and named pools.
+    Counts are in shared memory, so sub-workflows running in processes
+    forked after this is created use the same slots.
+    Limit `None` is unlimited. Job's weight more than the limit is
+    reduced to the limit, so the job runs when the pool is empty.
+    """
+
+    def __init__(self, max_slots: int = None, pools: dict = None):
+        self.limits = {GLOBAL_POOL: max_slots}
+        self.limits.update(pools or {})
+
+        self._indexes = {name: idx
+                         for idx, name in enumerate(sorted(self.limits))}
+        context = multiprocessing.get_context('fork')
+        self._used = context.Array('i', len(self._indexes))
+
+    def _get_weights(self, requests: tuple) -> list:
+        weights = []
+        for pool_name, weight in requests:
+            limit: int = self.limits.get(pool_name)
+            if limit is not None:
+                weights.append((pool_name, self._indexes[pool_name],
+                                min(weight, limit), limit))
+        return weights
+
+    def try_acquire_pools(self, requests: tuple) -> tuple:
+        """
+        Take all of requested `(pool name, weight)` slots if those are free.
+        Return names of limited pools which don't have free slots,
+        without taking any slot. Empty tuple means slots are taken.
+        """
+
+        weights: list = self._get_weights(requests)
+        with self._used.get_lock():
+            refused = tuple(pool_name
+                            for pool_name, idx, weight, limit in weights
+                            if self._used[idx] + weight > limit)
+            if refused:
+                return refused
+
+            for _, idx, weight, _ in weights:
+                self._used[idx] += weight
+        return ()
+
+    def try_acquire(self, requests: tuple) -> bool:
+        """
+        Take all of requested `(pool name, weight)` slots if those are free.
+        Return `False` without taking any slot if one of them isn't free.
+        """
+        return not self.try_acquire_pools(requests)
+
+    def release(self, requests: tuple):
+        """ Give back slots taken by `try_acquire`. """
+
+        weights: list = self._get_weights(requests)
+        with self._used.get_lock():
+            for _, idx, weight, _ in weights:
+                self._used[idx] -= weight
+
+    def get_used(self, pool_name: str = GLOBAL_POOL) -> int:
+        """ Number of used slots of the pool. """
+        return self._used[self._indexes[pool_name]]
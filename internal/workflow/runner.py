@@ -3,24 +3,66 @@
 Runner for workflow.
 """
 
-import copy
 from datetime import datetime, timezone
-
+import multiprocessing
+from multiprocessing import connection
+import os
+import signal
+import sys
+import time
+
+from internal import job_log
+from internal import trace
+from internal.playbook import runner as p_run
+from internal.workflow import node as w_node
 from internal.workflow import parser as w_parser
+from internal.workflow import provenance
+from internal.workflow import resource as w_resource
+from internal.workflow import schedule
 
 
 class JobRecord:
     """ Data class for recording job result. """
 
-    def __init__(self, job_id: int, job_template_name: str):
+    __slots__ = ('_start', '_end', '_job_id', '_job_template_name', '_type',
+                 '_status', '_sub_records', '_queue_wait', '_attempts',
+                 '_node_id', '_playbook_path', '_critical_path',
+                 '_stats_capture', '_log_path', '_log_tail')
+
+    def __init__(self, job_id: int, job_template_name: str,
+                 job_type: str = 'job_template', node_id: int = 0,
+                 playbook_path: str = ''):
         self._start: datetime = datetime.now(timezone.utc)
         self._end: str = ''
 
         self._job_id: int = job_id
         self._job_template_name: str = job_template_name
-        self._type: str = 'job_template'  # workflow_job is no supported yet.
+        self._type: str = job_type  # `job_template` or `workflow_job`.
         self._status: str = ''
 
+        # node's depth and playbook or sub-workflow file.
+        self._node_id: int = node_id
+        self._playbook_path: str = playbook_path
+
+        # job results in sub-workflow for `workflow_job`.
+        self._sub_records: tuple = ()
+
+        # seconds waited for parent job or resource slots.
+        self._queue_wait: float = 0.0
+
+        # history of runs on failed hosts for `job_template`.
+        self._attempts: tuple = ()
+
+        # seconds of the longest chain of jobs which ends at this job.
+        self._critical_path: float = 0.0
+
+        # seconds to read `set_stats` values after the job.
+        self._stats_capture: float = 0.0
+
+        # compressed output of `job_template` and it's last lines.
+        self._log_path: str = ''
+        self._log_tail: tuple = ()
+
     def set_result_successful(self):
         """ record job result """
         self._status = 'successful'
@@ -29,6 +71,39 @@ class JobRecord:
         """ record job result """
         self._status = 'failed'
 
+    def set_result_timeout(self):
+        """ record job killed by timeout """
+        self._status = 'timeout'
+
+    def set_result_canceled(self):
+        """ record job killed or skipped by cancellation """
+        self._status = 'canceled'
+
+    def set_sub_records(self, sub_records: list):
+        """ record job results in sub-workflow """
+        self._sub_records = tuple(sub_records)
+
+    def set_queue_wait(self, queue_wait: float):
+        """ record seconds waited since the job became runnable """
+        self._queue_wait = queue_wait
+
+    def set_attempts(self, attempts: tuple):
+        """ record history of each attempt to run the job """
+        self._attempts = tuple(attempts)
+
+    def set_critical_path(self, critical_path: float):
+        """ record seconds of the longest chain ending at the job """
+        self._critical_path = critical_path
+
+    def set_stats_capture(self, stats_capture: float):
+        """ record seconds to read `set_stats` values """
+        self._stats_capture = stats_capture
+
+    def set_log(self, log_path: str, log_tail: tuple = ()):
+        """ record log file of the job's output and it's last lines """
+        self._log_path = log_path
+        self._log_tail = tuple(log_tail)
+
     def set_end_time(self):
         """ record job finished time """
         self._end = datetime.now(timezone.utc)
@@ -37,9 +112,35 @@ class JobRecord:
         """ get `created_time` for printing """
         return self._start.strftime("%Y-%m-%dT%H:%M:%S.%f")
 
+    def get_created_timestamp(self) -> float:
+        """ get `created_time` as POSIX timestamp """
+        return self._start.timestamp()
+
+    def get_queue_wait(self) -> str:
+        """ get `queue_wait` for printing """
+        return '{:.6f}'.format(self._queue_wait)
+
+    def get_queue_wait_seconds(self) -> float:
+        """ get `queue_wait` as seconds """
+        return self._queue_wait
+
+    def get_stats_capture_seconds(self) -> float:
+        """ get seconds to read `set_stats` values """
+        return self._stats_capture
+
+    def get_attempts(self) -> str:
+        """ get number of attempts for printing """
+        if self._type == 'workflow_job':
+            return ''
+        return str(len(self._attempts))
+
     def get_elapsed(self) -> str:
         """ get `elapsed` for printing """
-        return str(self._end - self._start).split(':')[-1]
+        return '{:.6f}'.format(self.get_elapsed_seconds())
+
+    def get_elapsed_seconds(self) -> float:
+        """ get `elapsed` as seconds """
+        return (self._end - self._start).total_seconds()
 
     @property
     def job_id(self) -> int:
@@ -56,20 +157,144 @@ class JobRecord:
         """ getter for job type """
         return self._type
 
+    @property
+    def node_id(self) -> int:
+        """ getter for node id """
+        return self._node_id
+
+    @property
+    def playbook_path(self) -> str:
+        """ getter for playbook or sub-workflow file path """
+        return self._playbook_path
+
     @property
     def status(self) -> str:
         """ getter for job result """
         return self._status
 
+    @property
+    def sub_records(self) -> tuple:
+        """ getter for job results in sub-workflow """
+        return self._sub_records
+
+    @property
+    def attempts(self) -> tuple:
+        """ getter for history of attempts """
+        return self._attempts
+
+    @property
+    def log_path(self) -> str:
+        """ getter for log file of the job's output """
+        return self._log_path
+
+    @property
+    def log_tail(self) -> tuple:
+        """ getter for the last lines of the job's output """
+        return self._log_tail
+
+    @property
+    def critical_path(self) -> float:
+        """ getter for seconds of the longest chain ending at the job """
+        return self._critical_path
+
+
+# Seconds to wait killed job's process exits before `SIGKILL`.
+KILL_GRACE = 5.0
+# Seconds to check again resource slots used by other processes.
+SLOT_POLL_INTERVAL = 0.1
+
+
+def _get_job_type(_node: w_node.Node) -> str:
+    if isinstance(_node, w_node.WorkflowJobNode):
+        return 'workflow_job'
+    return 'job_template'
+
+
+def _create_record(job_id: int, _node: w_node.Node) -> JobRecord:
+    return JobRecord(job_id, _node.node_name, _get_job_type(_node),
+                     _node.node_id, _node.playbook_path)
+
+
+def _signal_job(process, signum: int):
+    try:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
+        # Process may not have made own process group yet.
+        try:
+            os.kill(process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def _raise_exit(signum, _):
+    # Sub-workflow's process kills it's own running jobs at exiting.
+    raise SystemExit(128 + signum)
 
-class WorkflowRunner:
-    """ Workflow runner. """
 
-    def __init__(self, inventory_file: str):
+class _RunningJob:
+    """ Job which is running in forked process. """
+
+    __slots__ = ('workflow_node', 'job_id', 'siblings', 'record', 'process',
+                 'result_conn', 'deadline', 'requests')
+
+    def __init__(self, workflow_node: w_parser.WorkflowNode, job_id: int,
+                 siblings: w_node.Node, record: JobRecord):
+        self.workflow_node = workflow_node
+        self.job_id = job_id
+        # Parent node. Jobs which have the same parent are siblings.
+        self.siblings = siblings
+        # Record of the killed job. Finished job sends it's own record.
+        self.record = record
+        self.process = None
+        self.result_conn = None
+        # `time.monotonic()` when this job is killed.
+        self.deadline: float = None
+        # Resource slots which this job uses.
+        self.requests: tuple = ()
+
+
+class WorkflowRunner:
+    """
+    Workflow runner.
+    Jobs run in this process one by one, unless they have timeout
+    or `max_parallel` is more than one.
+    Those jobs run in forked processes, and those processes are killed
+    at timeout or cancellation.
+    Runnable jobs wait in depth first order until resource slots are free.
+    A job doesn't overtake waiting jobs which use the same pool,
+    so jobs with large weight are not starved.
+    Siblings are dispatched in written order, or by `estimator`'s
+    critical path from the longest one.
+    """
+
+    def __init__(self, inventory_file: str, max_parallel: int = 1,
+                 deadline: float = None,
+                 limiter: w_resource.ResourceLimiter = None,
+                 on_record=None,
+                 estimator: schedule.DurationEstimator = None):
         self.inventory_file_path = inventory_file
+        # Number of sibling jobs running at the same time in this workflow.
+        # Sub-workflow has it's own limit.
+        self.max_parallel = max(max_parallel, 1)
+        # `time.monotonic()` when the whole workflow is timed out.
+        self.deadline = deadline
+        # Global and pools' slots shared with sub-workflows.
+        self.limiter = limiter
+        # Called with each finished job's record in this process.
+        # Sub-workflow's records are passed with it's `workflow_job` record.
+        self.record_listeners = [on_record] if on_record else []
+        # Estimated durations which decide siblings' dispatch order.
+        self.estimator = estimator
 
         # record results of running job_templates.
         self.executed = []
+        self.last_node = None
+
+        # Seconds of the longest chain of finished jobs, which is
+        # the lower bound of this workflow's elapsed time.
+        self.critical_path: float = 0.0
+        # Chain's seconds ending at each finished node by `id` of node.
+        self._path_ends = {}
 
     def dry_run(self, workflow_node: w_parser.WorkflowNode):
         """
@@ -77,44 +302,83 @@ class WorkflowRunner:
         in each node's `before_extra_vars`.
         """
 
-        workflow_node.dry_run()
-
-        if workflow_node.current_node.success:
-            for node in workflow_node.current_node.success:
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.dry_run(child_workflow_node)
-
-        if workflow_node.current_node.failed:
-            for node in workflow_node.current_node.failed:
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.dry_run(child_workflow_node)
-
-        if workflow_node.current_node.always:
-            for node in workflow_node.current_node.always:
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.dry_run(child_workflow_node)
-
-    def run(self, workflow_node: w_parser.WorkflowNode, auth_extra_vars: str,
-            work_dir: str, job_id: int = 1) -> list:
-        """ Execute each Ansible playbook. """
-
+        top_node: w_node.Node = workflow_node.current_node
+
+        # Depth first search by own stack instead of recursive call.
+        stack = [workflow_node]
+        while stack:
+            workflow_node = stack.pop()
+            try:
+                workflow_node.dry_run()
+            except w_parser.DryRunFailed as exc:
+                # Index is built only at failure to show where
+                # the missing variables are defined.
+                index = provenance.ProvenanceIndex(top_node)
+                number: int = index.get_node_number(
+                    workflow_node.current_node)
+                explanation: str = index.explain_missing(number)
+                if explanation:
+                    exc.message = "{} node: '{}' (#{}). {}.".format(
+                        exc.message, workflow_node.current_node.node_name,
+                        number, explanation)
+                raise
+
+            current_node: w_node.Node = workflow_node.current_node
+            next_nodes: tuple = (current_node.success +
+                                 current_node.failed +
+                                 current_node.always)
+            stack.extend(workflow_node.create_child(node)
+                         for node in reversed(next_nodes))
+
+    def _run_sub_workflow(self, workflow_node: w_parser.WorkflowNode,
+                          record: JobRecord, auth_extra_vars: str,
+                          work_dir: str) -> int:
+        sub_workflow_node: w_parser.WorkflowNode = \
+            workflow_node.enter_sub_workflow()
+
+        sub_workflow = WorkflowRunner(self.inventory_file_path,
+                                      self.max_parallel, self.deadline,
+                                      self.limiter, estimator=self.estimator)
+        sub_results: [JobRecord] = sub_workflow.run(sub_workflow_node,
+                                                    auth_extra_vars,
+                                                    work_dir)
+        record.set_sub_records(sub_results)
+
+        workflow_node.leave_sub_workflow(sub_workflow.last_node)
+
+        if sub_results[-1].status == 'successful':
+            return 0
+        return 1
+
+    def _run_job(self, workflow_node: w_parser.WorkflowNode,
+                 auth_extra_vars: str, work_dir: str, job_id: int,
+                 log_path: str = None) -> int:
         job_template_name: str = workflow_node.current_node.node_name
-
-        print()
-        print('-----')
-        print("<< Execute job: '{}' >>".format(job_template_name))
-
-        record = JobRecord(job_id, job_template_name)
-
-        r_code = workflow_node.run(self.inventory_file_path,
-                                   auth_extra_vars,
-                                   work_dir)
+        is_workflow: bool = isinstance(workflow_node.current_node,
+                                       w_node.WorkflowJobNode)
+
+        job_span = trace.span(job_template_name, 'job', job_id=job_id)
+        if is_workflow:
+            workflow_node.echo("<< Execute workflow: '{}' >>"
+                               .format(job_template_name), ('', '-----'))
+            record = _create_record(job_id, workflow_node.current_node)
+            with job_span:
+                r_code = self._run_sub_workflow(workflow_node, record,
+                                                auth_extra_vars, work_dir)
+        else:
+            workflow_node.echo("<< Execute job: '{}' >>"
+                               .format(job_template_name), ('', '-----'))
+            record = _create_record(job_id, workflow_node.current_node)
+            if log_path is None:
+                log_path = workflow_node.create_log_file()
+            with job_span:
+                r_code = workflow_node.run(self.inventory_file_path,
+                                           auth_extra_vars,
+                                           work_dir, log_path)
+            record.set_attempts(workflow_node.attempts)
+            record.set_stats_capture(workflow_node.stats_capture)
+            if log_path:
+                record.set_log(log_path, workflow_node.output_tail)
         record.set_end_time()
 
         if r_code == 0:
@@ -123,35 +387,346 @@ class WorkflowRunner:
             record.set_result_failed()
 
         self.executed.append(record)
+        self.last_node = workflow_node.current_node
+
+        return r_code
+
+    def add_record_listener(self, listener):
+        """ Call `listener` with each finished job's record. """
+        self.record_listeners.append(listener)
+
+    def _notify(self, record: JobRecord):
+        for listener in self.record_listeners:
+            listener(record)
+
+    def _needs_process(self, _node: w_node.Node) -> bool:
+        return self.max_parallel > 1 or _node.timeout is not None or \
+            self.deadline is not None
+
+    def _is_expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @staticmethod
+    def _get_requests(_node: w_node.Node) -> tuple:
+        """ Resource slots which the job uses as `(pool name, weight)`. """
+
+        # Sub-workflow's own jobs use slots,
+        # so the sub-workflow doesn't wait slots used by it's jobs.
+        if isinstance(_node, w_node.WorkflowJobNode):
+            return ()
+
+        requests = [(w_resource.GLOBAL_POOL, _node.weight)]
+        if _node.pool is not None:
+            requests.append((_node.pool, _node.weight))
+        return tuple(requests)
+
+    def _release(self, job: _RunningJob):
+        if self.limiter:
+            self.limiter.release(job.requests)
+
+    def _record_canceled(self, workflow_node: w_parser.WorkflowNode,
+                         job_id: int, record: JobRecord = None,
+                         queued_at: float = None):
+        if record is None:
+            record = _create_record(job_id, workflow_node.current_node)
+            record.set_queue_wait(time.monotonic() - queued_at)
+        record.set_end_time()
+        record.set_result_canceled()
+        self.executed.append(record)
+        self._notify(record)
+
+        workflow_node.echo("<< Canceled job: '{}' >>"
+                           .format(record.job_template_name))
+
+    def _run_job_process(self, workflow_node: w_parser.WorkflowNode,
+                         auth_extra_vars: str, work_dir: str, job_id: int,
+                         log_path: str, result_conn):
+        """ This method is called in forked process. """
+
+        # Job's process group is killed with Ansible's child processes.
+        os.setpgrp()
+        signal.signal(signal.SIGTERM, _raise_exit)
+        p_run.separate_local_tmp()
+        trace.name_process('job {}: {}'.format(
+            job_id, workflow_node.current_node.node_name))
+
+        r_code: int = self._run_job(workflow_node, auth_extra_vars, work_dir,
+                                    job_id, log_path)
+
+        sys.stdout.flush()
+        result_conn.send((r_code, self.executed[-1],
+                          dict(workflow_node.current_node.after_extra_vars)))
+        result_conn.close()
+
+    def _start_job(self, workflow_node: w_parser.WorkflowNode,
+                   auth_extra_vars: str, work_dir: str, job_id: int,
+                   siblings: w_node.Node) -> _RunningJob:
+        current_node: w_node.Node = workflow_node.current_node
+        if workflow_node.parent_node.node_id != 0:
+            # Killed job passes these variables to failure branch.
+            current_node.set_before_extra_vars(workflow_node.parent_node)
+
+        job = _RunningJob(workflow_node, job_id, siblings,
+                          _create_record(job_id, current_node))
+        # Log file is decided here to read it if the job is killed.
+        log_path: str = ''
+        if not isinstance(current_node, w_node.WorkflowJobNode):
+            log_path = workflow_node.create_log_file()
+            job.record.set_log(log_path)
+        deadlines: list = [self.deadline] if self.deadline else []
+        if current_node.timeout is not None:
+            deadlines.append(time.monotonic() + current_node.timeout)
+        if deadlines:
+            job.deadline = min(deadlines)
+
+        # Not flushed output would be printed by child process too.
+        sys.stdout.flush()
+        context = multiprocessing.get_context('fork')
+        job.result_conn, child_conn = context.Pipe(duplex=False)
+        job.process = context.Process(target=self._run_job_process,
+                                      args=(workflow_node, auth_extra_vars,
+                                            work_dir, job_id, log_path,
+                                            child_conn))
+        job.process.start()
+        child_conn.close()
+        return job
+
+    @staticmethod
+    def _kill_jobs(jobs: list):
+        for job in jobs:
+            _signal_job(job.process, signal.SIGTERM)
+
+        grace_end: float = time.monotonic() + KILL_GRACE
+        for job in jobs:
+            job.process.join(max(grace_end - time.monotonic(), 0))
+            if job.process.exitcode is None:
+                _signal_job(job.process, signal.SIGKILL)
+                job.process.join()
+            job.result_conn.close()
+
+    def _receive_job(self, job: _RunningJob) -> int:
+        try:
+            r_code, record, after_extra_vars = job.result_conn.recv()
+        except EOFError:
+            # Process exited without result.
+            r_code, record, after_extra_vars = 1, None, None
+        job.result_conn.close()
+        job.process.join()
+
+        current_node: w_node.Node = job.workflow_node.current_node
+        if record is None:
+            record = job.record
+            record.set_end_time()
+            record.set_result_failed()
+            self._read_log_tail(job)
+        else:
+            record.set_queue_wait(job.record.get_queue_wait_seconds())
+        if after_extra_vars is None:
+            current_node.after_extra_vars = current_node.before_extra_vars
+        else:
+            current_node.set_after_extra_vars(after_extra_vars)
+
+        self.executed.append(record)
+        self._notify(record)
+        self.last_node = current_node
+        return r_code
+
+    @staticmethod
+    def _read_log_tail(job: _RunningJob):
+        # Tail in memory of the killed process is lost.
+        if job.record.log_path:
+            job.record.set_log(job.record.log_path, job_log.read_tail(
+                job.record.log_path, job.workflow_node.log_tail))
+
+    def _time_out_job(self, job: _RunningJob) -> int:
+        self._kill_jobs([job])
+
+        current_node: w_node.Node = job.workflow_node.current_node
+        current_node.after_extra_vars = current_node.before_extra_vars
+        job.record.set_end_time()
+        job.record.set_result_timeout()
+        self._read_log_tail(job)
+        self.executed.append(job.record)
+        self._notify(job.record)
+        self.last_node = current_node
+
+        job.workflow_node.echo("<< Timed out job: '{}' >>"
+                               .format(current_node.node_name), ('',))
+        return 1
+
+    def _cancel_siblings(self, siblings: w_node.Node, stack: list,
+                         running: list):
+        """ Cancel waiting and running jobs which have the same parent. """
+
+        for item in [item for item in stack if item[2] is siblings]:
+            stack.remove(item)
+            self._record_canceled(item[0], item[1], queued_at=item[3])
+
+        canceled: list = [job for job in running if job.siblings is siblings]
+        self._kill_jobs(canceled)
+        for job in canceled:
+            running.remove(job)
+            self._release(job)
+            self._record_canceled(job.workflow_node, job.job_id, job.record)
+
+    def _add_critical_path(self, workflow_node: w_parser.WorkflowNode,
+                           record: JobRecord):
+        if record.type == 'workflow_job':
+            # Sub-workflow's jobs may have waited running jobs.
+            duration: float = max((sub_record.critical_path
+                                   for sub_record in record.sub_records),
+                                  default=0.0)
+        else:
+            duration = record.get_elapsed_seconds()
+
+        critical_path: float = self._path_ends.get(
+            id(workflow_node.parent_node), 0.0) + duration
+        record.set_critical_path(critical_path)
+        self._path_ends[id(workflow_node.current_node)] = critical_path
+        self.critical_path = max(self.critical_path, critical_path)
+
+    def _finish_job(self, workflow_node: w_parser.WorkflowNode, job_id: int,
+                    siblings: w_node.Node, r_code: int, stack: list,
+                    running: list):
+        # The finished job's record is the last one before cancellation.
+        self._add_critical_path(workflow_node, self.executed[-1])
 
         # Go next job
-        if r_code == 0 and workflow_node.current_node.success:
-            for node in workflow_node.current_node.success:
-                job_id += 1
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.run(child_workflow_node, auth_extra_vars, work_dir,
-                         job_id=job_id)
-
-        elif r_code != 0 and workflow_node.current_node.failed:
-            for node in workflow_node.current_node.failed:
-                job_id += 1
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.run(child_workflow_node, auth_extra_vars, work_dir,
-                         job_id=job_id)
+        current_node: w_node.Node = workflow_node.current_node
+        if r_code == 0:
+            next_nodes: tuple = current_node.success
         else:
-            pass
+            next_nodes = current_node.failed
+            if current_node.fail_fast:
+                self._cancel_siblings(siblings, stack, running)
+        next_nodes = next_nodes + current_node.always
+
+        order = range(len(next_nodes))
+        if self.estimator:
+            order = self.estimator.order(next_nodes)
+
+        # Next jobs' id are numbered in written order.
+        queued_at: float = time.monotonic()
+        next_jobs = [(workflow_node.create_child(next_nodes[idx]),
+                      job_id + idx + 1, current_node, queued_at)
+                     for idx in order]
+        stack.extend(reversed(next_jobs))
+
+    def _start_jobs(self, stack: list, running: list, auth_extra_vars: str,
+                    work_dir: str) -> bool:
+        """
+        Start runnable jobs from the top of the stack.
+        Return `False` if any job is waiting resource slots.
+        """
+
+        # Limited pools which an earlier job is waiting.
+        # Jobs of other pools aren't blocked by them.
+        blocked = set()
+        idx: int = len(stack) - 1
+        while idx >= 0 and len(running) < self.max_parallel:
+            workflow_node, job_id, siblings, queued_at = stack[idx]
+            current_node: w_node.Node = workflow_node.current_node
+
+            if self._is_expired():
+                # Workflow timed out. Rest of jobs are not run.
+                del stack[idx]
+                self._record_canceled(workflow_node, job_id,
+                                      queued_at=queued_at)
+                idx -= 1
+                continue
+
+            requests: tuple = self._get_requests(current_node)
+            if self.limiter:
+                refused = blocked.intersection(
+                    pool_name for pool_name, _ in requests) or \
+                    self.limiter.try_acquire_pools(requests)
+                if refused:
+                    blocked.update(refused)
+                    idx -= 1
+                    continue
+
+            del stack[idx]
+            queue_wait: float = time.monotonic() - queued_at
+            if self._needs_process(current_node):
+                job = self._start_job(workflow_node, auth_extra_vars,
+                                      work_dir, job_id, siblings)
+                job.requests = requests
+                job.record.set_queue_wait(queue_wait)
+                running.append(job)
+                idx -= 1
+                continue
+
+            r_code = self._run_job(workflow_node, auth_extra_vars, work_dir,
+                                   job_id)
+            self.executed[-1].set_queue_wait(queue_wait)
+            self._notify(self.executed[-1])
+            if self.limiter:
+                self.limiter.release(requests)
+            self._finish_job(workflow_node, job_id, siblings, r_code, stack,
+                             running)
+            # Children are pushed on the top of the stack.
+            idx = len(stack) - 1
+
+        return not blocked
+
+    def _wait_jobs(self, stack: list, running: list, waiting: bool):
+        """
+        Wait any running job finishes or times out.
+        If jobs are waiting resource slots used by other processes,
+        those are checked again after `SLOT_POLL_INTERVAL`.
+        """
+
+        timeouts: list = [job.deadline - time.monotonic()
+                          for job in running if job.deadline]
+        if waiting:
+            timeouts.append(SLOT_POLL_INTERVAL)
+        timeout: float = max(min(timeouts), 0) if timeouts else None
+
+        if not running:
+            time.sleep(timeout)
+            return
+
+        ready: list = connection.wait(
+            [job.result_conn for job in running] +
+            [job.process.sentinel for job in running], timeout)
+
+        for job in list(running):
+            # Job may be canceled by it's failed sibling.
+            if job not in running:
+                continue
+
+            if job.result_conn in ready or job.process.sentinel in ready:
+                running.remove(job)
+                r_code: int = self._receive_job(job)
+            elif job.deadline and job.deadline <= time.monotonic():
+                running.remove(job)
+                r_code = self._time_out_job(job)
+            else:
+                continue
+
+            self._release(job)
+            self._finish_job(job.workflow_node, job.job_id, job.siblings,
+                             r_code, stack, running)
+
+    def run(self, workflow_node: w_parser.WorkflowNode, auth_extra_vars: str,
+            work_dir: str, job_id: int = 1) -> list:
+        """ Execute each Ansible playbook. """
 
-        if workflow_node.current_node.always:
-            for node in workflow_node.current_node.always:
-                job_id += 1
-                child_workflow_node: w_parser.WorkflowNode = \
-                    copy.deepcopy(workflow_node)
-                child_workflow_node.go_next_child(node)
-                self.run(child_workflow_node, auth_extra_vars, work_dir,
-                         job_id=job_id)
+        # Depth first search by own stack instead of recursive call.
+        # (workflow tree object, job id, parent node, queued time)
+        stack = [(workflow_node, job_id, None, time.monotonic())]
+        running = []
+        try:
+            while stack or running:
+                started_all: bool = self._start_jobs(stack, running,
+                                                     auth_extra_vars,
+                                                     work_dir)
+                if running or stack:
+                    self._wait_jobs(stack, running, not started_all)
+        finally:
+            # Running jobs are not left at interruption.
+            self._kill_jobs(running)
+            for job in running:
+                self._release(job)
 
         return self.executed
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Dispatch order of sibling jobs.
+
+    - `written`: siblings are dispatched in written order.
+    - `lpt`: siblings with the longest estimated critical path are
+      dispatched first (longest processing time first).
+
+Node's critical path is it's own estimated duration and the longest
+critical path of it's `success` or `always` children.
+Durations are estimated from recorded runs of the same job_template.
+"""
+
+from internal.workflow import node as w_node
+
+SCHEDULES = ('lpt', 'written')
+
+
+class DurationEstimator:
+    """ Estimated critical path of each node by recorded durations. """
+
+    def __init__(self, durations: dict):
+        # Seconds of each job_template or sub-workflow name.
+        self.durations = durations
+
+        # Job without record is estimated as median job.
+        known: list = sorted(durations.values())
+        self.default: float = known[(len(known) - 1) // 2] if known else 0.0
+
+        # Critical path by `id` of node. Tree isn't changed while running.
+        self._paths = {}
+
+    @staticmethod
+    def _get_children(_node: w_node.Node) -> tuple:
+        return _node.success + _node.always
+
+    def _get_own(self, _node: w_node.Node) -> float:
+        duration: float = self.durations.get(_node.node_name)
+        if duration is not None:
+            return duration
+        if isinstance(_node, w_node.WorkflowJobNode):
+            return self._paths[id(_node.sub_workflow.top_node)]
+        return self.default
+
+    def critical_path(self, top_node: w_node.Node) -> float:
+        """ Estimated seconds of the longest chain from `top_node`. """
+
+        # Post order by own stack instead of recursive call.
+        stack = [(top_node, False)]
+        while stack:
+            _node, expanded = stack.pop()
+            if id(_node) in self._paths:
+                continue
+
+            dependencies = list(self._get_children(_node))
+            if isinstance(_node, w_node.WorkflowJobNode) and \
+                    _node.node_name not in self.durations:
+                dependencies.append(_node.sub_workflow.top_node)
+            if not expanded:
+                stack.append((_node, True))
+                stack.extend((dependency, False)
+                             for dependency in dependencies
+                             if id(dependency) not in self._paths)
+                continue
+
+            self._paths[id(_node)] = self._get_own(_node) + max(
+                (self._paths[id(child)]
+                 for child in self._get_children(_node)), default=0.0)
+
+        return self._paths[id(top_node)]
+
+    def order(self, nodes: tuple) -> list:
+        """
+        Indexes of `nodes` by dispatch order.
+        Nodes which have the same estimation keep written order.
+        """
+
+        return sorted(range(len(nodes)),
+                      key=lambda idx: -self.critical_path(nodes[idx]))
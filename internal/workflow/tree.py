@@ -4,12 +4,22 @@ Tree structure generator for workflow parser.
 """
 
 import glob
+import os
 import pathlib
 
+from internal import yaml_loader
 from internal.workflow import node
 
 # resource file path from project top directory.
 JOB_TEMPLATE_DIR = 'resource_files/job_template'
+WORKFLOW_DIR = 'resource_files/workflow'
+
+# Key of workflow file's item which declares resource pools' slots.
+POOLS_KEY = 'pools'
+
+# Resource files found by name.
+# Searching is skipped while the found file exists.
+_resource_file_cache = {}
 
 
 class ParseFailed(Exception):
@@ -26,7 +36,8 @@ class ParseFailed(Exception):
 
 
 def generate_workflow_tree(workflow: list, dry_run: bool,
-                           extra_vars_arg: dict) -> node.Node:
+                           extra_vars_arg: dict,
+                           workflow_path: str = None) -> node.Node:
     """
     arg 'workflow' ->
     [
@@ -48,25 +59,140 @@ def generate_workflow_tree(workflow: list, dry_run: bool,
 
     stack = []
     node_id = 0
-    initial_job_template: dict = workflow[0]
+    initial_job_template: dict = get_top_job_dict(workflow)
+
+    # Sub-workflows are compiled once in this tree,
+    # and shared by every `workflow` node which refers the same file.
+    sub_workflows = {}
+    workflow_stack = []
+    if workflow_path:
+        workflow_stack.append(str(pathlib.Path(workflow_path).resolve()))
 
     top_node: node.Node = parse_job_dict(initial_job_template, stack, node_id,
                                          child_type=None, dry_run=dry_run,
-                                         extra_vars_arg=extra_vars_arg)
+                                         extra_vars_arg=extra_vars_arg,
+                                         sub_workflows=sub_workflows,
+                                         workflow_stack=workflow_stack)
     if not top_node:
         raise ParseFailed('Top level job_template not found '
                           'in target workflow file.')
 
+    # Job of undeclared pool would run without waiting any slot.
+    pools: dict = get_pools(workflow, top_node)
+    for _node in _iter_nodes(top_node):
+        if _node.pool is not None and _node.pool not in pools:
+            raise ParseFailed("Undeclared pool of `{}`: `{}`"
+                              .format(_node.node_name, _node.pool))
+
     return top_node
 
 
-def _get_playbook_file_path(job_template_name: str) -> str:
+def get_top_job_dict(workflow: list) -> dict:
+    """ The first item of workflow file which isn't pools declaration. """
+
+    for item in workflow:
+        if not (isinstance(item, dict) and POOLS_KEY in item):
+            return item
+
+    raise ParseFailed('Top level job_template not found '
+                      'in target workflow file.')
+
+
+def _iter_nodes(top_node: node.Node):
+    """ Every node of the tree, and of it's sub-workflows' trees once. """
+
+    visited = set()
+    stack = [top_node]
+    while stack:
+        _node: node.Node = stack.pop()
+        yield _node
+        if isinstance(_node, node.WorkflowJobNode) and \
+                _node.sub_workflow.workflow_path not in visited:
+            visited.add(_node.sub_workflow.workflow_path)
+            stack.append(_node.sub_workflow.top_node)
+        stack.extend(_node.success + _node.failed + _node.always)
+
+
+def get_pools(workflow: list, top_node: node.Node = None) -> dict:
+    """
+    Resource pools' number of slots declared in workflow file.
+    - pools:
+        db_hosts: 2
+    Pools declared in sub-workflow files of `top_node`'s tree are merged.
+    Workflow file's declaration takes precedence over them.
+    """
+
+    pools: dict = _read_pools(workflow)
+    if top_node is None:
+        return pools
+
+    merged = {}
+    for _node in _iter_nodes(top_node):
+        if not isinstance(_node, node.WorkflowJobNode):
+            continue
+        for pool_name, slots in _node.sub_workflow.pools.items():
+            if pool_name in pools:
+                continue
+            if merged.setdefault(pool_name, slots) != slots:
+                raise ParseFailed("Conflicting slots of pool `{}`: `{}`"
+                                  .format(pool_name,
+                                          _node.sub_workflow.workflow_path))
+    merged.update(pools)
+    return merged
+
+
+def _read_pools(workflow: list) -> dict:
+    pools = {}
+    for item in workflow:
+        if not (isinstance(item, dict) and POOLS_KEY in item):
+            continue
+
+        declared = item[POOLS_KEY]
+        if not isinstance(declared, dict):
+            raise ParseFailed("Invalid pools: `{}`".format(declared))
+        for pool_name, slots in declared.items():
+            if isinstance(slots, bool) or not isinstance(slots, int) or \
+                    slots <= 0:
+                raise ParseFailed("Invalid slots of pool `{}`: `{}`"
+                                  .format(pool_name, slots))
+            pools[str(pool_name)] = slots
+
+    return pools
+
+
+def get_resource_dir(resource_dir: str) -> str:
+    """ Absolute path of resource directory. """
+
     top_dir: pathlib.PosixPath = \
         pathlib.Path(__file__).resolve().parent.parent.parent
-    job_template_dir_path = \
-        str(top_dir / "{}/**/{}.y*".format(JOB_TEMPLATE_DIR,
-                                           job_template_name))
-    match: list = glob.glob(job_template_dir_path, recursive=True)
+    return str(top_dir / resource_dir)
+
+
+def _search_resource_file(resource_dir: str, file_name: str) -> list:
+    cache_key = (resource_dir, file_name)
+    cached: list = _resource_file_cache.get(cache_key)
+    if cached and os.path.exists(cached[0]):
+        return cached
+
+    resource_file_path: str = os.path.join(get_resource_dir(resource_dir),
+                                           "**/{}.y*".format(file_name))
+    match: list = glob.glob(resource_file_path, recursive=True)
+    if match:
+        _resource_file_cache[cache_key] = match
+
+    return match
+
+
+def drop_stale_resource_files():
+    """ Drop found resource files which are already removed. """
+
+    for cache_key, match in list(_resource_file_cache.items()):
+        if not os.path.exists(match[0]):
+            del _resource_file_cache[cache_key]
+
+
+def _get_playbook_file_path(job_template_name: str) -> str:
+    match: list = _search_resource_file(JOB_TEMPLATE_DIR, job_template_name)
     if not match:
         raise ParseFailed("Job_template file not found "
                           "by resource files directory. "
@@ -76,18 +202,56 @@ def _get_playbook_file_path(job_template_name: str) -> str:
     return playbook_path
 
 
-def parse_job_dict(job_dict: dict, stack: list, node_id: int,
-                   child_type: str = None, dry_run: bool = False,
-                   extra_vars_arg: dict = None):
-    """ Create each job's Node and chain to it's parent Node."""
+def _get_workflow_file_path(workflow_name: str) -> str:
+    match: list = _search_resource_file(WORKFLOW_DIR, workflow_name)
+    if not match:
+        raise ParseFailed("Workflow file not found "
+                          "by resource files directory. "
+                          "workflow: `{}`".format(workflow_name))
+
+    workflow_path: str = str(pathlib.Path(match[0]).resolve())
+    return workflow_path
 
-    top_node = None
-    node_id += 1
 
-    # Get this job stage's executable keyword. Maybe `job_template`.
-    # nested workflow yaml is an future issue.
-    # execute_available = {'job_template', 'workflow'}
-    execute_available = {'job_template'}
+def _get_sub_workflow(workflow_name: str, dry_run: bool, sub_workflows: dict,
+                      workflow_stack: list) -> node.SubWorkflow:
+    """ Compile sub-workflow file, or return already compiled one. """
+
+    workflow_path: str = _get_workflow_file_path(workflow_name)
+    if workflow_path in workflow_stack:
+        circular: list = workflow_stack[workflow_stack.index(workflow_path):]
+        chain: str = ' -> '.join(pathlib.Path(path).stem
+                                 for path in circular + [workflow_path])
+        raise ParseFailed("Circular workflow reference detected: `{}`"
+                          .format(chain))
+
+    if workflow_path in sub_workflows:
+        return sub_workflows[workflow_path]
+
+    workflow_dict = yaml_loader.load_file(workflow_path)
+
+    workflow_stack.append(workflow_path)
+    top_node: node.Node = parse_job_dict(get_top_job_dict(workflow_dict),
+                                         [], 0,
+                                         child_type=None, dry_run=dry_run,
+                                         sub_workflows=sub_workflows,
+                                         workflow_stack=workflow_stack)
+    workflow_stack.pop()
+
+    sub_workflow = node.SubWorkflow(workflow_path, top_node)
+    sub_workflow.pools = _read_pools(workflow_dict)
+    if dry_run:
+        sub_workflow.analyze()
+
+    sub_workflows[workflow_path] = sub_workflow
+    return sub_workflow
+
+
+def _create_node(job_dict: dict, node_id: int, dry_run: bool,
+                 sub_workflows: dict, workflow_stack: list) -> node.Node:
+    # Get this job stage's executable keyword.
+    # `job_template` or nested `workflow`.
+    execute_available = {'job_template', 'workflow'}
 
     executable_keywords = execute_available & set(job_dict.keys())
     if len(executable_keywords) != 1:
@@ -96,41 +260,137 @@ def parse_job_dict(job_dict: dict, stack: list, node_id: int,
 
     keyword: str = list(executable_keywords)[0]
 
-    # Get this stage's job_template name.
-    # Currently, nested workflow is not supported.
+    # Get this stage's job_template or workflow name.
     job_template_name: str = \
-        job_dict[keyword]  # Target job's `job_template` playbook name.
-    playbook_path: str = _get_playbook_file_path(job_template_name)
-
-    # Parse and prepare job_template.
-    # And go to next stage by Depth first search.
-    _node = node.Node(node_id, job_template_name, playbook_path)
-    if node_id == 1:
-        top_node = _node
-        _node.prepare_job_node(dry_run, extra_vars_arg=extra_vars_arg)
+        job_dict[keyword]  # Target job's playbook or workflow file name.
+
+    if keyword == 'workflow':
+        sub_workflow: node.SubWorkflow = _get_sub_workflow(job_template_name,
+                                                           dry_run,
+                                                           sub_workflows,
+                                                           workflow_stack)
+        _node = node.WorkflowJobNode(node_id, job_template_name, sub_workflow)
     else:
-        parent_node: node.Node = stack[-1]
-        _node.prepare_job_node(dry_run, parent_node=parent_node,
-                               case_type=child_type)
-
-        if node.SwitchJobResult.is_success(child_type):
-            _node.add_parent_success(parent_node)
-        elif node.SwitchJobResult.is_failed(child_type):
-            _node.add_parent_failed(parent_node)
-        elif node.SwitchJobResult.is_always(child_type):
-            _node.add_parent_always(parent_node)
+        playbook_path: str = _get_playbook_file_path(job_template_name)
+        _node = node.Node(node_id, job_template_name, playbook_path)
+
+    set_job_options(_node, job_dict)
+    return _node
+
+
+def set_job_options(_node: node.Node, job_dict: dict):
+    """ Set running options written in the job's dict to the Node. """
+
+    timeout = job_dict.get('timeout')
+    if timeout is not None:
+        if isinstance(timeout, bool) or \
+                not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ParseFailed("Invalid timeout: `{}`".format(timeout))
+        _node.timeout = timeout
+
+    fail_fast = job_dict.get('fail_fast', False)
+    if not isinstance(fail_fast, bool):
+        raise ParseFailed("Invalid fail_fast: `{}`".format(fail_fast))
+    _node.fail_fast = fail_fast
+
+    pool = job_dict.get('pool')
+    if pool is not None:
+        _node.pool = str(pool)
+
+    weight = job_dict.get('weight', 1)
+    if isinstance(weight, bool) or not isinstance(weight, int) or \
+            weight <= 0:
+        raise ParseFailed("Invalid weight: `{}`".format(weight))
+    _node.weight = weight
+
+    attempts = job_dict.get('attempts', 1)
+    if isinstance(attempts, bool) or not isinstance(attempts, int) or \
+            attempts <= 0:
+        raise ParseFailed("Invalid attempts: `{}`".format(attempts))
+    if attempts > 1 and isinstance(_node, node.WorkflowJobNode):
+        raise ParseFailed("Workflow job can not retry: `{}`"
+                          .format(_node.node_name))
+    _node.attempts = attempts
+
+    retry_backoff = job_dict.get('retry_backoff', 0)
+    if isinstance(retry_backoff, bool) or \
+            not isinstance(retry_backoff, (int, float)) or retry_backoff < 0:
+        raise ParseFailed("Invalid retry_backoff: `{}`".format(retry_backoff))
+    _node.retry_backoff = retry_backoff
+
+
+def chain_parent_node(_node: node.Node, parent_node: node.Node,
+                      child_type: str):
+    """ Chain Node to it's parent Node's child list by result keyword. """
+
+    if node.SwitchJobResult.is_success(child_type):
+        _node.add_parent_success(parent_node)
+    elif node.SwitchJobResult.is_failed(child_type):
+        _node.add_parent_failed(parent_node)
+    elif node.SwitchJobResult.is_always(child_type):
+        _node.add_parent_always(parent_node)
+    else:
+        raise ParseFailed("Invalid keyword specified: `{}`"
+                          .format(child_type))
+
+
+def prepare_workflow_tree(top_node: node.Node, dry_run: bool,
+                          extra_vars_arg: dict):
+    """ Prepare already generated workflow tree with other `extra_vars`. """
+
+    top_node.prepare_job_node(dry_run, extra_vars_arg=extra_vars_arg)
+
+    # Parents are prepared before their children by own stack.
+    stack = [top_node]
+    while stack:
+        parent_node: node.Node = stack.pop()
+        children: tuple = (parent_node.success + parent_node.failed +
+                           parent_node.always)
+        for child in children:
+            child.prepare_job_node(dry_run, parent_node=parent_node,
+                                   case_type=child.case_type)
+        stack.extend(children)
+
+
+def parse_job_dict(job_dict: dict, stack: list, node_id: int,
+                   child_type: str = None, dry_run: bool = False,
+                   extra_vars_arg: dict = None, sub_workflows: dict = None,
+                   workflow_stack: list = None):
+    """ Create each job's Node and chain to it's parent Node."""
+
+    if sub_workflows is None:
+        sub_workflows = {}
+    if workflow_stack is None:
+        workflow_stack = []
+
+    top_node = None
+    parent_node: node.Node = stack[-1] if stack else None
+
+    # Parse and prepare job_template by Depth first search.
+    # This uses own stack instead of recursive call,
+    # because long chain workflow reaches Python's recursion limit.
+    pending = [(job_dict, parent_node, child_type, node_id + 1)]
+    while pending:
+        job_dict, parent_node, child_type, node_id = pending.pop()
+
+        _node: node.Node = _create_node(job_dict, node_id, dry_run,
+                                        sub_workflows, workflow_stack)
+        if node_id == 1:
+            top_node = _node
+            _node.prepare_job_node(dry_run, extra_vars_arg=extra_vars_arg)
         else:
-            raise ParseFailed("Invalid keyword specified: `{}`"
-                              .format(child_type))
-
-    # Move forward to each result next job stage.
-    stack.append(_node)
-    for state, child_list in job_dict.items():
-        if node.SwitchJobResult.is_result_keyword(state):
-            for child_dict in child_list:
-                parse_job_dict(child_dict, stack, node_id, child_type=state,
-                               dry_run=dry_run)
-
-    stack.pop()
+            _node.prepare_job_node(dry_run, parent_node=parent_node,
+                                   case_type=child_type)
+            chain_parent_node(_node, parent_node, child_type)
+
+        # Move forward to each result next job stage.
+        # Children are pushed reversely to be parsed in written order.
+        children = []
+        for state, child_list in job_dict.items():
+            if node.SwitchJobResult.is_result_keyword(state):
+                for child_dict in child_list:
+                    children.append((child_dict, _node, state, node_id + 1))
+
+        pending.extend(reversed(children))
 
     return top_node
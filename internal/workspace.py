@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Per-run workspace of temporary files like copied playbooks and
+`set_stats` values.
+
+Each run has own directory `<root>/runs/<run id>`, so concurrent runs
+don't share files. It's removed when the run ended successfully.
+Workspace of failed run is moved to `<root>/failed/<run id>` by rename,
+so it's never seen half moved, and only the latest ones are kept.
+Workspaces left by killed runs are moved to `failed` by the next run.
+Root can be on tmpfs like `/dev/shm` by argument or environment.
+
+Workflow runner isn't imported, so client doesn't import Ansible.
+"""
+
+from datetime import datetime, timezone
+import os
+import shutil
+import tempfile
+import uuid
+
+WORKSPACE_ENV = 'WORKFLOW_RUNNER_WORKSPACE'
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), 'workflow_runner')
+
+# Number of the latest failed runs' workspaces kept.
+DEFAULT_KEEP_FAILED = 5
+
+RUNS_DIR = 'runs'
+FAILED_DIR = 'failed'
+
+
+def get_workspace_root(root: str = None) -> str:
+    """ Workspace root by argument, environment or default. """
+
+    if not root:
+        root = os.environ.get(WORKSPACE_ENV) or DEFAULT_ROOT
+    return os.path.abspath(os.path.expanduser(root))
+
+
+def new_run_id() -> str:
+    """
+    Unique id of the run. Ids are sorted in started order,
+    and have the process id to find runs which are not running.
+    """
+
+    return '{}-{}-{}'.format(
+        datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ'),
+        os.getpid(), uuid.uuid4().hex[:8])
+
+
+def _get_pid(run_id: str) -> int:
+    try:
+        return int(run_id.split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Process of other user.
+        return True
+    return True
+
+
+class Workspace:
+    """
+    Context manager which creates workspace directory of one run,
+    and removes or keeps it at exiting.
+    Run is failed if `mark_failed` is called or exception is raised.
+    """
+
+    def __init__(self, root: str = None,
+                 keep_failed: int = DEFAULT_KEEP_FAILED, run_id: str = None):
+        self.root: str = get_workspace_root(root)
+        self.keep_failed = keep_failed
+        self.run_id: str = run_id or new_run_id()
+        self.path: str = os.path.join(self.root, RUNS_DIR, self.run_id)
+        # Kept workspace of the failed run after exiting.
+        self.kept_path: str = None
+        self._failed = False
+
+    def _move_to_failed(self, path: str) -> str:
+        failed_path: str = os.path.join(self.root, FAILED_DIR,
+                                        os.path.basename(path))
+        # Rename is atomic in the same file system.
+        os.rename(path, failed_path)
+        return failed_path
+
+    def _recover_stale(self):
+        """ Move workspaces of runs killed without cleanup to `failed`. """
+
+        runs_dir: str = os.path.join(self.root, RUNS_DIR)
+        for run_id in os.listdir(runs_dir):
+            pid: int = _get_pid(run_id)
+            if pid is None or pid == os.getpid() or _is_running(pid):
+                continue
+            try:
+                self._move_to_failed(os.path.join(runs_dir, run_id))
+            except FileNotFoundError:
+                # Other run recovered it at the same time.
+                pass
+
+    def _prune_failed(self):
+        """ Remove failed runs' workspaces except the latest ones. """
+
+        failed_dir: str = os.path.join(self.root, FAILED_DIR)
+        run_ids: list = sorted(os.listdir(failed_dir))
+        for run_id in run_ids[:max(len(run_ids) - self.keep_failed, 0)]:
+            shutil.rmtree(os.path.join(failed_dir, run_id), True)
+
+    def mark_failed(self):
+        """ Keep the workspace at exiting as failed run. """
+        self._failed = True
+
+    def __enter__(self) -> 'Workspace':
+        os.makedirs(os.path.join(self.root, RUNS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.root, FAILED_DIR), exist_ok=True)
+        self._recover_stale()
+        os.mkdir(self.path, 0o700)
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if (self._failed or exc_type is not None) and self.keep_failed > 0:
+            self.kept_path = self._move_to_failed(self.path)
+        else:
+            shutil.rmtree(self.path, True)
+        self._prune_failed()
+        return False
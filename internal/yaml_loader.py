@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+YAML loading and dumping for workflow, playbook and extra_vars files.
+
+libyaml's `CSafeLoader` and `CSafeDumper` are used if PyYAML is built
+with it, and pure Python `SafeLoader` and `SafeDumper` are used if not.
+Documents of files are cached in this process by path, and reused while
+the file's mtime and size are the same.
+Cached documents are shared by callers, so they are read-only
+`ReadOnlyDict` and `ReadOnlyList`. Use `thaw` to get mutable copy.
+"""
+
+import os
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# Parsed document by file path.
+# key: absolute path, value: ((mtime, size), read-only document)
+_document_cache = {}
+
+
+def _raise_read_only(*_, **__):
+    raise TypeError('Cached YAML document is read-only.')
+
+
+class ReadOnlyDict(dict):
+    """ `dict` of cached document which can not be changed. """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _raise_read_only
+    clear = pop = popitem = setdefault = update = _raise_read_only
+
+    def __reduce__(self):
+        # Copied or unpickled without setting each item.
+        return ReadOnlyDict, (dict(self),)
+
+
+class ReadOnlyList(list):
+    """ `list` of cached document which can not be changed. """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _raise_read_only
+    append = extend = insert = pop = remove = _raise_read_only
+    clear = sort = reverse = _raise_read_only
+
+    def __reduce__(self):
+        return ReadOnlyList, (list(self),)
+
+
+def _construct_map(loader: SafeLoader, yaml_node: yaml.MappingNode):
+    # Empty container is yielded first for recursive aliases.
+    document = ReadOnlyDict()
+    yield document
+    dict.update(document, loader.construct_mapping(yaml_node))
+
+
+def _construct_seq(loader: SafeLoader, yaml_node: yaml.SequenceNode):
+    document = ReadOnlyList()
+    yield document
+    list.extend(document, loader.construct_sequence(yaml_node))
+
+
+class _ReadOnlyLoader(SafeLoader):
+    """
+    Loader which builds `ReadOnlyDict` and `ReadOnlyList` directly,
+    so parsed document isn't copied again.
+    """
+
+
+_ReadOnlyLoader.add_constructor('tag:yaml.org,2002:map', _construct_map)
+_ReadOnlyLoader.add_constructor('tag:yaml.org,2002:seq', _construct_seq)
+
+
+def _convert(document, dict_type: type, list_type: type):
+    """ Copy containers of document by own stack instead of recursion. """
+
+    # Copy of each container by `id`. Aliases in YAML share one copy.
+    copies = {}
+
+    def copy_container(value):
+        if id(value) in copies:
+            return copies[id(value)], False
+        if isinstance(value, dict):
+            copied = dict_type(value)
+        elif isinstance(value, list):
+            copied = list_type(value)
+        else:
+            return value, False
+        copies[id(value)] = copied
+        return copied, True
+
+    top, is_new = copy_container(document)
+    stack = [top] if is_new else []
+    while stack:
+        container = stack.pop()
+        if isinstance(container, dict):
+            items = list(container.items())
+            set_item = dict.__setitem__
+        else:
+            items = list(enumerate(container))
+            set_item = list.__setitem__
+
+        for key, value in items:
+            copied, is_new = copy_container(value)
+            if copied is not value:
+                # Items are replaced bypassing read-only methods.
+                set_item(container, key, copied)
+            if is_new:
+                stack.append(copied)
+
+    return top
+
+
+def thaw(document):
+    """ Mutable copy of document which `dict` and `list` are plain. """
+    return _convert(document, dict, list)
+
+
+def loads(text: str):
+    """ Parse YAML text. """
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def dumps(document) -> str:
+    """ Dump document to YAML text. """
+    return yaml.dump(thaw(document), Dumper=SafeDumper)
+
+
+def _get_file_key(file_path: str) -> tuple:
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_file(file_path: str):
+    """
+    Parse YAML file, or return cached document of not changed file.
+    Returned document is read-only.
+    """
+
+    # The same file given by relative and absolute path is cached once.
+    file_path = os.path.abspath(file_path)
+    file_key: tuple = _get_file_key(file_path)
+    cached: tuple = _document_cache.get(file_path)
+    if cached and cached[0] == file_key:
+        return cached[1]
+
+    with open(file_path, 'r') as ymf:
+        document = yaml.load(stream=ymf, Loader=_ReadOnlyLoader)
+    _document_cache[file_path] = (file_key, document)
+    return document
+
+
+def drop_stale_documents():
+    """ Drop cached documents which files are changed or removed. """
+
+    for file_path, (file_key, _) in list(_document_cache.items()):
+        try:
+            if _get_file_key(file_path) == file_key:
+                continue
+        except FileNotFoundError:
+            pass
+        del _document_cache[file_path]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+""" Unit test for playbook variables analysis """
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal.playbook import parser
+
+PLAYBOOK = """
+---
+- name: {name}
+  hosts: all
+  gather_facts: false
+  vars:
+    play_var: "{{{{ play_input }}}}"
+  pre_tasks:
+    - include_tasks: included.yml
+  roles:
+    - role: shared_role
+      role_param: value
+  tasks:
+    - set_fact:
+        task_fact: "{{{{ shared_default }}}}"
+    - debug: msg="{{{{ task_fact }}}} {{{{ item }}}} {{{{ play_var }}}}"
+      loop: [1, 2]
+  post_tasks:
+    - debug: msg="{{{{ post_input }}}}"
+
+- name: second play
+  hosts: all
+  tasks:
+    - debug: msg="{{{{ task_fact }}}} {{{{ second_input }}}}"
+"""
+
+INCLUDED = """
+---
+- debug: msg="{{ included_input }}"
+"""
+
+ROLE_DEFAULTS = """
+---
+shared_default: "{{ default_input }}"
+"""
+
+ROLE_TASKS = """
+---
+- debug: msg="{{ shared_default }} {{ role_param }} {{ role_input }}"
+"""
+
+
+class TestPlaybookParser(unittest.TestCase):
+    """ Unit test for playbook variables analysis """
+
+    def setUp(self):
+        parser._analysis_cache.clear()
+
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.role_tasks = self._write('roles/shared_role/tasks/main.yml',
+                                      ROLE_TASKS)
+        self._write('roles/shared_role/defaults/main.yml', ROLE_DEFAULTS)
+        self._write('included.yml', INCLUDED)
+        self.playbooks = [self._write('{}.yml'.format(name),
+                                      PLAYBOOK.format(name=name))
+                          for name in ('job_a', 'job_b')]
+
+    def tearDown(self):
+        parser._analysis_cache.clear()
+        self.work_dir.cleanup()
+
+    def _write(self, file_name: str, content: str) -> str:
+        file_path: str = os.path.join(self.work_dir.name, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as wfp:
+            wfp.write(content)
+        return file_path
+
+    def test_references_followed(self):
+        """ Test case includes, roles and other plays are analyzed """
+
+        analysis: dict = parser.analyze_playbook(self.playbooks[0])
+
+        self.assertEqual(analysis['necessary'],
+                         {'play_input', 'included_input', 'default_input',
+                          'role_input', 'post_input', 'second_input'})
+        self.assertEqual(analysis['set_fact'],
+                         {'task_fact': ['play.tasks[0]']})
+        self.assertEqual(set(analysis['vars']),
+                         {'play_var', 'shared_default'})
+        self.assertEqual({path for path, _ in analysis['files']},
+                         {os.path.abspath(path) for path in (
+                             self.playbooks[0], self.role_tasks,
+                             os.path.join(self.work_dir.name, 'included.yml'),
+                             os.path.join(self.work_dir.name, 'roles',
+                                          'shared_role', 'defaults',
+                                          'main.yml'))})
+
+    def test_shared_role_parsed_once(self):
+        """ Test case shared files are parsed once for all playbooks """
+
+        with mock.patch.object(parser, '_load_yaml',
+                               wraps=parser._load_yaml) as load_yaml:
+            first: dict = parser.analyze_playbook(self.playbooks[0])
+            second: dict = parser.analyze_playbook(self.playbooks[1])
+
+        loaded: list = [call[0][0] for call in load_yaml.call_args_list]
+        self.assertEqual(len(loaded), len(set(loaded)))
+        self.assertEqual(loaded.count(os.path.abspath(self.role_tasks)), 1)
+        self.assertEqual(first['necessary'], second['necessary'])
+
+    def test_changed_role_analyzed_again(self):
+        """ Test case changed role file invalidates playbooks using it """
+
+        parser.analyze_playbook(self.playbooks[0])
+        parser.analyze_playbook(self.playbooks[1])
+
+        self._write('roles/shared_role/tasks/main.yml',
+                    '- debug: msg="{{ new_role_input }}"\n')
+        changed: set = parser.drop_stale_analysis()
+
+        self.assertEqual(changed, {os.path.abspath(path)
+                                   for path in self.playbooks})
+        for playbook_path in self.playbooks:
+            analysis: dict = parser.analyze_playbook(playbook_path)
+            self.assertIn('new_role_input', analysis['necessary'])
+            self.assertNotIn('role_input', analysis['necessary'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+""" Unit test for playbook runner """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import tree
+
+
+def _ping(unreachable: list):
+    """ Fake playbook run which can't log in `unreachable` hosts. """
+
+    def run_playbook(playbook: str, *_, retry_dir: str = None,
+                     **__) -> int:
+        with open(playbook, 'r') as pbf:
+            assert yaml.safe_load(pbf) == p_run.PREFLIGHT_PLAYBOOK
+        if not unreachable:
+            return 0
+
+        with open(p_run.get_retry_file_path(playbook, retry_dir),
+                  'w') as rtf:
+            rtf.write(''.join('{}\n'.format(host) for host in unreachable))
+        return 4
+
+    return run_playbook
+
+
+class TestPlaybookRunner(unittest.TestCase):
+    """ Unit test for playbook runner """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.inventory_file = os.path.join(self.work_dir.name, 'hosts')
+        with open(self.inventory_file, 'w') as ivf:
+            ivf.write('[target]\nhost1\nhost2\n')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _check(self, unreachable: list) -> tuple:
+        with mock.patch.object(p_run, 'run_playbook',
+                               side_effect=_ping(unreachable)) as run_mock, \
+                mock.patch('sys.stderr', new_callable=io.StringIO):
+            hosts: list = p_run.check_reachable(
+                self.inventory_file, '{}', self.work_dir.name, 3, 2)
+        return hosts, run_mock
+
+    def test_check_reachable(self):
+        """ Test case unreachable hosts are found at once """
+
+        hosts, run_mock = self._check([])
+        self.assertEqual(hosts, [])
+        self.assertEqual(run_mock.call_args[1]['forks'], 3)
+        self.assertEqual(run_mock.call_args[1]['timeout'], 2)
+
+        hosts, _ = self._check(['host2'])
+        self.assertEqual(hosts, ['host2'])
+        # Check playbook isn't left in work directory.
+        self.assertEqual(os.listdir(self.work_dir.name), ['hosts'])
+
+        with self.assertRaises(p_run.HostsUnreachable):
+            self._check(['host1', 'host2'])
+
+    def test_exclude_hosts(self):
+        """ Test case excluded hosts are limited out from each job """
+
+        workflow = [{'workflow': 'sample_workflow'}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+        workflow_node = w_parser.WorkflowNode(top_node,
+                                              exclude_hosts=('host2',))
+        sub_workflow_node = workflow_node.enter_sub_workflow()
+
+        with mock.patch.object(p_run, 'run_playbook',
+                               return_value=0) as run_mock, \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            sub_workflow_node.run(self.inventory_file, '{}',
+                                  self.work_dir.name)
+
+        self.assertEqual(run_mock.call_args[1]['limit'], 'all:!host2')
+
+
+if __name__ == '__main__':
+    unittest.main()
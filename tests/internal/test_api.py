@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+""" Unit test for workflow API """
+
+from concurrent import futures
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from internal import api
+from internal.playbook import parser
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+EXTRA_VARS = {'sample_vars': 'sample'}
+
+PLAYBOOKS = {
+    'provider_job': """
+---
+- hosts: all
+  tasks:
+    - set_stats:
+        data:
+          stats_var: "{{ cli_var }}"
+""",
+    'consumer_job': """
+---
+- hosts: all
+  tasks:
+    - debug: msg="{{ stats_var }} {{ cli_var }}"
+"""}
+
+
+class _FakeExecutor:
+    """ Playbook executor which records called playbooks. """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, playbook_path: str, inventory_path: str,
+                 auth_extra_vars: str, *_, **__) -> int:
+        with self._lock:
+            self.calls.append((os.path.basename(playbook_path),
+                               json.loads(auth_extra_vars)))
+        return 0
+
+
+class TestApi(unittest.TestCase):
+    """ Unit test for workflow API """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.workflow_file = os.path.join(self.work_dir.name, 'workflow.yml')
+        with open(self.workflow_file, 'w') as wff:
+            wff.write('- job_template: sample_job1\n'
+                      '  success:\n'
+                      '    - workflow: sample_workflow\n')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_load_failed(self):
+        """ Test case load errors are raised as `LoadFailed` """
+
+        invalid_workflow: str = os.path.join(self.work_dir.name,
+                                             'invalid.yml')
+        with open(invalid_workflow, 'w') as wff:
+            wff.write('- job_template: no_such_job\n')
+
+        for kwargs in ({},
+                       {'workflow_file': self.workflow_file,
+                        'plan_file': 'plan.json'},
+                       {'workflow_file': self.workflow_file,
+                        'extra_vars': ['sample_vars']},
+                       {'workflow_file': 'no_such_workflow.yml'},
+                       {'workflow_file': invalid_workflow},
+                       {'plan_file': 'no_such_plan.json'}):
+            with self.assertRaises(api.LoadFailed):
+                api.Workflow.load(**kwargs)
+
+    def _write_file(self, name: str, content: str) -> str:
+        file_path: str = os.path.join(self.work_dir.name, name)
+        with open(file_path, 'w') as wkf:
+            wkf.write(content)
+        return file_path
+
+    def test_dry_run_report(self):
+        """ Test case dry run returns missing variables of each node """
+
+        parser._analysis_cache.clear()
+        self.addCleanup(parser._analysis_cache.clear)
+        for name, playbook in PLAYBOOKS.items():
+            self._write_file('{}.yml'.format(name), playbook)
+        patcher = mock.patch.object(tree, 'JOB_TEMPLATE_DIR',
+                                    self.work_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        success_only: str = self._write_file(
+            'success_only.yml', '- job_template: provider_job\n'
+                                '  success:\n'
+                                '    - job_template: consumer_job\n')
+        report: api.DryRunReport = api.Workflow.load(
+            success_only, {'cli_var': 'value'}).dry_run()
+        self.assertTrue(report.ok)
+        self.assertEqual([_node['name'] for _node in report.nodes],
+                         ['provider_job', 'consumer_job'])
+        report.raise_for_missing()
+
+        # `set_stats` variable isn't defined on failure branch.
+        with_failure: str = self._write_file(
+            'with_failure.yml', '- job_template: provider_job\n'
+                                '  failure:\n'
+                                '    - job_template: consumer_job\n')
+        report = api.Workflow.load(with_failure,
+                                   {'cli_var': 'value'}).dry_run()
+        self.assertFalse(report.ok)
+        self.assertEqual(report.get_failed_nodes(),
+                         [report.nodes[1]])
+        self.assertEqual(report.nodes[1]['missing'], ['stats_var'])
+        with self.assertRaises(api.VariablesMissing) as raised:
+            report.raise_for_missing()
+        self.assertIs(raised.exception.report, report)
+
+        # Command line dry run fails by the same variable.
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                self.assertRaises(w_parser.DryRunFailed):
+            w_run.WorkflowRunner('').dry_run(
+                w_parser.parse(with_failure, True, {'cli_var': 'value'}))
+
+    def test_run(self):
+        """ Test case workflows run one by one by given executor """
+
+        workflow = api.Workflow.load(self.workflow_file, EXTRA_VARS)
+        executor = _FakeExecutor()
+        events = []
+
+        def run() -> list:
+            return workflow.run({'password': 'secret',
+                                 'become_password': 'sudo'}, '',
+                                executor=executor, on_event=events.append)
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout, \
+                futures.ThreadPoolExecutor(2) as pool:
+            results: list = [future.result()
+                             for future in [pool.submit(run),
+                                            pool.submit(run)]]
+        self.assertEqual(stdout.getvalue(), '')
+
+        for records in results:
+            self.assertEqual([(record.job_template_name, record.status)
+                              for record in records],
+                             [('sample_job1', 'successful'),
+                              ('sample_workflow', 'successful')])
+            self.assertEqual(len(records[1].sub_records), 3)
+        self.assertEqual(len([event for event in events
+                              if isinstance(event, api.JobRecord)]), 4)
+        # Progress messages are given instead of printed.
+        self.assertEqual(events.count("<< Execute job: 'sample_job1' >>"),
+                         4)
+
+        # Sub-workflow's jobs are run by the executor too.
+        self.assertEqual(len(executor.calls), 8)
+        self.assertEqual(executor.calls[0][1],
+                         {'ansible_ssh_pass': 'secret',
+                          'ansible_become_pass': 'sudo'})
+
+    def test_invalid_credentials(self):
+        """ Test case missing private key is raised without exiting """
+
+        with self.assertRaises(api.CredentialsInvalid):
+            api.Credentials(private_key=os.path.join(self.work_dir.name,
+                                                     'no_such_key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
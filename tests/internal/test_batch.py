@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+""" Unit test for batch runner """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import batch, workspace
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import tree
+
+MANIFEST = """
+---
+runs:
+  - workflow_file: {workflow_file}
+    extra_vars:
+      - '@{extra_vars_dir}/*.yml'
+      - sample_vars: inline
+  - workflow_file:
+      - {workflow_file}
+      - {workflow_dir}/not_found.yml
+"""
+
+
+class TestBatch(unittest.TestCase):
+    """ Unit test for batch runner """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        extra_vars_dir = os.path.join(self.work_dir.name, 'extra_vars')
+        os.mkdir(extra_vars_dir)
+        for tenant in ('tenant1', 'tenant2'):
+            extra_vars_path = os.path.join(extra_vars_dir,
+                                           '{}.yml'.format(tenant))
+            with open(extra_vars_path, 'w') as evf:
+                evf.write('sample_vars: {}\n'.format(tenant))
+
+        self.workflow_file = tree._get_workflow_file_path('sample_workflow')
+        self.manifest_path = os.path.join(self.work_dir.name, 'manifest.yml')
+        with open(self.manifest_path, 'w') as mnf:
+            mnf.write(MANIFEST.format(
+                workflow_file=self.workflow_file,
+                workflow_dir=os.path.dirname(self.workflow_file),
+                extra_vars_dir=extra_vars_dir))
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_read_manifest(self):
+        """ Test case manifest is expanded to all of combinations """
+
+        entries = batch.read_manifest(self.manifest_path)
+
+        self.assertEqual([entry.index for entry in entries], [1, 2, 3, 4, 5])
+        self.assertEqual([entry.extra_vars for entry in entries[:3]],
+                         [{'sample_vars': 'tenant1'},
+                          {'sample_vars': 'tenant2'},
+                          {'sample_vars': 'inline'}])
+        self.assertEqual(entries[4].workflow_file,
+                         os.path.join(os.path.dirname(self.workflow_file),
+                                      'not_found.yml'))
+
+    def test_batch_dry_run(self):
+        """ Test case each dry run result is recorded """
+
+        entries = batch.read_manifest(self.manifest_path)
+        batch_runner = batch.BatchRunner(entries)
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = list(batch_runner.dry_run())
+
+        self.assertEqual([result.status for result in results],
+                         ['successful'] * 4 + ['failed'])
+        self.assertIn('not_found.yml', results[-1].message)
+
+    def test_batch_dry_run_parsed_once(self):
+        """ Test case workflow file is parsed once for all of runs """
+
+        entries = batch.read_manifest(self.manifest_path)
+        batch_runner = batch.BatchRunner(entries)
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch.object(w_parser, 'parse',
+                                  wraps=w_parser.parse) as parse:
+            results = list(batch_runner.dry_run())
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(parse.call_count, 2)
+
+    def test_batch_run(self):
+        """ Test case every run produces exactly one result """
+
+        def _run_playbook(playbook_path, inventory_path, auth_extra_vars,
+                          extra_vars_json=None, **_):
+            if 'tenant2' in extra_vars_json:
+                raise SystemExit(2)
+            if 'inline' in extra_vars_json:
+                # Process is killed without sending the result.
+                os._exit(3)
+            return 0
+
+        entries = batch.read_manifest(self.manifest_path)
+        batch_runner = batch.BatchRunner(entries, max_parallel=2)
+
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch.object(p_run, 'separate_local_tmp'), \
+                mock.patch.object(p_run, 'run_playbook',
+                                  side_effect=_run_playbook):
+            results = list(batch_runner.run('{}', self.work_dir.name))
+
+        results_by_index = {result.entry.index: result for result in results}
+        self.assertEqual(len(results), 5)
+        self.assertEqual(sorted(results_by_index), [1, 2, 3, 4, 5])
+
+        self.assertEqual(results_by_index[1].status, 'successful')
+        self.assertEqual(results_by_index[4].status, 'successful')
+        self.assertEqual(len(results_by_index[1].records), 3)
+        self.assertIn('SystemExit', results_by_index[2].message)
+        self.assertIn('exitcode: 3', results_by_index[3].message)
+        self.assertIn('not_found.yml', results_by_index[5].message)
+
+        # Each run has own workspace, and failed one is kept.
+        self.assertIsNone(results_by_index[1].kept_path)
+        self.assertEqual(os.path.dirname(results_by_index[2].kept_path),
+                         os.path.join(self.work_dir.name,
+                                      workspace.FAILED_DIR))
+
+    def test_invalid_manifest(self):
+        """ Test case manifest without `runs` """
+
+        with open(self.manifest_path, 'w') as mnf:
+            mnf.write('workflow_file: {}\n'.format(self.workflow_file))
+
+        with self.assertRaises(batch.ManifestInvalid):
+            batch.read_manifest(self.manifest_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
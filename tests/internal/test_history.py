@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+""" Unit test for run history """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import history
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'sample_job1',
+             'success': [{'workflow': 'sample_workflow'}]}]
+
+
+class _FakeHostCounter:
+    """ Host counter which doesn't parse inventory. """
+
+    @staticmethod
+    def count(playbook_path: str) -> int:
+        return len(os.path.basename(playbook_path))
+
+
+class TestHistory(unittest.TestCase):
+    """ Unit test for run history """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.history_file = os.path.join(self.work_dir.name, 'db',
+                                         'history.db')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _insert_durations(self, template: str, durations: list):
+        conn = history.connect(self.history_file)
+        with conn:
+            conn.executemany(
+                'INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(idx, 'workflow.yml', '1', 1, template, 'job_template',
+                  None, 'successful', float(idx), elapsed, 1)
+                 for idx, elapsed in enumerate(durations)])
+        conn.close()
+
+    def test_record_run(self):
+        """ Test case every job is recorded at the end of each job """
+
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+        recorder = history.HistoryRecorder(self.history_file,
+                                           'workflow.yml', _FakeHostCounter())
+        workflow_runner = w_run.WorkflowRunner(
+            '', on_record=recorder.record_job)
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               return_value=0), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            workflow_runner.run(w_parser.WorkflowNode(top_node), '{}', '')
+        recorder.record_workflow('successful', 1.5)
+        recorder.close()
+
+        conn = history.connect(self.history_file)
+        rows = conn.execute('SELECT job_id, node_id, template, type, '
+                            'playbook_hash, status, hosts FROM jobs '
+                            'ORDER BY rowid').fetchall()
+        run = conn.execute('SELECT status, elapsed FROM runs').fetchone()
+        conn.close()
+
+        self.assertEqual([row[0] for row in rows],
+                         ['1', '2', '2.1', '2.2', '2.3'])
+        self.assertEqual(rows[0][1:4], (1, 'sample_job1', 'job_template'))
+        self.assertEqual(len(rows[0][4]), 64)
+        self.assertEqual(rows[0][6], len('sample_job1.yml'))
+        self.assertEqual(rows[1][3], 'workflow_job')
+        self.assertIsNone(rows[1][6])
+        self.assertEqual(run, ('successful', 1.5))
+
+    def test_summarize(self):
+        """ Test case percentiles and regression of the latest run """
+
+        self._insert_durations('stable_job', [1.0] * 10 + [1.2])
+        self._insert_durations('slow_job', [float(idx) for idx in
+                                            range(1, 11)] + [20.0])
+        self._insert_durations('new_job', [1.0, 9.0])
+
+        summaries = {summary['template']: summary
+                     for summary in history.summarize(self.history_file,
+                                                      window=10)}
+
+        self.assertFalse(summaries['stable_job']['regressed'])
+        slow: dict = summaries['slow_job']
+        self.assertTrue(slow['regressed'])
+        self.assertEqual(slow['runs'], 10)
+        self.assertEqual(slow['latest'], 20.0)
+        # Window has the latest 10 runs, 2.0 to 10.0 and 20.0.
+        self.assertEqual((slow['p50'], slow['p90'], slow['max']),
+                         (6.0, 10.0, 20.0))
+        self.assertEqual(slow['ratio'], 20.0 / 6.0)
+        self.assertIsNone(summaries['new_job']['ratio'])
+
+    def test_summary_uses_index(self):
+        """ Test case summary queries don't scan the whole table """
+
+        conn = history.connect(self.history_file)
+        plans = [' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN ' + query, params))
+                 for query, params in (
+                     ('SELECT DISTINCT template FROM jobs '
+                      'ORDER BY template', ()),
+                     ("SELECT elapsed FROM jobs WHERE template = ? AND "
+                      "status = 'successful' ORDER BY started DESC "
+                      "LIMIT ?", ('job', 10)))]
+        conn.close()
+
+        for plan in plans:
+            self.assertIn('jobs_template', plan)
+
+    def test_host_counter(self):
+        """ Test case hosts targeted by playbook are counted """
+
+        inventory_path: str = os.path.join(
+            tree.get_resource_dir('resource_files/inventory'),
+            'sample_inventory.txt')
+        counter = p_run.HostCounter(inventory_path)
+
+        with mock.patch('sys.stderr', new_callable=io.StringIO):
+            self.assertEqual(
+                counter.count(tree._get_playbook_file_path('sample_job1')),
+                1)
+
+
+if __name__ == '__main__':
+    unittest.main()
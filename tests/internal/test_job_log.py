@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+""" Unit test for job log capture """
+
+import gzip
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import job_log
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'sample_job1',
+             'failure': [{'job_template': 'sample_job2'}]}]
+
+
+def _verbose_playbook(playbook_path: str, *_, **__) -> int:
+    """ Fake playbook run which prints many lines and fails job1. """
+
+    name: str = os.path.basename(playbook_path)
+    for line in range(100):
+        print('{} line {}'.format(name, line))
+    # `sample_job1` is run by it's copy which writes `set_stats`.
+    return 0 if name == 'sample_job2.yml' else 2
+
+
+class TestJobLog(unittest.TestCase):
+    """ Unit test for job log capture """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.log_path = job_log.create_log_file(self.work_dir.name, 'job')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_output_capture(self):
+        """ Test case output of process and children is captured """
+
+        stdout = sys.stdout
+        with job_log.OutputCapture(self.log_path, 3) as capture:
+            for line in range(1000):
+                print('line {}'.format(line))
+            sys.stderr.write('error\n')
+            subprocess.run([sys.executable, '-c', 'print("child")'],
+                           check=True)
+            os.write(1, 'not ended あ'.encode('utf-8'))
+        self.assertIs(sys.stdout, stdout)
+
+        self.assertEqual(capture.tail,
+                         ('error', 'child', 'not ended あ'))
+        with gzip.open(self.log_path, 'rt') as lgf:
+            lines: list = lgf.read().splitlines()
+        self.assertEqual(len(lines), 1003)
+        self.assertEqual(lines[0], 'line 0')
+
+    def test_read_tail(self):
+        """ Test case tail is read from log file cut off by killed job """
+
+        with gzip.open(self.log_path, 'wt') as lgf:
+            lgf.write(''.join('line {}\n'.format(line)
+                              for line in range(10000)))
+        with open(self.log_path, 'rb') as lgf:
+            compressed: bytes = lgf.read()
+        with open(self.log_path, 'wb') as lgf:
+            lgf.write(compressed[:len(compressed) // 2])
+
+        tail: tuple = job_log.read_tail(self.log_path, 2)
+        self.assertEqual(len(tail), 2)
+        self.assertTrue(tail[0].startswith('line '))
+        self.assertEqual(job_log.read_tail(
+            os.path.join(self.work_dir.name, 'no_such.log.gz')), ())
+
+    def test_job_records(self):
+        """ Test case failed job's record has log file and tail """
+
+        for max_parallel in (1, 2):
+            log_dir: str = tempfile.mkdtemp(dir=self.work_dir.name)
+            top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+            workflow_node = w_parser.WorkflowNode(
+                top_node, executor=_verbose_playbook, log_dir=log_dir,
+                log_tail=5)
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                records: list = w_run.WorkflowRunner(
+                    '', max_parallel).run(workflow_node, '{}',
+                                          self.work_dir.name)
+
+            self.assertEqual([record.status for record in records],
+                             ['failed', 'successful'])
+            self.assertEqual(len(records[0].log_tail), 5)
+            self.assertTrue(records[0].log_tail[-1].endswith('line 99'))
+            self.assertEqual(os.path.dirname(records[1].log_path), log_dir)
+            with gzip.open(records[1].log_path, 'rt') as lgf:
+                self.assertEqual(len(lgf.read().splitlines()), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+""" Unit test for metrics writer """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import metrics
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'sample_job1',
+             'success': [{'workflow': 'sample_workflow'}]}]
+
+
+class _FakeHostCounter:
+    """ Host counter which doesn't parse inventory. """
+
+    @staticmethod
+    def count(_: str) -> int:
+        return 2
+
+
+def _read_samples(metrics_file: str) -> dict:
+    """ Sample lines of metrics file as `{name{labels}: value}`. """
+
+    with open(metrics_file, 'r') as mtf:
+        lines: list = mtf.read().splitlines()
+    assert lines[-1] == '# EOF'
+    return dict(line.rsplit(' ', 1) for line in lines
+                if not line.startswith('#'))
+
+
+class TestMetrics(unittest.TestCase):
+    """ Unit test for metrics writer """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.work_dir.name,
+                                         'workflow.prom')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_write_metrics(self):
+        """ Test case metrics are written at each job and the end """
+
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+        writer = metrics.MetricsWriter(self.metrics_file, 'workflow.yml',
+                                       _FakeHostCounter(), per_job=True)
+        workflow_runner = w_run.WorkflowRunner(
+            '', on_record=writer.record_job)
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               return_value=0), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            workflow_runner.run(w_parser.WorkflowNode(top_node), '{}', '')
+
+        # The first job's metrics are replaced by the last job's.
+        samples: dict = _read_samples(self.metrics_file)
+        self.assertNotIn(
+            'workflow_runner_workflow_duration_seconds'
+            '{workflow="workflow.yml"}', samples)
+        self.assertEqual(os.listdir(self.work_dir.name), ['workflow.prom'])
+
+        writer.record_workflow('successful', 12.5)
+        samples = _read_samples(self.metrics_file)
+
+        prefix = 'workflow_runner_'
+        labels = '{workflow="workflow.yml",template="sample_job1"'
+        self.assertEqual(samples[prefix + 'workflow_duration_seconds'
+                                          '{workflow="workflow.yml"}'],
+                         '12.5')
+        self.assertEqual(samples[prefix + 'workflow_successful'
+                                          '{workflow="workflow.yml"}'], '1')
+        # `sample_job1` runs also in sub-workflow.
+        self.assertEqual(samples[prefix + 'job_duration_seconds_bucket' +
+                                 labels + ',le="1.0"}'], '2')
+        self.assertEqual(samples[prefix + 'job_duration_seconds_bucket' +
+                                 labels + ',le="+Inf"}'], '2')
+        self.assertEqual(samples[prefix + 'job_queue_wait_seconds_count' +
+                                 labels + '}'], '2')
+        self.assertEqual(samples[prefix + 'jobs_total' + labels +
+                                 ',type="job_template",status="successful"}'],
+                         '2')
+        self.assertEqual(
+            samples[prefix + 'jobs_total{workflow="workflow.yml",'
+                             'template="sample_workflow",'
+                             'type="workflow_job",status="successful"}'],
+            '1')
+        self.assertIn(prefix + 'set_stats_capture_seconds_total' +
+                      labels + '}', samples)
+        # 1 job and 3 jobs in sub-workflow target 2 hosts each.
+        self.assertEqual(sum(int(value) for name, value in samples.items()
+                             if name.startswith(prefix + 'hosts_processed')),
+                         8)
+
+    def test_escape_labels(self):
+        """ Test case label values are escaped """
+
+        writer = metrics.MetricsWriter(self.metrics_file, 'say "hi"\\.yml')
+        writer.record_workflow('failed', 1.0)
+        samples: dict = _read_samples(self.metrics_file)
+        self.assertEqual(samples['workflow_runner_workflow_successful'
+                                 '{workflow="say \\"hi\\"\\\\.yml"}'], '0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Unit test for profiling of parse and dry run """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import profiling
+from internal import yaml_loader
+from internal.playbook import parser
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+
+class TestProfiling(unittest.TestCase):
+    """ Unit test for profiling of parse and dry run """
+
+    def setUp(self):
+        parser._analysis_cache.clear()
+        yaml_loader._document_cache.clear()
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.profile_file = os.path.join(self.work_dir.name, 'profile.txt')
+
+    def tearDown(self):
+        profiling.stop()
+        parser._analysis_cache.clear()
+        self.work_dir.cleanup()
+
+    def _profile(self, mode: str) -> str:
+        workflow_file: str = tree._get_workflow_file_path('sample_workflow')
+
+        profiling.start(mode, self.profile_file)
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            with profiling.stage('parse'):
+                workflow_node = w_parser.parse(workflow_file, True, {})
+            with profiling.stage('dry_run'):
+                w_run.WorkflowRunner('').dry_run(workflow_node)
+            profiling.stop()
+
+        return stdout.getvalue()
+
+    def test_cpu_profile(self):
+        """ Test case each stage's time is broken down by category """
+
+        summary: str = self._profile('cpu')
+
+        self.assertIn('------ Profile (cpu) ------', summary)
+        parse_line: str = [line for line in summary.splitlines()
+                           if line.startswith('parse: ')][0]
+        self.assertIn('yaml', parse_line)
+        self.assertNotIn('yaml 0.000s', parse_line)
+
+        with open(self.profile_file, 'r') as pff:
+            report: str = pff.read()
+        self.assertIn('===== parse: ', report)
+        self.assertIn('===== dry_run: ', report)
+        self.assertIn('generate_workflow_tree', report)
+
+    def test_mem_profile(self):
+        """ Test case each stage's allocations are reported """
+
+        summary: str = self._profile('mem')
+
+        self.assertRegex(summary, r'parse: peak [0-9.]+ KiB, allocated ')
+        with open(self.profile_file, 'r') as pff:
+            report: str = pff.read()
+        self.assertIn('size=', report)
+
+    def test_not_started(self):
+        """ Test case nothing is profiled without starting """
+
+        self.assertIs(profiling.stage('parse'), profiling._NO_STAGE)
+        profiling.stop()
+        self.assertFalse(os.path.exists(self.profile_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
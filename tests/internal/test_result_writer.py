@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+""" Unit test for result writers """
+
+import csv
+from datetime import timedelta
+import io
+import json
+import unittest
+from unittest import mock
+
+from internal import result_writer
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'sample_job1',
+             'success': [{'job_template': 'sample_job2'},
+                         {'workflow': 'sample_workflow'}]}]
+
+
+class TestResultWriter(unittest.TestCase):
+    """ Unit test for result writers """
+
+    def _run_workflow(self, writer: result_writer.ResultWriter,
+                      written: list):
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+
+        def _write_job(record: w_run.JobRecord):
+            writer.write_job(record)
+            # Output at the time each job finished.
+            written.append(writer.stream.getvalue())
+
+        workflow_runner = w_run.WorkflowRunner('', on_record=_write_job)
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               return_value=0), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        writer.write_workflow('workflow/sample.yml', '2020-01-01T00:00:00',
+                              results[-1].status, 1.5)
+        writer.close()
+
+    def test_jsonl_streamed(self):
+        """ Test case each job's rows are written when it finished """
+
+        writer = result_writer.JsonLinesWriter(io.StringIO())
+        written = []
+        self._run_workflow(writer, written)
+
+        self.assertEqual([len(output.splitlines()) for output in written],
+                         [1, 2, 6])
+        rows = [json.loads(line)
+                for line in writer.stream.getvalue().splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         ['1', '2', '3', '3.1', '3.2', '3.3', None])
+        self.assertEqual(rows[0]['attempts'], 0)
+        self.assertIsNone(rows[2]['attempts'])
+        self.assertEqual(rows[-1]['type'], 'workflow')
+        self.assertEqual(rows[-1]['name'], 'sample.yml')
+
+    def test_json_and_csv(self):
+        """ Test case JSON array and CSV have the same rows """
+
+        json_writer = result_writer.create_writer('json', io.StringIO())
+        self._run_workflow(json_writer, [])
+        json_rows = json.loads(json_writer.stream.getvalue())
+
+        csv_writer = result_writer.create_writer('csv', io.StringIO())
+        self._run_workflow(csv_writer, [])
+        csv_rows = list(csv.DictReader(
+            io.StringIO(csv_writer.stream.getvalue())))
+
+        self.assertEqual(len(json_rows), 7)
+        self.assertEqual([row['id'] for row in csv_rows],
+                         [row['id'] or '' for row in json_rows])
+        self.assertEqual(csv_rows[-1]['elapsed'], '1.5')
+
+        empty_writer = result_writer.create_writer('json', io.StringIO())
+        empty_writer.close()
+        self.assertEqual(json.loads(empty_writer.stream.getvalue()), [])
+
+    def test_elapsed_hours(self):
+        """ Test case elapsed time over an hour keeps hours """
+
+        record = w_run.JobRecord(1, 'sample_job1')
+        record.set_end_time()
+        record._start = record._end - timedelta(hours=2, seconds=3)
+
+        self.assertEqual(record.get_elapsed(), '7203.000000')
+        self.assertEqual(record.get_elapsed_seconds(), 7203.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
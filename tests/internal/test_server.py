@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+""" Unit test for workflow runner server """
+
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from internal import client, server
+from internal.workflow import parser as w_parser
+from internal.workflow import tree
+
+PLAYBOOK = """
+---
+- name: test_server_job
+  hosts: all
+  gather_facts: false
+{vars}
+  tasks:
+    - debug: msg="{{{{ test_server_var }}}}"
+"""
+
+
+class TestServer(unittest.TestCase):
+    """ Unit test for workflow runner server """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.work_dir.name, 'test.sock')
+        self.server_log = os.path.join(self.work_dir.name, 'server.log')
+
+        # job_template files are searched in the temporary directory.
+        job_template_dir = os.path.join(self.work_dir.name, 'job_template')
+        os.mkdir(job_template_dir)
+        self.playbook_path = os.path.join(job_template_dir,
+                                          'test_server_job.yml')
+        self._write_playbook('')
+
+        self.workflow_file = os.path.join(self.work_dir.name, 'workflow.yml')
+        with open(self.workflow_file, 'w') as wff:
+            wff.write('- job_template: test_server_job\n')
+
+        patchers = [mock.patch.object(tree, 'JOB_TEMPLATE_DIR',
+                                      job_template_dir),
+                    mock.patch.object(server, 'CHECK_INTERVAL', 0.1)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.server_process = None
+
+    def tearDown(self):
+        if self.server_process:
+            self.server_process.terminate()
+            self.server_process.join()
+        self.work_dir.cleanup()
+
+    def _write_playbook(self, playbook_vars: str):
+        with open(self.playbook_path, 'w') as pbf:
+            pbf.write(PLAYBOOK.format(vars=playbook_vars))
+
+    def _start_server(self):
+        workflow_server = server.WorkflowServer(self.socket_path)
+
+        def _serve():
+            sys.stdout = open(self.server_log, 'w')
+            workflow_server.serve()
+
+        context = multiprocessing.get_context('fork')
+        self.server_process = context.Process(target=_serve)
+        self.server_process.start()
+
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.05)
+
+    def _request(self, dry_run: bool) -> (int, str):
+        args = {'dry_run': dry_run,
+                'workflow_file': self.workflow_file,
+                'plan_file': None,
+                'inventory_file': None,
+                'extra_vars': {},
+                'auth_extra_vars': '{}'}
+
+        output = io.StringIO()
+        exit_code: int = client.request('execute', args, self.socket_path,
+                                        output)
+        return exit_code, output.getvalue()
+
+    def _read_server_log(self) -> str:
+        with open(self.server_log, 'r') as slf:
+            return slf.read()
+
+    def test_dry_run_reanalyzed(self):
+        """ Test case changed playbook is analyzed again by server """
+
+        self._start_server()
+
+        exit_code, output = self._request(True)
+        self.assertEqual(exit_code, 1)
+        self.assertIn('DryRunFailed', output)
+        self.assertIn('test_server_var', output)
+
+        self._write_playbook('  vars:\n    test_server_var: defined')
+        for _ in range(100):
+            if 'Reloaded playbook' in self._read_server_log():
+                break
+            time.sleep(0.05)
+
+        self.assertIn("Reloaded playbook '{}'".format(self.playbook_path),
+                      self._read_server_log())
+
+        exit_code, output = self._request(True)
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Dry run complete.', output)
+
+    def test_run_forked(self):
+        """ Test case run is handled in forked process """
+
+        with mock.patch.object(w_parser.WorkflowNode, 'run', return_value=0):
+            self._start_server()
+
+        exit_code, output = self._request(False)
+        self.assertEqual(exit_code, 0)
+        self.assertIn('test_server_job', output)
+        self.assertIn('successful', output)
+
+    def test_exit_code_relayed(self):
+        """ Test case exit code of `sys.exit` is returned to client """
+
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               side_effect=SystemExit(3)):
+            self._start_server()
+
+        exit_code, _ = self._request(False)
+        self.assertEqual(exit_code, 3)
+
+        # Server keeps running after the forked process exited.
+        exit_code, _ = self._request(True)
+        self.assertEqual(exit_code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
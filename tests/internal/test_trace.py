@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" Unit test for trace-event timeline """
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import trace
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'sample_job1',
+             'success': [{'job_template': 'sample_job2'},
+                         {'job_template': 'sample_job2'}]}]
+
+
+class TestTrace(unittest.TestCase):
+    """ Unit test for trace-event timeline """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.work_dir.name, 'trace.json')
+
+    def tearDown(self):
+        trace.stop()
+        self.work_dir.cleanup()
+
+    def test_spans_of_forked_jobs(self):
+        """ Test case spans of jobs in forked processes are written """
+
+        trace.start(self.trace_file)
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+
+        workflow_runner = w_run.WorkflowRunner('', max_parallel=2)
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch.object(p_run, 'separate_local_tmp'), \
+                mock.patch.object(p_run, 'run_playbook', return_value=0):
+            workflow_runner.run(w_parser.WorkflowNode(top_node), '{}',
+                                self.work_dir.name)
+        trace.stop()
+
+        with open(self.trace_file, 'r') as tcf:
+            events: list = json.load(tcf)['traceEvents']
+
+        spans = [event for event in events if event['ph'] == 'X']
+        job_pids = {event['pid'] for event in spans
+                    if event['cat'] == 'job'}
+        self.assertEqual(len(job_pids), 3)
+        self.assertNotIn(os.getpid(), job_pids)
+        self.assertEqual(
+            sorted(event['name'] for event in spans
+                   if event['args'].get('node') == 'sample_job1'),
+            ['prepare_playbook', 'run_playbook', 'set_after_extra_vars'])
+
+        # Each span is in it's job's span.
+        jobs = {event['pid']: event for event in spans
+                if event['cat'] == 'job'}
+        for event in spans:
+            job = jobs.get(event['pid'])
+            if job and event is not job:
+                self.assertGreaterEqual(event['ts'], job['ts'])
+                self.assertLessEqual(event['ts'] + event['dur'],
+                                     job['ts'] + job['dur'])
+
+        names = {event['args']['name'] for event in events
+                 if event['ph'] == 'M'}
+        self.assertIn('job 2: sample_job2', names)
+
+    def test_not_started(self):
+        """ Test case nothing is recorded without starting trace """
+
+        with trace.span('parse'):
+            pass
+        self.assertIs(trace.span('parse'), trace._NO_SPAN)
+        self.assertFalse(os.path.exists(self.trace_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
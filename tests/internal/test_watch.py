@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+""" Unit test for watch mode """
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal import watch
+from internal.workflow import tree
+
+WORKFLOW = """
+---
+- job_template: watch_job_a
+  success:
+    - job_template: watch_job_b
+      success:
+        - job_template: watch_job_c
+"""
+
+PLAYBOOK = """
+---
+- name: {name}
+  hosts: all
+  gather_facts: false
+  tasks:
+    - {task}
+"""
+
+
+class TestWatch(unittest.TestCase):
+    """ Unit test for watch mode """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.job_template_dir = os.path.join(self.work_dir.name,
+                                             'job_template')
+        os.mkdir(self.job_template_dir)
+
+        self._write_playbook('watch_job_a',
+                             'set_stats:\n        data:\n'
+                             '          watch_stats: "1"')
+        self._write_playbook('watch_job_b', 'debug: msg=hello')
+        self._write_playbook('watch_job_c',
+                             'debug: msg="{{ watch_stats }}"')
+
+        workflow_file = os.path.join(self.work_dir.name, 'workflow.yml')
+        with open(workflow_file, 'w') as wff:
+            wff.write(WORKFLOW)
+
+        patchers = [mock.patch.object(tree, 'JOB_TEMPLATE_DIR',
+                                      self.job_template_dir),
+                    mock.patch('sys.stdout', new_callable=io.StringIO)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.watcher = watch.DryRunWatcher(workflow_file, {})
+        self.watcher.check_all()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _write_playbook(self, name: str, task: str):
+        playbook_path = os.path.join(self.job_template_dir,
+                                     '{}.yml'.format(name))
+        with open(playbook_path, 'w') as pbf:
+            pbf.write(PLAYBOOK.format(name=name, task=task))
+
+    def test_no_change(self):
+        """ Test case nothing is checked without changes """
+
+        self.assertEqual(self.watcher.checked_count, 3)
+        self.assertEqual(self.watcher._failures, {})
+        self.assertFalse(self.watcher.poll())
+
+    def test_necessary_vars_changed(self):
+        """ Test case only the changed node is checked again """
+
+        self._write_playbook('watch_job_c',
+                             'debug: msg="{{ watch_stats }} {{ new_var }}"')
+
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.watcher.checked_count, 1)
+
+        failures = list(self.watcher._failures.values())
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(list(failures[0].values()), [{'new_var'}])
+
+    def test_set_stats_changed(self):
+        """ Test case descendants are checked again with new set_stats """
+
+        self._write_playbook('watch_job_a',
+                             'set_stats:\n        data:\n'
+                             '          renamed_stats: "1"')
+
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.watcher.checked_count, 3)
+
+        failures = list(self.watcher._failures.values())
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(list(failures[0].values()), [{'watch_stats'}])
+
+    def test_included_file_changed(self):
+        """ Test case playbook is checked again when it's include changed """
+
+        self._write_playbook('watch_job_b', 'include_tasks: included.yml')
+        included_path = os.path.join(self.job_template_dir, 'included.yml')
+        with open(included_path, 'w') as inf:
+            inf.write('- debug: msg=hello\n')
+        self.watcher.poll()
+
+        with open(included_path, 'w') as inf:
+            inf.write('- debug: msg="{{ included_var }}"\n')
+
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.watcher.checked_count, 1)
+
+        failures = list(self.watcher._failures.values())
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(list(failures[0].values()), [{'included_var'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
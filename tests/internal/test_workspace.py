@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+""" Unit test for per-run workspace """
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from internal import workspace
+from internal.workflow import parser as w_parser
+from internal.workflow import tree
+
+
+class TestWorkspace(unittest.TestCase):
+    """ Unit test for per-run workspace """
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def _list(self, dir_name: str) -> list:
+        return sorted(os.listdir(os.path.join(self.root.name, dir_name)))
+
+    def test_cleanup_and_keep_failed(self):
+        """ Test case only the latest failed runs' workspaces are kept """
+
+        with workspace.Workspace(self.root.name) as run_space:
+            self.assertEqual(self._list(workspace.RUNS_DIR),
+                             [run_space.run_id])
+            with open(os.path.join(run_space.path, 'tmp.yml'), 'w') as tmf:
+                tmf.write('---\n')
+        self.assertEqual(self._list(workspace.RUNS_DIR), [])
+        self.assertIsNone(run_space.kept_path)
+
+        run_ids = []
+        for _ in range(3):
+            with workspace.Workspace(self.root.name, 2) as run_space:
+                run_space.mark_failed()
+            run_ids.append(run_space.run_id)
+        self.assertEqual(self._list(workspace.FAILED_DIR), run_ids[1:])
+        self.assertEqual(os.path.basename(run_space.kept_path), run_ids[-1])
+
+        with self.assertRaises(KeyboardInterrupt), \
+                workspace.Workspace(self.root.name, 2) as run_space:
+            raise KeyboardInterrupt
+        self.assertEqual(self._list(workspace.FAILED_DIR),
+                         [run_ids[-1], run_space.run_id])
+
+        with workspace.Workspace(self.root.name, 0) as run_space:
+            run_space.mark_failed()
+        self.assertEqual(self._list(workspace.RUNS_DIR), [])
+        self.assertEqual(self._list(workspace.FAILED_DIR), [])
+
+    def test_recover_stale(self):
+        """ Test case workspace of killed run is moved to failed """
+
+        # Process id of exited process.
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        stale_id: str = '20200101T000000000000Z-{}-0'.format(process.pid)
+        running_id: str = workspace.new_run_id()
+        for run_id in (stale_id, running_id):
+            os.makedirs(os.path.join(self.root.name, workspace.RUNS_DIR,
+                                     run_id))
+
+        with workspace.Workspace(self.root.name) as run_space:
+            self.assertEqual(self._list(workspace.RUNS_DIR),
+                             sorted([running_id, run_space.run_id]))
+        self.assertEqual(self._list(workspace.FAILED_DIR), [stale_id])
+
+    def test_set_stats_files(self):
+        """ Test case `set_stats` values are read in run's workspace """
+
+        workflow = [{'job_template': 'sample_job1'}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+        workflow_node = w_parser.WorkflowNode(top_node)
+
+        with workspace.Workspace(self.root.name) as run_space:
+            self.assertIn('-', run_space.path)
+            _, stats_files = workflow_node._prepare_playbook(run_space.path)
+            for stats_file in stats_files:
+                with open(stats_file, 'w') as stf:
+                    stf.write('value\n')
+            workflow_node._set_after_extra_vars(stats_files)
+
+        self.assertTrue(stats_files)
+        for stats_file in stats_files:
+            var_name: str = os.path.basename(stats_file).split('-')[1]
+            self.assertEqual(top_node.after_extra_vars[var_name], 'value')
+
+
+if __name__ == '__main__':
+    unittest.main()
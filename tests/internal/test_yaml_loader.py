@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+""" Unit test for YAML loader """
+
+import copy
+import os
+import pickle
+import tempfile
+import unittest
+
+from internal import yaml_loader
+
+
+class TestYamlLoader(unittest.TestCase):
+    """ Unit test for YAML loader """
+
+    def setUp(self):
+        yaml_loader._document_cache.clear()
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.yaml_file = os.path.join(self.work_dir.name, 'vars.yml')
+        self._write('base: &base {name: sample}\n'
+                    'jobs: [*base, *base]\n')
+
+    def tearDown(self):
+        yaml_loader._document_cache.clear()
+        self.work_dir.cleanup()
+
+    def _write(self, content: str, mtime_ns: int = None):
+        with open(self.yaml_file, 'w') as ymf:
+            ymf.write(content)
+        if mtime_ns is not None:
+            os.utime(self.yaml_file, ns=(mtime_ns, mtime_ns))
+
+    def test_load_file_cache(self):
+        """ Test case not changed file is loaded from cache """
+
+        document = yaml_loader.load_file(self.yaml_file)
+        self.assertIs(yaml_loader.load_file(self.yaml_file), document)
+        self.assertIs(yaml_loader.load_file(
+            os.path.relpath(self.yaml_file)), document)
+        # Aliases share one read-only container.
+        self.assertIs(document['jobs'][0], document['base'])
+        self.assertIsInstance(document['jobs'], yaml_loader.ReadOnlyList)
+
+        # Reloaded when size is changed even in the same mtime.
+        mtime_ns: int = os.stat(self.yaml_file).st_mtime_ns
+        self._write('base: {name: changed}\n', mtime_ns)
+        self.assertEqual(yaml_loader.load_file(self.yaml_file),
+                         {'base': {'name': 'changed'}})
+
+        self._write('base: {name: renamed}\n', mtime_ns + 10 ** 9)
+        yaml_loader.drop_stale_documents()
+        self.assertEqual(yaml_loader._document_cache, {})
+        self.assertEqual(yaml_loader.load_file(self.yaml_file),
+                         {'base': {'name': 'renamed'}})
+
+        os.remove(self.yaml_file)
+        yaml_loader.drop_stale_documents()
+        self.assertEqual(yaml_loader._document_cache, {})
+
+    def test_read_only(self):
+        """ Test case cached document can't be changed but copied """
+
+        document = yaml_loader.load_file(self.yaml_file)
+        with self.assertRaises(TypeError):
+            document['base']['name'] = 'changed'
+        with self.assertRaises(TypeError):
+            document['jobs'].append({})
+        with self.assertRaises(TypeError):
+            document.update({'base': None})
+
+        for copied in (copy.deepcopy(document),
+                       pickle.loads(pickle.dumps(document))):
+            self.assertEqual(copied, document)
+            self.assertIsInstance(copied['jobs'], yaml_loader.ReadOnlyList)
+
+        thawed = yaml_loader.thaw(document)
+        self.assertIs(type(thawed), dict)
+        self.assertIs(type(thawed['jobs'][0]), dict)
+        thawed['jobs'][0]['name'] = 'changed'
+        self.assertEqual(thawed['base']['name'], 'changed')
+        self.assertEqual(document['base']['name'], 'sample')
+
+    def test_dumps(self):
+        """ Test case read-only document is dumped as plain YAML """
+
+        document = yaml_loader.load_file(self.yaml_file)
+        text: str = yaml_loader.dumps(document)
+        self.assertNotIn('!!python', text)
+        self.assertEqual(yaml_loader.loads(text), document)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+""" Unit test for workflow node """
+
+import tracemalloc
+import unittest
+
+from internal.workflow import node, tree
+
+JOB_TEMPLATES = ['sample_job1', 'sample_job2', 'sample_job3', 'sample_job4']
+
+
+def _generate_workflow(depth: int, width: int, index: int = 0) -> dict:
+    job_dict = {'job_template': JOB_TEMPLATES[index % len(JOB_TEMPLATES)]}
+    if depth:
+        job_dict['success'] = [_generate_workflow(depth - 1, width, idx)
+                               for idx in range(width)]
+    return job_dict
+
+
+class TestWorkFlowNode(unittest.TestCase):
+    """ Unit test for workflow node """
+
+    def test_share_extra_vars(self):
+        """ Test case nodes without `set_stats` share parent's extra_vars """
+
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [{'job_template': 'sample_job2'}],
+                     'failure': [{'job_template': 'sample_job3'}]}]
+        extra_vars_arg = {'sample_vars': 'sample'}
+
+        top_node = tree.generate_workflow_tree(workflow, True, extra_vars_arg)
+        success_node = top_node.success[0]
+        failed_node = top_node.failed[0]
+
+        self.assertEqual(set(success_node.before_extra_vars),
+                         {'sample_vars', 'pwd_stats'})
+        self.assertIs(success_node.after_extra_vars,
+                      success_node.before_extra_vars)
+        self.assertIs(failed_node.before_extra_vars,
+                      top_node.before_extra_vars)
+        self.assertEqual(top_node.always, ())
+
+    def test_shared_extra_vars_read_only(self):
+        """ Test case updating shared extra_vars fails """
+
+        workflow = [{'job_template': 'sample_job2',
+                     'success': [{'job_template': 'sample_job3'}]}]
+
+        top_node = tree.generate_workflow_tree(workflow, True, None)
+        child_node = top_node.success[0]
+
+        self.assertIs(top_node.before_extra_vars, node.NO_VARS)
+        with self.assertRaises(TypeError):
+            node.NO_VARS['sample_vars'] = 'leaked'
+        with self.assertRaises(TypeError):
+            child_node.before_extra_vars['sample_vars'] = 'leaked'
+
+    def test_large_workflow_memory(self):
+        """ Benchmark case peak memory of 10,000 nodes dry run tree """
+
+        workflow = [_generate_workflow(depth=2, width=100)]
+        extra_vars_arg = {'sample_vars_{}'.format(idx): idx
+                          for idx in range(50)}
+
+        tracemalloc.start()
+        try:
+            top_node = tree.generate_workflow_tree(workflow, True,
+                                                   extra_vars_arg)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(top_node.success), 100)
+        # Copying extra_vars for each node used more than 60MB.
+        self.assertLess(peak, 20 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 """ Unit test for workflow parser """
 
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 import yaml
 
+from internal.workflow import parser as w_parser
 from internal.workflow import tree
 
 
@@ -44,6 +48,91 @@ class TestWorkFlowParser(unittest.TestCase):
         correct = 1
         self.assertEqual(top_node.node_id, correct)
 
+    def test_nested_workflow_parse(self):
+        """ Test case sub-workflow is compiled once and shared """
+
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [{'workflow': 'sample_workflow'}],
+                     'always': [{'workflow': 'sample_workflow'}]}]
+        dry_run = True
+        extra_vars_arg = {'sample_vars': 'sample'}
+
+        top_node = tree.generate_workflow_tree(workflow, dry_run,
+                                               extra_vars_arg)
+        success_node = top_node.success[0]
+        always_node = top_node.always[0]
+
+        self.assertEqual(success_node.node_type, 'workflow')
+        self.assertIs(success_node.sub_workflow, always_node.sub_workflow)
+        self.assertEqual(success_node.sub_workflow.top_node.node_name,
+                         'sample_job1')
+        self.assertEqual(success_node.get_necessary_variable_keys(), {})
+        self.assertIn('sample_vars', success_node.after_extra_vars)
+
+    def test_enter_sub_workflow(self):
+        """ Test case entering sub-workflow doesn't change shared tree """
+
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [{'workflow': 'sample_workflow'}],
+                     'always': [{'workflow': 'sample_workflow'}]}]
+        top_node = tree.generate_workflow_tree(workflow, False,
+                                               {'sample_vars': 'sample'})
+        sub_top_node = top_node.success[0].sub_workflow.top_node
+        compiled_vars: dict = sub_top_node.before_extra_vars
+
+        sub_workflow_nodes = []
+        for child, value in ((top_node.success[0], 'success'),
+                             (top_node.always[0], 'always')):
+            top_node.after_extra_vars = {'sample_vars': value}
+            sub_workflow_nodes.append(w_parser.WorkflowNode(
+                top_node).create_child(child).enter_sub_workflow())
+
+        self.assertIs(sub_top_node.before_extra_vars, compiled_vars)
+        self.assertEqual([sub_workflow_node.parent_node.after_extra_vars
+                          for sub_workflow_node in sub_workflow_nodes],
+                         [{'sample_vars': 'success'},
+                          {'sample_vars': 'always'}])
+        for sub_workflow_node in sub_workflow_nodes:
+            self.assertIs(sub_workflow_node.current_node, sub_top_node)
+
+    def test_circular_workflow_parse(self):
+        """ Test case sub-workflow refers itself """
+
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [{'workflow': 'sample_workflow'}]}]
+        workflow_path = tree._get_workflow_file_path('sample_workflow')
+
+        with self.assertRaises(tree.ParseFailed):
+            tree.generate_workflow_tree(workflow, True, {}, workflow_path)
+
+
+    def test_undeclared_pool(self):
+        """ Test case job of undeclared pool is rejected """
+
+        workflow = [{'pools': {'db_hosts': 1}},
+                    {'job_template': 'sample_job1', 'pool': 'web_hosts'}]
+
+        with self.assertRaises(tree.ParseFailed):
+            tree.generate_workflow_tree(workflow, False, {})
+
+    def test_sub_workflow_pools(self):
+        """ Test case pools declared in sub-workflow file are merged """
+
+        with tempfile.TemporaryDirectory() as workflow_dir, \
+                mock.patch.object(tree, 'WORKFLOW_DIR', workflow_dir):
+            with open(os.path.join(workflow_dir, 'db_workflow.yml'),
+                      'w') as wff:
+                wff.write('- pools:\n    db_hosts: 2\n    web_hosts: 2\n'
+                          '- job_template: sample_job2\n'
+                          '  pool: db_hosts\n')
+            workflow = [{'pools': {'web_hosts': 1}},
+                        {'job_template': 'sample_job1', 'pool': 'web_hosts',
+                         'success': [{'workflow': 'db_workflow'}]}]
+
+            top_node = tree.generate_workflow_tree(workflow, False, {})
+            self.assertEqual(tree.get_pools(workflow, top_node),
+                             {'db_hosts': 2, 'web_hosts': 1})
+        tree.drop_stale_resource_files()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" Unit test for compiled workflow plan """
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal.playbook import parser
+from internal.workflow import node, plan, tree
+
+
+class TestWorkFlowPlan(unittest.TestCase):
+    """ Unit test for compiled workflow plan """
+
+    def setUp(self):
+        workflow_path = tree._get_workflow_file_path('sample_nested_workflow')
+        self.plan = plan.compile_plan(workflow_path)
+
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.plan_path = os.path.join(self.work_dir.name, 'plan.json')
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_load_plan_without_parsing(self):
+        """ Test case compiled plan is loaded without parsing playbooks """
+
+        self.plan['sub_workflows'][0]['provided_failed'] = ['compiled']
+        plan.write_plan(self.plan, self.plan_path)
+        node._define_stats_cache.clear()
+        parser._analysis_cache.clear()
+
+        with mock.patch('internal.playbook.parser._load_yaml',
+                        side_effect=AssertionError('playbook parsed')), \
+                mock.patch.object(node.SubWorkflow, 'analyze',
+                                  side_effect=AssertionError('analyzed')):
+            compiled: dict = plan.read_plan(self.plan_path)
+            top_node = plan.load_plan(compiled, True, {'sample_vars': 1})
+            workflow_node = top_node.success[0]
+            sub_required = workflow_node.get_necessary_variable_keys()
+
+        self.assertEqual(top_node.node_name, 'sample_job1')
+        self.assertEqual(workflow_node.node_type, 'workflow')
+        self.assertEqual(workflow_node.sub_workflow.top_node.node_name,
+                         'sample_job1')
+        self.assertEqual(workflow_node.always[0].node_name, 'sample_job4')
+        self.assertEqual(sub_required, {})
+        self.assertIn('pwd_stats', workflow_node.before_extra_vars)
+        # Sub-workflow analysis is taken from the plan.
+        self.assertEqual(workflow_node.sub_workflow.provided_failed,
+                         {'compiled'})
+
+    def test_changed_resource_file(self):
+        """ Test case plan is rejected when playbook was changed """
+
+        playbook = list(self.plan['playbooks'].values())[0]
+        playbook_path = list(playbook['files'])[0]
+        playbook['files'][playbook_path] = 'changed'
+        plan.write_plan(self.plan, self.plan_path)
+
+        with self.assertRaises(plan.PlanInvalid):
+            plan.read_plan(self.plan_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+""" Unit test for variable provenance index """
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from internal.playbook import parser
+from internal.workflow import parser as w_parser
+from internal.workflow import provenance
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+WORKFLOW = [{'job_template': 'provider_job',
+             'success': [{'job_template': 'consumer_job'}],
+             'failure': [{'job_template': 'consumer_job'}]}]
+
+PLAYBOOKS = {
+    'provider_job': """
+---
+- hosts: all
+  vars:
+    header_var: "{{ cli_var }}"
+  tasks:
+    - set_fact:
+        fact_var: "{{ header_var }}"
+    - set_stats:
+        data:
+          stats_var: "{{ fact_var }}"
+""",
+    'consumer_job': """
+---
+- hosts: all
+  tasks:
+    - debug: msg="{{ stats_var }} {{ cli_var }}"
+"""}
+
+
+class TestProvenance(unittest.TestCase):
+    """ Unit test for variable provenance index """
+
+    def setUp(self):
+        parser._analysis_cache.clear()
+
+        self.work_dir = tempfile.TemporaryDirectory()
+        for name, playbook in PLAYBOOKS.items():
+            with open(os.path.join(self.work_dir.name,
+                                   '{}.yml'.format(name)), 'w') as pbf:
+                pbf.write(playbook)
+
+        patcher = mock.patch.object(tree, 'JOB_TEMPLATE_DIR',
+                                    self.work_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.top_node = tree.generate_workflow_tree(WORKFLOW, True,
+                                                    {'cli_var': 'value'})
+        self.index = provenance.ProvenanceIndex(self.top_node)
+
+    def tearDown(self):
+        parser._analysis_cache.clear()
+        self.work_dir.cleanup()
+
+    def test_providers(self):
+        """ Test case each variable's providers are indexed """
+
+        top, success, failed = (
+            self.index.get_node_number(_node) for _node in (
+                self.top_node, self.top_node.success[0],
+                self.top_node.failed[0]))
+
+        types = {var_name: [provider.provider_type
+                            for provider in self.index.get_providers(var_name)]
+                 for var_name in ('cli_var', 'header_var', 'fact_var',
+                                  'stats_var')}
+        self.assertEqual(types, {'cli_var': ['extra_vars'],
+                                 'header_var': ['vars'],
+                                 'fact_var': ['set_fact'],
+                                 'stats_var': ['set_stats']})
+        self.assertEqual(
+            self.index.get_providers('fact_var')[0].location, 'play.tasks[0]')
+
+        provider = self.index.get_provider(success, 'stats_var')
+        self.assertEqual(provider.node_number, top)
+        self.assertIsNone(self.index.get_provider(failed, 'stats_var'))
+
+        self.assertEqual(self.index.get_consumers(top),
+                         {success: {'stats_var'}})
+        self.assertEqual(
+            self.index.get_consumers(provenance.EXTRA_VARS_ID),
+            {top: {'cli_var'}, success: {'cli_var'}, failed: {'cli_var'}})
+        self.assertEqual(self.index.missing, {failed: {'stats_var'}})
+
+    def test_dump(self):
+        """ Test case index is exported as JSON """
+
+        index_file = os.path.join(self.work_dir.name, 'provenance.json')
+        self.index.dump(index_file)
+
+        with open(index_file, 'r') as pvf:
+            index: dict = json.load(pvf)
+
+        # Nodes are numbered in written order.
+        self.assertEqual(index['nodes']['3']['case_type'], 'failure')
+        self.assertEqual(index['nodes']['3']['parent'], 1)
+        self.assertEqual(index['nodes']['3']['missing'], ['stats_var'])
+        self.assertEqual(index['nodes']['1']['consumers'],
+                         {'2': ['stats_var']})
+        self.assertEqual(index['variables']['stats_var'][0]['node_name'],
+                         'provider_job')
+
+    def test_dry_run_failure_explained(self):
+        """ Test case dry run failure names the misplaced provider """
+
+        workflow_runner = w_run.WorkflowRunner('')
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                self.assertRaises(w_parser.DryRunFailed) as raised:
+            workflow_runner.dry_run(w_parser.WorkflowNode(self.top_node))
+
+        self.assertIn("'stats_var' is provided by set_stats of node "
+                      "'provider_job'", raised.exception.message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+""" Unit test for resource slots """
+
+import unittest
+
+from internal.workflow import resource
+
+
+class TestResourceLimiter(unittest.TestCase):
+    """ Unit test for resource slots """
+
+    def test_acquire_all_or_nothing(self):
+        """ Test case no slot is taken if one of pools is full """
+
+        limiter = resource.ResourceLimiter(3, {'db_hosts': 1})
+        db_job = ((resource.GLOBAL_POOL, 1), ('db_hosts', 1))
+
+        self.assertTrue(limiter.try_acquire(db_job))
+        self.assertFalse(limiter.try_acquire(db_job))
+        self.assertEqual(limiter.try_acquire_pools(db_job), ('db_hosts',))
+        self.assertEqual(limiter.get_used(), 1)
+
+        # Job of undeclared pool uses only the global slots.
+        self.assertTrue(limiter.try_acquire(((resource.GLOBAL_POOL, 2),
+                                             ('web_hosts', 5))))
+        self.assertFalse(limiter.try_acquire(((resource.GLOBAL_POOL, 1),)))
+
+        limiter.release(db_job)
+        self.assertEqual(limiter.get_used('db_hosts'), 0)
+        self.assertEqual(limiter.get_used(), 2)
+
+    def test_weight_over_limit(self):
+        """ Test case heavy job runs alone instead of waiting forever """
+
+        limiter = resource.ResourceLimiter(2)
+        heavy_job = ((resource.GLOBAL_POOL, 5),)
+
+        self.assertTrue(limiter.try_acquire(heavy_job))
+        self.assertFalse(limiter.try_acquire(((resource.GLOBAL_POOL, 1),)))
+        limiter.release(heavy_job)
+        self.assertEqual(limiter.get_used(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+""" Unit test for workflow runner """
+
+import io
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from internal.playbook import runner as p_run
+from internal.workflow import parser as w_parser
+from internal.workflow import resource as w_resource
+from internal.workflow import runner as w_run
+from internal.workflow import tree
+
+CHAIN_LENGTH = 50000
+
+# Seconds which stuck job sleeps. Test fails by timeout if it isn't killed.
+STUCK_SECONDS = 30
+SLOW_SECONDS = 0.3
+
+
+def _run_by_name(workflow_node: w_parser.WorkflowNode, *_) -> int:
+    """ Fake playbook run which result is decided by job_template name. """
+
+    node_name: str = workflow_node.current_node.node_name
+    if node_name == 'sample_job3':
+        time.sleep(STUCK_SECONDS)
+    if node_name == 'sample_job4':
+        return 1
+    return 0
+
+
+def _run_slowly(*_) -> int:
+    """ Fake playbook run which takes `SLOW_SECONDS`. """
+
+    time.sleep(SLOW_SECONDS)
+    return 0
+
+
+def _fail_hosts(playbook: str, *_, limit: str = None,
+                retry_dir: str = None) -> int:
+    """ Fake playbook run which fails on all but the first host. """
+
+    hosts: list = limit.split(',') if limit else ['host1', 'host2', 'host3']
+    if len(hosts) == 1:
+        return 0
+
+    with open(p_run.get_retry_file_path(playbook, retry_dir), 'w') as rtf:
+        rtf.write(''.join('{}\n'.format(host) for host in hosts[1:]))
+    return 2
+
+
+def _generate_chain_workflow(length: int) -> list:
+    top_job = {'job_template': 'sample_job1'}
+    job = top_job
+    for _ in range(length - 1):
+        next_job = {'job_template': 'sample_job2'}
+        job['success'] = [next_job]
+        job = next_job
+
+    return [top_job]
+
+
+class TestWorkFlowRunner(unittest.TestCase):
+    """ Unit test for workflow runner """
+
+    def test_long_chain_dry_run(self):
+        """ Test case dry run of chain workflow over recursion limit """
+
+        workflow = _generate_chain_workflow(CHAIN_LENGTH)
+        top_node = tree.generate_workflow_tree(workflow, True, {})
+
+        last_node = top_node
+        while last_node.success:
+            last_node = last_node.success[0]
+        self.assertEqual(last_node.node_id, CHAIN_LENGTH)
+        self.assertIn('pwd_stats', last_node.before_extra_vars)
+
+        workflow_runner = w_run.WorkflowRunner('')
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            workflow_runner.dry_run(w_parser.WorkflowNode(top_node))
+
+        self.assertEqual(stdout.getvalue().count('- OK.'), CHAIN_LENGTH)
+
+    def test_long_chain_run(self):
+        """ Test case run of chain workflow over recursion limit """
+
+        workflow = _generate_chain_workflow(CHAIN_LENGTH)
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+
+        workflow_runner = w_run.WorkflowRunner('')
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               return_value=0), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        self.assertEqual(len(results), CHAIN_LENGTH)
+        self.assertEqual([res.job_id for res in results[:3]], [1, 2, 3])
+        self.assertEqual(results[-1].job_id, CHAIN_LENGTH)
+
+    def _run_workflow(self, workflow: list, max_parallel: int = 1,
+                      deadline: float = None) -> list:
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+
+        workflow_runner = w_run.WorkflowRunner('', max_parallel, deadline)
+        started: float = time.monotonic()
+        with mock.patch.object(w_parser.WorkflowNode, 'run', autospec=True,
+                               side_effect=_run_by_name), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        self.assertLess(time.monotonic() - started, STUCK_SECONDS)
+        return sorted((res.job_id, res.job_template_name, res.status)
+                      for res in results)
+
+    def test_job_timeout(self):
+        """ Test case timed out job is killed and failure branch runs """
+
+        workflow = [{'job_template': 'sample_job3',
+                     'timeout': 0.5,
+                     'success': [{'job_template': 'sample_job1'}],
+                     'failure': [{'job_template': 'sample_job2'}]}]
+
+        self.assertEqual(self._run_workflow(workflow),
+                         [(1, 'sample_job3', 'timeout'),
+                          (2, 'sample_job2', 'successful')])
+
+    def test_invalid_timeout(self):
+        """ Test case timeout has to be positive number """
+
+        for timeout in (0, 'long', True):
+            workflow = [{'job_template': 'sample_job1', 'timeout': timeout}]
+            with self.assertRaises(tree.ParseFailed):
+                tree.generate_workflow_tree(workflow, False, {})
+
+    def test_fail_fast(self):
+        """ Test case failed critical job cancels it's siblings """
+
+        critical_job = {'job_template': 'sample_job4',
+                        'fail_fast': True,
+                        'failure': [{'job_template': 'sample_job2'}]}
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [critical_job,
+                                 {'job_template': 'sample_job3'},
+                                 {'job_template': 'sample_job1'}]}]
+
+        # The first two siblings run at the same time, and the last waits.
+        # Failure branch's `job_id` is numbered from the failed job.
+        self.assertEqual(self._run_workflow(workflow, max_parallel=2),
+                         [(1, 'sample_job1', 'successful'),
+                          (2, 'sample_job4', 'failed'),
+                          (3, 'sample_job2', 'successful'),
+                          (3, 'sample_job3', 'canceled'),
+                          (4, 'sample_job1', 'canceled')])
+
+    def test_workflow_deadline(self):
+        """ Test case jobs after the workflow deadline are canceled """
+
+        workflow = [{'job_template': 'sample_job3',
+                     'failure': [{'job_template': 'sample_job2'}],
+                     'always': [{'job_template': 'sample_job1'}]}]
+
+        results: list = self._run_workflow(
+            workflow, deadline=time.monotonic() + 0.5)
+        self.assertEqual(results, [(1, 'sample_job3', 'timeout'),
+                                   (2, 'sample_job2', 'canceled'),
+                                   (3, 'sample_job1', 'canceled')])
+
+    def test_critical_path(self):
+        """ Test case critical path is shorter than queued makespan """
+
+        # Three siblings share two workers, so one of them waits.
+        workflow = [{'job_template': 'sample_job1',
+                     'success': [{'job_template': 'sample_job2'},
+                                 {'job_template': 'sample_job3'},
+                                 {'job_template': 'sample_job4'}]}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+
+        workflow_runner = w_run.WorkflowRunner('', 2)
+        started: float = time.monotonic()
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               side_effect=_run_slowly), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+        makespan: float = time.monotonic() - started
+
+        top_record: w_run.JobRecord = results[0]
+        for record in results[1:]:
+            self.assertAlmostEqual(record.critical_path,
+                                   top_record.critical_path +
+                                   record.get_elapsed_seconds())
+        self.assertEqual(workflow_runner.critical_path,
+                         max(res.critical_path for res in results))
+        self.assertLess(workflow_runner.critical_path, SLOW_SECONDS * 2.5)
+        self.assertGreaterEqual(makespan, SLOW_SECONDS * 3)
+
+    def test_pool_fair_queue(self):
+        """ Test case jobs wait pool's slots without being overtaken """
+
+        workflow = [{'pools': {'db_hosts': 2}},
+                    {'job_template': 'sample_job1',
+                     'success': [{'job_template': 'sample_job2',
+                                  'pool': 'db_hosts'},
+                                 {'job_template': 'sample_job3',
+                                  'pool': 'db_hosts', 'weight': 2},
+                                 {'job_template': 'sample_job4',
+                                  'pool': 'db_hosts'}]}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+        limiter = w_resource.ResourceLimiter(None, tree.get_pools(workflow))
+
+        workflow_runner = w_run.WorkflowRunner('', 3, limiter=limiter)
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               side_effect=_run_slowly), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        waits = {res.job_template_name: res.get_queue_wait_seconds()
+                 for res in results}
+        self.assertTrue(all(res.status == 'successful' for res in results))
+        self.assertLess(waits['sample_job2'], SLOW_SECONDS)
+        # sample_job4 fits in the free slot,
+        # but it doesn't overtake sample_job3 which needs 2 slots.
+        self.assertGreaterEqual(waits['sample_job3'], SLOW_SECONDS)
+        self.assertGreaterEqual(waits['sample_job4'], SLOW_SECONDS * 2)
+        self.assertEqual(limiter.get_used('db_hosts'), 0)
+
+    def test_pool_not_blocking_others(self):
+        """ Test case jobs of other pools don't wait a full pool """
+
+        workflow = [{'pools': {'db_hosts': 1}},
+                    {'job_template': 'sample_job1',
+                     'success': [{'job_template': 'sample_job2',
+                                  'pool': 'db_hosts'},
+                                 {'job_template': 'sample_job3',
+                                  'pool': 'db_hosts'},
+                                 {'job_template': 'sample_job4'}]}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+        limiter = w_resource.ResourceLimiter(None, tree.get_pools(workflow))
+
+        workflow_runner = w_run.WorkflowRunner('', 3, limiter=limiter)
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               side_effect=_run_slowly), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        waits = {res.job_template_name: res.get_queue_wait_seconds()
+                 for res in results}
+        self.assertTrue(all(res.status == 'successful' for res in results))
+        self.assertGreaterEqual(waits['sample_job3'], SLOW_SECONDS)
+        self.assertLess(waits['sample_job4'], SLOW_SECONDS)
+
+    def _run_retry(self, workflow: list, run_playbook) -> w_run.JobRecord:
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+
+        workflow_runner = w_run.WorkflowRunner('')
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(p_run, 'run_playbook',
+                                  side_effect=run_playbook) as run_mock, \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', work_dir)
+
+        self.run_calls = run_mock.call_args_list
+        return results[0]
+
+    def test_retry_failed_hosts(self):
+        """ Test case only failed hosts are retried in one job record """
+
+        record = self._run_retry([{'job_template': 'sample_job2',
+                                   'attempts': 3}], _fail_hosts)
+
+        self.assertEqual(record.status, 'successful')
+        self.assertEqual(record.get_attempts(), '3')
+        self.assertEqual([call[1]['limit'] for call in self.run_calls],
+                         [None, 'host2,host3', 'host3'])
+        self.assertEqual([(attempt['hosts'], attempt['failed_hosts'])
+                          for attempt in record.attempts],
+                         [(None, ['host2', 'host3']),
+                          (['host2', 'host3'], ['host3']),
+                          (['host3'], [])])
+
+        record = self._run_retry([{'job_template': 'sample_job2',
+                                   'attempts': 2}], _fail_hosts)
+        self.assertEqual(record.status, 'failed')
+        self.assertEqual(record.attempts[-1]['failed_hosts'], ['host3'])
+
+        # Failure without retry file isn't caused by hosts.
+        record = self._run_retry([{'job_template': 'sample_job2',
+                                   'attempts': 3}], lambda *_, **__: 4)
+        self.assertEqual(record.status, 'failed')
+        self.assertEqual(len(self.run_calls), 1)
+
+    def test_invalid_attempts(self):
+        """ Test case attempts has to be positive number of job_template """
+
+        for job in ({'job_template': 'sample_job1', 'attempts': 0},
+                    {'job_template': 'sample_job1', 'retry_backoff': -1},
+                    {'workflow': 'sample_workflow', 'attempts': 2}):
+            with self.assertRaises(tree.ParseFailed):
+                tree.generate_workflow_tree([job], False, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Unit test for dispatch order of sibling jobs """
+
+import io
+import unittest
+from unittest import mock
+
+from internal.workflow import parser as w_parser
+from internal.workflow import runner as w_run
+from internal.workflow import schedule
+from internal.workflow import tree
+
+DURATIONS = {'sample_job1': 1.0, 'sample_job2': 5.0, 'sample_job3': 2.0}
+
+# The short job is written first, and the longest chain is the last.
+WORKFLOW = [{'job_template': 'sample_job1',
+             'success': [{'job_template': 'sample_job3'},
+                         {'job_template': 'sample_job2'},
+                         {'job_template': 'sample_job3',
+                          'always': [{'job_template': 'sample_job2'}]}]}]
+
+
+class TestSchedule(unittest.TestCase):
+    """ Unit test for dispatch order of sibling jobs """
+
+    def test_critical_path(self):
+        """ Test case critical path is the longest chain of durations """
+
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+        estimator = schedule.DurationEstimator(DURATIONS)
+
+        self.assertEqual(estimator.critical_path(top_node), 8.0)
+        self.assertEqual(estimator.order(top_node.success), [2, 1, 0])
+
+        # Job without recorded durations is estimated as median job.
+        estimator = schedule.DurationEstimator({'sample_job1': 1.0,
+                                                'sample_job2': 5.0})
+        self.assertEqual(estimator.default, 1.0)
+        self.assertEqual(estimator.critical_path(top_node), 7.0)
+
+    def test_sub_workflow_estimate(self):
+        """ Test case sub-workflow without record is estimated by jobs """
+
+        workflow = [{'workflow': 'sample_workflow'}]
+        top_node = tree.generate_workflow_tree(workflow, False, {})
+        sub_top_node = top_node.sub_workflow.top_node
+        estimator = schedule.DurationEstimator(DURATIONS)
+
+        self.assertEqual(estimator.critical_path(top_node),
+                         estimator.critical_path(sub_top_node))
+
+        estimator = schedule.DurationEstimator(
+            dict(DURATIONS, sample_workflow=0.5))
+        self.assertEqual(estimator.critical_path(top_node), 0.5)
+
+    def test_longest_first(self):
+        """ Test case siblings run from the longest critical path """
+
+        top_node = tree.generate_workflow_tree(WORKFLOW, False, {})
+        workflow_runner = w_run.WorkflowRunner(
+            '', estimator=schedule.DurationEstimator(DURATIONS))
+        with mock.patch.object(w_parser.WorkflowNode, 'run',
+                               return_value=0), \
+                mock.patch('sys.stdout', new_callable=io.StringIO):
+            results = workflow_runner.run(w_parser.WorkflowNode(top_node),
+                                          '{}', '')
+
+        # Job ids are still numbered in written order.
+        self.assertEqual([(res.job_id, res.job_template_name)
+                          for res in results],
+                         [(1, 'sample_job1'), (4, 'sample_job3'),
+                          (5, 'sample_job2'), (3, 'sample_job2'),
+                          (2, 'sample_job3')])
+
+
+if __name__ == '__main__':
+    unittest.main()